@@ -8,43 +8,88 @@ Created on Thu Oct 30 15:15:38 2025
 """
 Batch backtester for RSI-based strategies
 Uses shared logic from utils/strategies.py to stay consistent with Streamlit app.
+The per-task steps are those of utils/grid.py (run_grid() is the in-memory
+version of this script for notebooks and the apps); this script adds the
+data files, indicator cache, process pool and result files around them.
+
+Usage:
+    python backtester/batch_backtest.py [--workers N] [--timeframes 15m 1h 4h 1d]
+
+With --workers > 1 the (file, rsi_period, strategy) tasks run in a process pool.
+Summary rows are written in task order, so the results file is the same for any
+worker count. Trade logs go to the consolidated store under results/trades/
+(see utils/tradestore.py); --trade-csv also writes the old per-combination CSVs.
+
+--timeframes limits the run to the given timeframes. One that isn't stored for
+a market is resampled from a finer stored timeframe (utils/resample.py) and
+cached in cache/resampled/ until the source data changes.
+
+Every run writes a timing report: results/run_report.json (stage totals,
+per-file and per-task timings with bar, row and trade counts) and
+results/run_report_tasks.csv (one row per task). --profile N runs each task
+under cProfile and keeps merged dumps of the N slowest files in results/profiles/.
+
+Each file is loaded once per worker as a MarketFrame (utils/marketframe.py):
+float64 prices by default (--price-dtype float32 halves them), int64
+timestamps, and RSI/regime columns held next to the price arrays rather than
+copied into per-period frames. The report records peak resident memory of the
+main process and of each task's worker.
 """
 
-import os, glob
+import os, re, glob
+import time
+import shutil
+import argparse
+import tempfile
+import cProfile
 import pandas as pd
 import numpy as np
-from itertools import product
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
 from datetime import datetime
 from tqdm import tqdm
 
-from utils.strategies import rsi, backtest_simple_strategy, tag_market_regime
+from utils.grid import (
+    DEFAULT_GRID, DEFAULT_STRATEGIES, SUMMARY_COLUMNS, RESULT_SCHEMA_VERSION,
+    strategy_points, rsi_frame, tag_regimes, backtest_strategy, summary_row,
+)
+from utils.indicators import rsi_multi, file_fingerprint, indicator_key, IndicatorCache
+from utils.marketstore import list_datasets, is_dataset, read_market, read_market_arrays
+from utils.results import ResultSink, RunLedger
+from utils.tradestore import TradeStore, combo_name
+from utils.aggregates import ResultAggregates
+from utils.resample import resampled_dataset, best_base, SESSION_OFFSETS
+from utils.runreport import StageTimer, write_run_report, merge_profiles, peak_rss_mb
+from utils.marketframe import MarketFrame
 
 DATA_DIR = "data"
+STORE_DIR = os.path.join(DATA_DIR, "store")
 RESULTS_DIR = "results"
-os.makedirs(RESULTS_DIR, exist_ok=True)
+TRADE_STORE_DIR = os.path.join(RESULTS_DIR, "trades")
+INDICATOR_CACHE_DIR = os.path.join("cache", "indicators")
+RESAMPLE_CACHE_DIR = os.path.join("cache", "resampled")
+INDICATOR_CACHE_MAX_BYTES = 512 * 1024**2
 
 summary_path = os.path.join(RESULTS_DIR, "rsi_strategy_results.csv")
-summary_cols = [
-    "run_ts","market","timeframe","rsi_period","lower","upper",
-    "strategy","total_trades","total_pnl_pct","avg_pnl_pct",
-    "win_rate_pct","max_drawdown_pct","regime","volatility","trend_slope",
-    "bars","start_time","end_time"
-]
-if not os.path.exists(summary_path):
-    pd.DataFrame(columns=summary_cols).to_csv(summary_path, index=False)
-
-# Config
-rsi_periods       = [7, 14, 21]
-lower_thresholds  = [30, 25, 20, 15]   # vary only for mean_reversion
-upper_thresholds  = [70, 75, 80, 85]   # vary only for overbought_reversal
-exit_level        = 50
+summary_parquet_dir = os.path.join(RESULTS_DIR, "rsi_strategy_results.parquet")
+ledger_path = os.path.join(RESULTS_DIR, "completed_runs.txt")
+aggregates_dir = os.path.join(RESULTS_DIR, "aggregates")
+report_path = os.path.join(RESULTS_DIR, "run_report.json")
+report_tasks_path = os.path.join(RESULTS_DIR, "run_report_tasks.csv")
+profiles_dir = os.path.join(RESULTS_DIR, "profiles")
+SUMMARY_FLUSH_ROWS = 500
+summary_cols = SUMMARY_COLUMNS
+
+# Config (grid defaults live in utils/grid.py, shared with run_grid)
+rsi_periods       = DEFAULT_GRID["rsi_periods"]
+lower_thresholds  = DEFAULT_GRID["lower"]   # vary only for mean_reversion
+upper_thresholds  = DEFAULT_GRID["upper"]   # vary only for overbought_reversal
+exit_level        = DEFAULT_GRID["exit_level"]
+price_dtype       = np.dtype(DEFAULT_GRID["price_dtype"]).name
+equity_dtype      = np.dtype(DEFAULT_GRID["equity_dtype"]).name
 allowed_timeframes = ["1m","5m","15m","1h","4h"]
 
-strategies = [
-    {"name": "Mean Reversion",      "mode": "mean_reversion"},
-    {"name": "Overbought Reversal", "mode": "overbought_reversal"},
-    {"name": "Trend-follow RSI",    "mode": "trend_follow_rsi"},
-]
+strategies = DEFAULT_STRATEGIES
 
 def load_market_csv(path):
     df = pd.read_csv(path)
@@ -60,153 +105,422 @@ def load_market_csv(path):
             df[r] = np.nan
     return df[required].sort_values("timestamp").reset_index(drop=True)
 
-csv_files = glob.glob(os.path.join(DATA_DIR, "*.csv"))
-if not csv_files:
-    print("No CSVs found in /data. Run your downloader first.")
-    raise SystemExit(1)
+def load_market(path):
+    # columnar store datasets are directories; anything else is a CSV
+    if is_dataset(path):
+        return read_market(path)
+    return load_market_csv(path)
 
-print(f"Found {len(csv_files)} files. Starting backtest...\n")
+def load_market_frame(path):
+    # float64 MarketFrame; store datasets are memory-mapped rather than read
+    if is_dataset(path):
+        return MarketFrame.from_dataset(path)
+    return MarketFrame.from_frame(load_market_csv(path))
 
-for fpath in tqdm(csv_files, desc="Files"):
-    fname = os.path.basename(fpath)
-    base  = fname.rsplit(".", 1)[0]
+def find_market_sources():
+    """
+    Store datasets under data/store/ plus any data/*.csv not yet converted.
+    A market/timeframe present in both is read from the store.
+    """
+    datasets = list_datasets(STORE_DIR)
+    stored = {os.path.basename(d) for d in datasets}
+    csv_files = [f for f in glob.glob(os.path.join(DATA_DIR, "*.csv"))
+                 if os.path.basename(f).rsplit(".", 1)[0] not in stored]
+    return sorted(datasets + csv_files)
 
-    # infer timeframe and market
-    timeframe = None
-    for tf in allowed_timeframes:
+def infer_market_timeframe(fname):
+    base = fname.rsplit(".", 1)[0]
+    # <market>_<n><m|h|d|w> as written by the downloader and the resampler
+    m = re.match(r"^(.+)_(\d+[mhdw])$", base)
+    if m:
+        return m.group(1).replace("_","").replace("-","").replace("/",""), m.group(2)
+    # longest suffix first, so "15m" isn't read as "5m"
+    for tf in sorted(allowed_timeframes, key=len, reverse=True):
         if base.endswith(tf):
-            timeframe = tf
             market = base[:-len(tf)].replace("_","").replace("-","").replace("/","")
-            break
-    if timeframe is None:
-        print(f"⚠️ Skipping {fname}: timeframe not detected.")
-        continue
+            return market, tf
+    return None, None
+
+def _time_span(path):
+    # seconds of history in a data file (store datasets read just two timestamps)
+    if is_dataset(path):
+        ts = read_market_arrays(path)["timestamp"]
+        return (int(ts[-1]) - int(ts[0])) / 1e9 if len(ts) else 0.0
+    ts = load_market(path)["timestamp"]
+    return (ts.iloc[-1] - ts.iloc[0]).total_seconds() if len(ts) else 0.0
+
+def select_timeframes(sources, timeframes, cache_dir=RESAMPLE_CACHE_DIR):
+    """
+    Sources for the requested timeframes only. A market/timeframe that isn't
+    stored is resampled from the stored timeframe of that market covering the
+    longest history (see best_base), cached in cache_dir.
+    """
+    by_market = {}
+    for path in sources:
+        market, tf = infer_market_timeframe(os.path.basename(path))
+        if tf is not None:
+            by_market.setdefault(market, {})[tf] = path
+    selected = []
+    for market, stored in sorted(by_market.items()):
+        for tf in timeframes:
+            if tf in stored:
+                selected.append(stored[tf])
+                continue
+            base = best_base(stored, tf, span=_time_span)
+            if base is None:
+                print(f"⚠️ {market}: no stored timeframe to build {tf} from.")
+                continue
+            selected.append(resampled_dataset(cache_dir, market, tf, stored[base], base, load_market,
+                                              file_fingerprint(stored[base]), SESSION_OFFSETS.get(market)))
+    return selected
+
+# Stage timer of the task running in this process; run_task swaps in a fresh
+# one per task. Cache hits below cost nothing and record nothing.
+_timer = StageTimer()
 
-    # load data for this file
+# Each worker keeps the last few files / RSI frames it touched, so the three
+# strategy tasks of one (file, rsi_period) don't reload and recompute.
+@lru_cache(maxsize=2)
+def _cached_rsi_columns(fpath, cache_dir, data_hash=None, dtype=price_dtype):
+    # the file's MarketFrame with `dtype` prices, plus all rsi_periods computed
+    # in one pass from the float64 closes, served from the on-disk cache when
+    # this exact file content has been seen before
+    with _timer.stage("load"):
+        df = load_market_frame(fpath).dropna()
+    with _timer.stage("rsi"):
+        if cache_dir:
+            cache = IndicatorCache(cache_dir, max_bytes=INDICATOR_CACHE_MAX_BYTES)
+            columns = cache.rsi(data_hash or file_fingerprint(fpath), df["close"], rsi_periods)
+        else:
+            columns = {p: col.to_numpy() for p, col in rsi_multi(df["close"], rsi_periods).items()}
+    with _timer.stage("load"):
+        df = df.astype(dtype)
+    return df, columns
+
+@lru_cache(maxsize=4)
+def _cached_rsi_frame(fpath, rsi_period, cache_dir, data_hash=None, dtype=price_dtype):
+    # views of the file's arrays plus this period's RSI and regime columns
+    df, columns = _cached_rsi_columns(fpath, cache_dir, data_hash, dtype)
+    with _timer.stage("rsi"):
+        df2 = rsi_frame(df, columns[rsi_period])
+    if df2 is None:
+        return None, None, None
+    with _timer.stage("regime"):
+        regime, metrics = tag_regimes(df2)
+    return df2, regime, metrics
+
+def strategy_grid(strat):
+    # (lower, upper) points run for one strategy
+    return strategy_points(strat, DEFAULT_GRID)
+
+def combo_key(data_hash, market, timeframe, rsi_period, strat, lower, upper, dtype=price_dtype):
+    """Identity of one summary row: data fingerprint plus the full config, dtypes and schema."""
+    return indicator_key(
+        data_hash, "rsi_backtest",
+        market=market, timeframe=timeframe, rsi_period=rsi_period,
+        strategy=strat["name"], mode=strat["mode"], exit_level=exit_level,
+        lower=None if pd.isna(lower) else lower,
+        upper=None if pd.isna(upper) else upper,
+        price_dtype=dtype, equity_dtype=equity_dtype, schema=RESULT_SCHEMA_VERSION,
+    )
+
+def task_keys(task):
+    return [combo_key(task["data_hash"], task["market"], task["timeframe"], task["rsi_period"],
+                      task["strat"], lower, upper, task.get("price_dtype", price_dtype))
+            for lower, upper in strategy_grid(task["strat"])]
+
+def task_profile_path(task):
+    name = f"{os.path.basename(task['path'])}_RSI{task['rsi_period']}_{task['strat']['mode']}.prof"
+    return os.path.join(task["profile_dir"], name)
+
+def task_report(task, stages, seconds, bars=0, rows=(), error=None):
+    """Timing and counts of one task, as recorded in the run report."""
+    report = {
+        "file": os.path.basename(task["path"]),
+        "market": task["market"],
+        "timeframe": task["timeframe"],
+        "rsi_period": task["rsi_period"],
+        "strategy": task["strat"]["name"],
+        "bars": bars,
+        "rows": len(rows),
+        "trades": int(sum(r["total_trades"] for r in rows)),
+        "seconds": seconds,
+        "pid": os.getpid(),
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stages,
+    }
+    if error is not None:
+        report["error"] = error
+    return report
+
+def run_task(task):
+    """
+    Backtest one (file, rsi_period, strategy) task under a fresh stage timer
+    (and cProfile if task["profile_dir"] is set). Returns (rows, report): the
+    summary rows, each tagged with its combo_key and carrying its trades under
+    "trades" for the trade store, and the task's task_report().
+    """
+    global _timer
+    _timer = StageTimer()
+    profiler = cProfile.Profile() if task.get("profile_dir") else None
+    t0 = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
     try:
-        df = load_market_csv(fpath)
-    except Exception as e:
-        print(f"Error loading {fname}: {e}")
-        continue
-
-    # -----------------------------
-    # IMPORTANT: all loops below are INSIDE the per-file loop
-    # -----------------------------
-    for rsi_period in rsi_periods:
-        df2 = df.copy().dropna().reset_index(drop=True)
-        df2["rsi"] = rsi(df2["close"], period=rsi_period)
-        df2 = df2.dropna().reset_index(drop=True)
-        if len(df2) < 20:
-            continue
+        rows, bars = _backtest_task(task)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(task_profile_path(task))
+    return rows, task_report(task, _timer.seconds, time.perf_counter() - t0, bars, rows)
+
+def _backtest_task(task):
+    # (rows, bars) of one task; writes the old per-combination CSVs if task["trade_csv"]
+    fpath, market, timeframe = task["path"], task["market"], task["timeframe"]
+    rsi_period, strat = task["rsi_period"], task["strat"]
+    df2, regime, metrics = _cached_rsi_frame(fpath, rsi_period, task["cache_dir"], task["data_hash"],
+                                             task.get("price_dtype", price_dtype))
+    if df2 is None:
+        return [], 0
+
+    strat_file = strat["name"].replace(" ", "_")
+    with _timer.stage("backtest"):
+        runs = backtest_strategy(df2, strat, DEFAULT_GRID)
 
-        regime, metrics = tag_market_regime(df2)
-
-        for strat in strategies:
-            mode = strat["mode"]
-
-            if mode == "mean_reversion":
-                # Only vary lower threshold
-                for lower in lower_thresholds:
-                    cfg = {"mode": mode, "lower": lower, "exit_level": exit_level}
-                    summary, trades_df = backtest_simple_strategy(df2, df2["rsi"], cfg)
-
-                    row = {
-                        "run_ts": datetime.utcnow().isoformat(),
-                        "market": market,
-                        "timeframe": timeframe,
-                        "rsi_period": rsi_period,
-                        "lower": lower,
-                        "upper": np.nan,
-                        "strategy": strat["name"],
-                        "total_trades": summary.get("total_trades", 0),
-                        "total_pnl_pct": summary.get("total_pnl_pct", 0.0),
-                        "avg_pnl_pct": summary.get("avg_pnl_pct", 0.0),
-                        "win_rate_pct": summary.get("win_rate_pct", 0.0),
-                        "max_drawdown_pct": summary.get("max_drawdown_pct", 0.0),
-                        "regime": regime,
-                        "volatility": metrics.get("vol", np.nan),
-                        "trend_slope": metrics.get("trend", np.nan),
-                        "bars": len(df2),
-                        "start_time": df2["timestamp"].iloc[0].isoformat(),
-                        "end_time": df2["timestamp"].iloc[-1].isoformat(),
-                    }
-                    pd.DataFrame([row]).to_csv(summary_path, mode="a", index=False, header=False)
-
-                    if not trades_df.empty:
-                        trades_file = os.path.join(
-                            RESULTS_DIR,
-                            f"trades_{market}_{timeframe}_{strat['name'].replace(' ','_')}_RSI{rsi_period}_L{lower}.csv"
-                        )
-                        trades_df.to_csv(trades_file, index=False)
-
-            elif mode == "overbought_reversal":
-                # Only vary upper threshold
-                for upper in upper_thresholds:
-                    cfg = {"mode": mode, "upper": upper, "exit_level": exit_level}
-                    summary, trades_df = backtest_simple_strategy(df2, df2["rsi"], cfg)
-
-                    row = {
-                        "run_ts": datetime.utcnow().isoformat(),
-                        "market": market,
-                        "timeframe": timeframe,
-                        "rsi_period": rsi_period,
-                        "lower": np.nan,
-                        "upper": upper,
-                        "strategy": strat["name"],
-                        "total_trades": summary.get("total_trades", 0),
-                        "total_pnl_pct": summary.get("total_pnl_pct", 0.0),
-                        "avg_pnl_pct": summary.get("avg_pnl_pct", 0.0),
-                        "win_rate_pct": summary.get("win_rate_pct", 0.0),
-                        "max_drawdown_pct": summary.get("max_drawdown_pct", 0.0),
-                        "regime": regime,
-                        "volatility": metrics.get("vol", np.nan),
-                        "trend_slope": metrics.get("trend", np.nan),
-                        "bars": len(df2),
-                        "start_time": df2["timestamp"].iloc[0].isoformat(),
-                        "end_time": df2["timestamp"].iloc[-1].isoformat(),
-                    }
-                    pd.DataFrame([row]).to_csv(summary_path, mode="a", index=False, header=False)
-
-                    if not trades_df.empty:
-                        trades_file = os.path.join(
-                            RESULTS_DIR,
-                            f"trades_{market}_{timeframe}_{strat['name'].replace(' ','_')}_RSI{rsi_period}_U{upper}.csv"
-                        )
-                        trades_df.to_csv(trades_file, index=False)
-
-            elif mode == "trend_follow_rsi":
-                cfg = {"mode": mode}
-                summary, trades_df = backtest_simple_strategy(df2, df2["rsi"], cfg)
-
-                row = {
-                    "run_ts": datetime.utcnow().isoformat(),
-                    "market": market,
-                    "timeframe": timeframe,
-                    "rsi_period": rsi_period,
-                    "lower": np.nan,
-                    "upper": np.nan,
-                    "strategy": strat["name"],
-                    "total_trades": summary.get("total_trades", 0),
-                    "total_pnl_pct": summary.get("total_pnl_pct", 0.0),
-                    "avg_pnl_pct": summary.get("avg_pnl_pct", 0.0),
-                    "win_rate_pct": summary.get("win_rate_pct", 0.0),
-                    "max_drawdown_pct": summary.get("max_drawdown_pct", 0.0),
-                    "regime": regime,
-                    "volatility": metrics.get("vol", np.nan),
-                    "trend_slope": metrics.get("trend", np.nan),
-                    "bars": len(df2),
-                    "start_time": df2["timestamp"].iloc[0].isoformat(),
-                    "end_time": df2["timestamp"].iloc[-1].isoformat(),
-                }
-                pd.DataFrame([row]).to_csv(summary_path, mode="a", index=False, header=False)
-
-                if not trades_df.empty:
-                    trades_file = os.path.join(
-                        RESULTS_DIR,
-                        f"trades_{market}_{timeframe}_{strat['name'].replace(' ','_')}_RSI{rsi_period}.csv"
-                    )
+    rows = []
+    with _timer.stage("rows"):
+        for (lower, upper, summary, trades_df), key in zip(runs, task_keys(task)):
+            row = summary_row(task["run_ts"], market, timeframe, rsi_period, lower, upper,
+                              strat["name"], summary, regime, metrics, df2)
+            row["combo_key"] = key
+            row["trades"] = trades_df
+            rows.append(row)
+            if task.get("trade_csv") and not trades_df.empty:
+                suffix = f"_L{lower}" if pd.notna(lower) else f"_U{upper}" if pd.notna(upper) else ""
+                trades_file = os.path.join(
+                    RESULTS_DIR,
+                    f"trades_{market}_{timeframe}_{strat_file}_RSI{rsi_period}{suffix}.csv"
+                )
+                with _timer.stage("trade_csv"):
                     trades_df.to_csv(trades_file, index=False)
+    return rows, len(df2)
+
+def trade_table(row):
+    # (combo_meta, trades_df) entry for TradeStore.write_partition
+    meta = {"combo": combo_name(row["strategy"], row["rsi_period"], row["lower"], row["upper"]),
+            "exit_level": exit_level}
+    for col in ("strategy", "rsi_period", "lower", "upper", "combo_key", "run_ts"):
+        meta[col] = row[col]
+    return meta, row["trades"]
+
+def build_tasks(sources, run_ts, cache_dir=None, done=None, trade_csv=False, profile_dir=None,
+                dtype=price_dtype):
+    """
+    One task per (file, rsi_period, strategy). With a `done` key set
+    (incremental mode), tasks whose grid points are all done are left out.
+    With a `profile_dir`, each task dumps its cProfile stats there.
+    """
+    tasks = []
+    for fpath in sources:
+        fname = os.path.basename(fpath)
+        market, timeframe = infer_market_timeframe(fname)
+        if timeframe is None:
+            print(f"⚠️ Skipping {fname}: timeframe not detected.")
+            continue
+        data_hash = file_fingerprint(fpath)
+        for rsi_period in rsi_periods:
+            for strat in strategies:
+                task = {"path": fpath, "market": market, "timeframe": timeframe,
+                        "rsi_period": rsi_period, "strat": strat, "run_ts": run_ts,
+                        "cache_dir": cache_dir, "data_hash": data_hash,
+                        "trade_csv": trade_csv, "profile_dir": profile_dir, "price_dtype": dtype}
+                if done is not None and all(k in done for k in task_keys(task)):
+                    continue
+                tasks.append(task)
+    return tasks
+
+def run_tasks(tasks, workers=1):
+    """
+    Run tasks serially or across a process pool and yield (index, rows, report)
+    in task order. A failed task is reported and yields no rows; the rest carry on.
+    """
+    def _failed(task, e):
+        print(f"Error in {os.path.basename(task['path'])} RSI{task['rsi_period']} {task['strat']['name']}: {e}")
+        return [], task_report(task, {}, 0.0, error=str(e))
+
+    if workers <= 1:
+        for i, task in enumerate(tqdm(tasks, desc="Tasks")):
+            try:
+                rows, report = run_task(task)
+            except Exception as e:
+                rows, report = _failed(task, e)
+            yield i, rows, report
+        return
+
+    pending, next_i = {}, 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_task, task): i for i, task in enumerate(tasks)}
+        for fut in tqdm(as_completed(futures), total=len(futures), desc="Tasks"):
+            i = futures[fut]
+            try:
+                pending[i] = fut.result()
+            except Exception as e:
+                pending[i] = _failed(tasks[i], e)
+            # release results in task order as soon as the gap is filled
+            while next_i in pending:
+                yield (next_i, *pending.pop(next_i))
+                next_i += 1
+
+def file_report(task, reports, parent_timer):
+    """
+    One file's entry in the run report: its tasks' stages (summed over workers)
+    plus the stages this process spent on the file's trades and summary rows.
+    """
+    stages = StageTimer()
+    for r in reports:
+        stages.add(r["stages"])
+    stages.add(parent_timer.seconds)
+    return {
+        "file": os.path.basename(task["path"]),
+        "path": task["path"],
+        "market": task["market"],
+        "timeframe": task["timeframe"],
+        "tasks": len(reports),
+        "bars": max((r["bars"] for r in reports), default=0),
+        "rows": sum(r["rows"] for r in reports),
+        "trades": sum(r["trades"] for r in reports),
+        "seconds": sum(r["seconds"] for r in reports) + parent_timer.total(),
+        "peak_rss_mb": max((r["peak_rss_mb"] for r in reports if r.get("peak_rss_mb")), default=None),
+        "stages": stages.seconds,
+    }
+
+def save_profiles(file_reports, tasks, profile_tmp, n):
+    # merge the task dumps of the n slowest files into results/profiles/
+    os.makedirs(profiles_dir, exist_ok=True)
+    for rep in sorted(file_reports, key=lambda r: -r["seconds"])[:n]:
+        paths = [p for p in (task_profile_path(t) for t in tasks if t["path"] == rep["path"])
+                 if os.path.exists(p)]
+        if not paths:
+            continue
+        _, txt_path = merge_profiles(paths, os.path.join(profiles_dir, rep["file"]))
+        print(f"Profile of {rep['file']} ({rep['seconds']:.2f}s) saved to: {txt_path}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch backtest RSI strategies over data/*.csv")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes (default 1 = run in this process)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"recompute indicators instead of using {INDICATOR_CACHE_DIR}/")
+    parser.add_argument("--parquet", action="store_true",
+                        help=f"also write summary rows to {summary_parquet_dir}/ (needs pyarrow)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="skip grid points already computed for the same data and config")
+    parser.add_argument("--trade-csv", action="store_true",
+                        help="also write one trades_*.csv per combination (old layout)")
+    parser.add_argument("--timeframes", nargs="+", default=None, metavar="TF",
+                        help=f"only these timeframes (e.g. 15m 1h 1d); missing ones are resampled "
+                             f"from finer stored data into {RESAMPLE_CACHE_DIR}/")
+    parser.add_argument("--price-dtype", choices=["float32", "float64"], default=price_dtype,
+                        help=f"dtype of the price arrays (default {price_dtype}; RSI always uses float64)")
+    parser.add_argument("--profile", type=int, nargs="?", const=3, default=0, metavar="N",
+                        help=f"run tasks under cProfile and keep dumps of the N (default 3) "
+                             f"slowest files in {profiles_dir}/")
+    args = parser.parse_args(argv)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+
+    sources = find_market_sources()
+    if not sources:
+        print("No market data found in /data. Run your downloader first.")
+        raise SystemExit(1)
+
+    if args.timeframes:
+        sources = select_timeframes(sources, args.timeframes)
+    print(f"Found {len(sources)} files. Starting backtest...\n")
+
+    run_ts = datetime.utcnow().isoformat()
+    t_start = time.perf_counter()
+    # stages run in this process outside any file (task setup, first refresh)
+    run_timer = StageTimer()
+    cache_dir = None if args.no_cache else INDICATOR_CACHE_DIR
+    profile_tmp = tempfile.mkdtemp(prefix="rsi-profile-") if args.profile else None
+    # completed combo keys are recorded only after their rows are on disk, so
+    # an interrupted incremental run resumes from the last flushed rows
+    ledger = RunLedger(ledger_path)
+    done = set(ledger.keys) if args.incremental else None
+    with run_timer.stage("build_tasks"):
+        tasks = build_tasks(sources, run_ts, cache_dir, done, args.trade_csv, profile_tmp,
+                            args.price_dtype)
+    if args.incremental:
+        print(f"Incremental mode: {len(tasks)} tasks with new or changed grid points.")
+
+    parquet_dir = summary_parquet_dir if args.parquet else None
+    # aggregates fold in each flushed chunk, so they track the CSV as it grows
+    aggregates = ResultAggregates(summary_path, aggregates_dir)
+    with run_timer.stage("aggregates"):
+        aggregates.refresh()
+
+    # parent-side stages are charged to the file being written
+    file_timer = run_timer
+
+    def on_flush(rows):
+        with file_timer.stage("ledger"):
+            ledger.add(r["combo_key"] for r in rows)
+        with file_timer.stage("aggregates"):
+            aggregates.refresh()
+
+    trade_store = TradeStore(TRADE_STORE_DIR)
+    file_trades, file_tasks, task_reports, file_reports = [], [], [], []
+    with ResultSink(summary_path, summary_cols, SUMMARY_FLUSH_ROWS, parquet_dir, on_flush) as sink:
+        for i, rows, report in run_tasks(tasks, workers=args.workers):
+            if not file_tasks:
+                file_timer = StageTimer()
+            task_reports.append(report)
+            file_tasks.append(report)
+            if done is not None:
+                rows = [r for r in rows if r["combo_key"] not in done]
+            file_trades.extend(trade_table(r) for r in rows)
+            with file_timer.stage("summary_write"):
+                sink.extend(rows)
+            # write trades and flush at the end of each data file
+            if i + 1 == len(tasks) or tasks[i + 1]["path"] != tasks[i]["path"]:
+                if file_trades:
+                    with file_timer.stage("trade_store"):
+                        trade_store.write_partition(tasks[i]["market"], tasks[i]["timeframe"], file_trades)
+                    file_trades = []
+                with file_timer.stage("summary_write"):
+                    sink.flush()
+                file_reports.append(file_report(tasks[i], file_tasks, file_timer))
+                file_tasks = []
+
+    info = {
+        "run_ts": run_ts,
+        "argv": list(argv) if argv is not None else None,
+        "workers": args.workers,
+        "task_count": len(tasks),
+        "file_count": len(file_reports),
+        "wall_seconds": time.perf_counter() - t_start,
+        "price_dtype": args.price_dtype,
+        "peak_rss_mb": peak_rss_mb(),
+        "worker_peak_rss_mb": max((r["peak_rss_mb"] for r in task_reports
+                                   if r.get("peak_rss_mb") and r["pid"] != os.getpid()), default=None),
+    }
+    report = write_run_report(report_path, report_tasks_path, info, task_reports, file_reports,
+                              run_timer.seconds)
+    if profile_tmp:
+        save_profiles(file_reports, tasks, profile_tmp, args.profile)
+        shutil.rmtree(profile_tmp, ignore_errors=True)
+
+    print("\n✅ Batch backtest complete!")
+    print(f"Summary saved to: {summary_path}")
+    print(f"Trade logs saved to: {TRADE_STORE_DIR}/")
+    print(f"Aggregates updated in: {aggregates_dir}/")
+    print(f"Run report saved to: {report_path}")
+    top = ", ".join(f"{name} {sec:.2f}s" for name, sec in list(report["stages"].items())[:4])
+    print(f"Slowest stages: {top}")
+    if info["peak_rss_mb"] is not None:
+        workers = f", workers {info['worker_peak_rss_mb']:.0f} MB" if info["worker_peak_rss_mb"] else ""
+        print(f"Peak memory: main {info['peak_rss_mb']:.0f} MB{workers}")
 
-print("\n✅ Batch backtest complete!")
-print(f"Summary saved to: {summary_path}")
-print(f"Trade logs saved to: {RESULTS_DIR}/")
+if __name__ == "__main__":
+    main()
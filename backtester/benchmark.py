@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Offline benchmarks for the strategy functions and a full batch run, on seeded
+synthetic OHLCV bars (utils/synthetic.py).
+
+Usage:
+    python backtester/benchmark.py [--sizes 10000 100000 1000000] [--batch-sizes 10000 100000]
+                                   [--full] [--only rsi,backtest,batch] [--repeat 3]
+                                   [--save-baseline NAME] [--compare NAME] [--tolerance 1.25]
+
+Each case reports its best wall time over --repeat runs and, from a separate
+run under tracemalloc, its peak traced memory (numpy and pandas buffers
+included). The backtest cases cover rare, typical and frequent trading.
+
+--save-baseline writes the results to benchmarks/<NAME>.json; --compare
+prints the ratio against a saved baseline and exits with status 1 if any case
+got slower or bigger than --tolerance times the baseline.
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from utils.synthetic import synthetic_ohlcv
+from utils.marketstore import write_market
+from utils.strategies import (
+    rsi,
+    backtest_simple_strategy,
+    compute_returns_from_trades,
+    signal_indices,
+    sweep_thresholds,
+    tag_market_regime,
+    rolling_regime,
+)
+import batch_backtest
+
+BASELINE_DIR = "benchmarks"
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_BATCH_SIZES = [10_000, 100_000]
+FULL_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+FULL_BATCH_SIZES = [10_000, 100_000, 1_000_000]
+MIN_COMPARE_SECONDS = 0.005  # below this, timing noise dominates the ratio
+
+# trade frequency cases for backtest_simple_strategy
+FREQUENCY_CASES = {
+    "rare":     {"mode": "mean_reversion", "lower": 15, "exit_level": 50},
+    "typical":  {"mode": "mean_reversion", "lower": 30, "exit_level": 50},
+    "frequent": {"mode": "trend_follow_rsi"},
+}
+
+def measure(fn, repeat):
+    """(best seconds, peak traced MB, last return value) of fn()."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak / 1024**2, out
+
+def function_cases(df):
+    """(name, case, fn, trade counter) for one frame."""
+    r = rsi(df["close"], period=14)
+    df = df.assign(rsi=r)
+    cases = [("rsi", "period=14", lambda: rsi(df["close"], period=14), None)]
+    for name, cfg in FREQUENCY_CASES.items():
+        cases.append(("backtest_simple_strategy", name,
+                      lambda cfg=cfg: backtest_simple_strategy(df, r, cfg), lambda out: len(out[1])))
+    e, x, sides = signal_indices(r, FREQUENCY_CASES["typical"])
+    trades = [{"entry_idx": a, "exit_idx": b, "side": "long" if s > 0 else "short"}
+              for a, b, s in zip(e, x, sides)]
+    cases.append(("compute_returns_from_trades", "typical",
+                  lambda: compute_returns_from_trades(trades, df), len))
+    cases.append(("sweep_thresholds", "4 lower thresholds",
+                  lambda: sweep_thresholds(df, r, "mean_reversion", batch_backtest.lower_thresholds),
+                  lambda out: sum(len(t) for _, t in out.values())))
+    cases.append(("tag_market_regime", "", lambda: tag_market_regime(df), None))
+    cases.append(("rolling_regime", "window=50", lambda: rolling_regime(df), None))
+    return cases
+
+def batch_runner(workdir, n_bars, seed):
+    """fn() doing one cold batch run (no indicator cache) over a synthetic store dataset in workdir."""
+    write_market(os.path.join(workdir, batch_backtest.STORE_DIR), "SYNTHUSDT_1m",
+                 synthetic_ohlcv(n_bars, seed=seed))
+
+    def _run():
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            shutil.rmtree(batch_backtest.RESULTS_DIR, ignore_errors=True)
+            for cached in (batch_backtest._cached_rsi_columns, batch_backtest._cached_rsi_frame):
+                cached.cache_clear()
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                batch_backtest.main(["--no-cache"])
+            return len(pd.read_csv(batch_backtest.summary_path))
+        finally:
+            os.chdir(cwd)
+
+    return _run
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark strategy functions and batch runs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=None, help="bar counts for function cases")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=None, help="bar counts for batch runs")
+    parser.add_argument("--full", action="store_true", help="10k to 10M bars (batch up to 1M)")
+    parser.add_argument("--only", default=None, help="comma-separated case names to run (e.g. rsi,batch)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case (best is kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", metavar="NAME", help=f"save results to {BASELINE_DIR}/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help=f"compare against {BASELINE_DIR}/NAME.json")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="ratio to the baseline above which a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or (FULL_SIZES if args.full else DEFAULT_SIZES)
+    batch_sizes = args.batch_sizes or (FULL_BATCH_SIZES if args.full else DEFAULT_BATCH_SIZES)
+    only = set(args.only.split(",")) if args.only else None
+
+    results = []
+    def record(name, case, bars, fn, count=None):
+        if only is not None and name.split("_")[0] not in only and name not in only:
+            return
+        seconds, peak_mb, out = measure(fn, args.repeat)
+        row = {"name": name, "case": case, "bars": bars, "seconds": seconds, "peak_mb": peak_mb,
+               "trades": count(out) if count else None}
+        results.append(row)
+        trades = f"{row['trades']:>8}" if row["trades"] is not None else " " * 8
+        print(f"{name:<28} {case:<20} {bars:>10} {seconds * 1000:>10.1f} ms {peak_mb:>9.1f} MB {trades}")
+
+    print(f"{'function':<28} {'case':<20} {'bars':>10} {'time':>13} {'peak':>12} {'trades':>8}")
+    for n in sizes:
+        df = synthetic_ohlcv(n, seed=args.seed)
+        for name, case, fn, count in function_cases(df):
+            record(name, case, n, fn, count)
+    for n in batch_sizes:
+        if only is not None and "batch" not in only:
+            break
+        workdir = tempfile.mkdtemp(prefix="rsi-bench-")
+        try:
+            record("batch", "--no-cache", n, batch_runner(workdir, n, args.seed), None)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "created": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to: {path}")
+
+    if args.compare:
+        path = os.path.join(BASELINE_DIR, f"{args.compare}.json")
+        with open(path) as f:
+            baseline = json.load(f)
+        if compare(results, baseline["results"], args.tolerance):
+            sys.exit(1)
+
+def compare(results, baseline, tolerance):
+    """Print current/baseline ratios; returns True if any case regressed."""
+    base = {(r["name"], r["case"], r["bars"]): r for r in baseline}
+    regressed = False
+    print(f"\n{'function':<28} {'case':<20} {'bars':>10} {'time x':>8} {'mem x':>8}")
+    for r in results:
+        b = base.get((r["name"], r["case"], r["bars"]))
+        if b is None:
+            continue
+        t_ratio = r["seconds"] / b["seconds"] if b["seconds"] > 0 else float("nan")
+        m_ratio = r["peak_mb"] / b["peak_mb"] if b["peak_mb"] > 0 else float("nan")
+        slow = t_ratio > tolerance and r["seconds"] - b["seconds"] > MIN_COMPARE_SECONDS
+        big = m_ratio > tolerance
+        flag = "  <- regression" if slow or big else ""
+        regressed |= bool(flag)
+        print(f"{r['name']:<28} {r['case']:<20} {r['bars']:>10} {t_ratio:>8.2f} {m_ratio:>8.2f}{flag}")
+    return regressed
+
+if __name__ == "__main__":
+    main()
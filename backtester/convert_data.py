@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Convert data/*.csv into the columnar market store (data/store/<name>/).
+
+Usage:
+    python backtester/convert_data.py [--remove-csv]
+
+CSVs are parsed with the batch backtester's loader, so the stored datasets
+hold exactly what the backtest would have read from the CSV.
+"""
+
+import os, glob
+import argparse
+
+from utils.marketstore import write_market
+from batch_backtest import DATA_DIR, STORE_DIR, load_market_csv
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert data/*.csv to the columnar market store")
+    parser.add_argument("--remove-csv", action="store_true",
+                        help="delete each CSV once its dataset has been written")
+    args = parser.parse_args(argv)
+
+    csv_files = sorted(glob.glob(os.path.join(DATA_DIR, "*.csv")))
+    if not csv_files:
+        print("No CSVs found in /data.")
+        return
+
+    for fpath in csv_files:
+        name = os.path.basename(fpath).rsplit(".", 1)[0]
+        try:
+            df = load_market_csv(fpath)
+            path = write_market(STORE_DIR, name, df)
+        except Exception as e:
+            print(f"⚠️ Error converting {name}: {e}")
+            continue
+        print(f"{name}: {len(df)} rows -> {path}")
+        if args.remove_csv:
+            os.remove(fpath)
+
+    print(f"\n✅ Converted datasets saved in {STORE_DIR}/")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Cost sensitivity of the batch results: fees, spread and slippage applied
+after the fact to the trades in the trade store (results/trades/).
+
+Usage:
+    python backtester/cost_sensitivity.py [--fees 0 0.05 0.1] [--slippage 0 0.02]
+                                          [--spread-pips 0 1 2] [--market BTCUSDT] [--timeframe 1h]
+
+Every combination of the given levels is one scenario (fees and slippage in %
+per side, spread in pips; see utils/costs.py). The summary metrics of every
+combination are recomputed for all scenarios in one array pass, without
+rerunning the backtest.
+
+Writes:
+    results/cost_sensitivity.csv   one row per (scenario, market, timeframe, combo)
+    results/cost_breakeven.csv     per-side fee at which each combo's total PnL reaches zero
+"""
+
+import os
+import argparse
+
+from utils.tradestore import TradeStore
+from utils.costs import cost_scenarios, cost_sensitivity, breakeven_fee_pct
+from batch_backtest import RESULTS_DIR, TRADE_STORE_DIR
+
+sensitivity_path = os.path.join(RESULTS_DIR, "cost_sensitivity.csv")
+breakeven_path = os.path.join(RESULTS_DIR, "cost_breakeven.csv")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute batch summaries under trading cost scenarios")
+    parser.add_argument("--fees", type=float, nargs="+", default=[0.0, 0.05, 0.1],
+                        help="commission per side, in %% of notional")
+    parser.add_argument("--slippage", type=float, nargs="+", default=[0.0],
+                        help="adverse fill per side, in %% of price")
+    parser.add_argument("--spread-pips", type=float, nargs="+", default=[0.0],
+                        help="bid/ask spread in pips (pip sizes per market in utils/costs.py)")
+    parser.add_argument("--pip-size", nargs="+", default=[], metavar="MARKET=SIZE",
+                        help="pip size of a market missing from utils/costs.py PIP_SIZES, e.g. ADAUSDT=0.0001")
+    parser.add_argument("--market", default=None)
+    parser.add_argument("--timeframe", default=None)
+    args = parser.parse_args(argv)
+
+    filters = {k: v for k, v in (("market", args.market), ("timeframe", args.timeframe)) if v}
+    trades = TradeStore(TRADE_STORE_DIR).read(**filters)
+    if trades.empty:
+        print(f"No trades found in {TRADE_STORE_DIR}/. Run batch_backtest.py first.")
+        raise SystemExit(1)
+
+    pip_sizes = {}
+    for item in args.pip_size:
+        market, _, size = item.partition("=")
+        try:
+            pip_sizes[market] = float(size)
+        except ValueError:
+            parser.error(f"--pip-size expects MARKET=SIZE, got '{item}'")
+
+    scenarios = cost_scenarios(args.fees, args.slippage, args.spread_pips)
+    try:
+        result = cost_sensitivity(trades, scenarios, pip_sizes=pip_sizes)
+    except ValueError as e:
+        print(f"⚠️ {e} (or use --pip-size MARKET=SIZE)")
+        raise SystemExit(1)
+    breakeven = breakeven_fee_pct(trades)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result.to_csv(sensitivity_path, index=False)
+    breakeven.to_csv(breakeven_path, index=False)
+
+    print(f"{len(trades)} trades, {len(breakeven)} combinations, {len(scenarios)} scenarios")
+    profitable = result[result["total_pnl_pct"] > 0].groupby("scenario").size()
+    for s, row in scenarios.iterrows():
+        print(f"  fee {row['fee_pct']:g}%  slippage {row['slippage_pct']:g}%  spread {row['spread_pips']:g} pips: "
+              f"{int(profitable.get(s, 0))} profitable")
+    print("\n✅ Cost sensitivity complete!")
+    print(f"Scenarios saved to: {sensitivity_path}")
+    print(f"Breakeven fees saved to: {breakeven_path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,39 @@
+"""
+Download / update OHLCV data for the batch backtester.
+
+Usage:
+    python backtester/download_data.py               # fetch only bars newer than what is stored
+    python backtester/download_data.py --full        # ignore stored history and re-download
+    python backtester/download_data.py --concurrent  # parallel requests, rate-limited per venue
+    python backtester/download_data.py --timeframes 1m 15m  # only these (base) timeframes
+
+Each market/timeframe is kept as a dataset in the columnar store (data/store/).
+Updates read the last stored timestamp, fetch newer candles (paging Binance
+with `since` until caught up), merge them with de-duplication and report any
+gaps, so history grows run after run instead of being overwritten.
+
+Coarser timeframes need not be downloaded: batch_backtest.py --timeframes
+resamples them from the stored base candles (see utils/resample.py).
+
+The fetch functions take the exchange / yfinance client as an argument, so
+they can be pointed at a local stand-in.
+"""
+
 import os
+import time
+import argparse
+import threading
+import numpy as np
 import pandas as pd
-import ccxt
-import yfinance as yf
 from time import sleep
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils.marketstore import write_market, read_market, dataset_path, is_dataset
 
 # === SETUP ===
-os.makedirs("data", exist_ok=True)
+DATA_DIR = "data"
+STORE_DIR = os.path.join(DATA_DIR, "store")
+WRITE_CSV = False  # also keep a data/<name>.csv copy alongside the store dataset
 
 # ---- 1. CRYPTO MARKETS (from Binance via ccxt) ----
 crypto_markets = [
@@ -15,27 +43,9 @@ crypto_markets = [
     "BNB/USDT"
 ]
 timeframes = ["1m", "5m", "15m", "1h", "4h"]
-
-print("\n📊 Downloading crypto data from Binance...")
-exchange = ccxt.binance()
 limit = 1000  # number of candles per request
 
-for symbol in crypto_markets:
-    for tf in timeframes:
-        print(f"Fetching {symbol} ({tf})...")
-        try:
-            ohlcv = exchange.fetch_ohlcv(symbol, timeframe=tf, limit=limit)
-            df = pd.DataFrame(ohlcv, columns=["timestamp", "open", "high", "low", "close", "volume"])
-            df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
-            file_name = f"{symbol.replace('/', '')}_{tf}.csv"
-            df.to_csv(f"data/{file_name}", index=False)
-            sleep(1)
-        except Exception as e:
-            print(f"⚠️ Error fetching {symbol} ({tf}): {e}")
-
 # ---- 2. FOREX & COMMODITIES (from Yahoo Finance) ----
-print("\n💱 Downloading forex & commodities data from Yahoo Finance...")
-
 yahoo_markets = {
     "EURUSD": "EURUSD=X",   # Euro / US Dollar
     "EURJPY": "EURJPY=X",   # Euro / Japanese Yen
@@ -44,20 +54,362 @@ yahoo_markets = {
     "SPY": "SPY"            # S&P 500 ETF (US Stock Market)
 }
 
-for label, ticker in yahoo_markets.items():
-    for interval in timeframes:
-        print(f"Downloading {label} ({interval})...")
-        try:
-            # Note: Yahoo only supports 1m data for 7 days, higher intervals have longer history
-            period = "7d" if interval == "1m" else "60d"
-            df = yf.download(ticker, period=period, interval=interval, progress=False)
-            df.reset_index(inplace=True)
-            df.rename(columns={"Datetime": "timestamp"}, inplace=True)
-            df = df[["timestamp", "Open", "High", "Low", "Close", "Volume"]]
-            df.columns = ["timestamp", "open", "high", "low", "close", "volume"]
-            file_name = f"{label}_{interval}.csv"
-            df.to_csv(f"data/{file_name}", index=False)
-        except Exception as e:
-            print(f"⚠️ Error downloading {label} ({interval}): {e}")
-
-print("\n✅ Done! All crypto, forex, and commodity data saved in /data")
+TIMEFRAME_MS = {
+    "1m": 60_000, "5m": 300_000, "15m": 900_000,
+    "1h": 3_600_000, "4h": 14_400_000, "1d": 86_400_000,
+}
+
+# Concurrent mode: parallel requests and sustained requests/second per venue
+VENUE_LIMITS = {
+    "binance": {"concurrency": 4, "rate": 10.0, "burst": 10},
+    # yf.download keeps per-ticker results in module-global state, so calls
+    # must not overlap (fetch_yahoo also holds YAHOO_LOCK)
+    "yahoo":   {"concurrency": 1, "rate": 2.0,  "burst": 2},
+}
+REQUEST_RETRIES = 3
+RETRY_BACKOFF = 1.0  # seconds, doubled after each failed attempt
+YAHOO_LOCK = threading.Lock()
+YAHOO_MAX_CLOSED = pd.Timedelta(days=4)  # longest market closure (long weekend) without new bars
+
+class EmptyDownload(RuntimeError):
+    """A download that should have returned bars came back empty (yfinance doesn't raise)."""
+
+def yahoo_lookback_days(interval):
+    # Note: Yahoo only supports 1m data for 7 days, higher intervals have longer history
+    return 7 if interval == "1m" else 60
+
+def save_market(name, df):
+    write_market(STORE_DIR, name, df)
+    if WRITE_CSV:
+        df.to_csv(os.path.join(DATA_DIR, f"{name}.csv"), index=False)
+
+def load_stored(name):
+    path = dataset_path(STORE_DIR, name)
+    return read_market(path) if is_dataset(path) else None
+
+def merge_candles(old, new):
+    """
+    Append new candles to stored ones. A timestamp present in both keeps the
+    new row, since the last stored candle may have been fetched while still open.
+    """
+    if old is None or old.empty:
+        merged = new
+    else:
+        merged = pd.concat([old, new], ignore_index=True)
+    merged = merged.drop_duplicates(subset="timestamp", keep="last")
+    return merged.sort_values("timestamp").reset_index(drop=True)
+
+def find_gaps(timestamps, timeframe, since=None):
+    """
+    Missing stretches in a candle series: rows of (gap_start, gap_end,
+    missing_bars), where gap_start/gap_end are the candles either side.
+    With `since`, only gaps ending after that timestamp are reported.
+    """
+    ts = pd.Series(pd.to_datetime(timestamps)).sort_values().reset_index(drop=True)
+    step = pd.Timedelta(milliseconds=TIMEFRAME_MS[timeframe])
+    diffs = ts.diff()
+    idx = diffs.index[diffs > step]
+    gaps = pd.DataFrame({
+        "gap_start": ts.iloc[idx - 1].reset_index(drop=True),
+        "gap_end": ts.iloc[idx].reset_index(drop=True),
+        "missing_bars": (diffs.iloc[idx] / step).round().astype(int).reset_index(drop=True) - 1,
+    })
+    if since is not None:
+        gaps = gaps[gaps["gap_end"] > since]
+    return gaps.reset_index(drop=True)
+
+def fetch_binance(exchange, symbol, tf, since=None, limit=limit, pause=1.0):
+    """
+    Candles for symbol/tf as a DataFrame. Without `since` this is the latest
+    `limit` candles (one request); with `since` it pages forward until the
+    exchange has no newer candles.
+    """
+    columns = ["timestamp", "open", "high", "low", "close", "volume"]
+    if since is None:
+        rows = exchange.fetch_ohlcv(symbol, timeframe=tf, limit=limit)
+    else:
+        rows = []
+        since_ms = int(pd.Timestamp(since).value // 1_000_000)
+        while True:
+            batch = exchange.fetch_ohlcv(symbol, timeframe=tf, since=since_ms, limit=limit)
+            if not batch:
+                break
+            rows.extend(batch)
+            next_ms = batch[-1][0] + TIMEFRAME_MS[tf]
+            if len(batch) < limit or next_ms <= since_ms:
+                break
+            since_ms = next_ms
+            sleep(pause)
+    df = pd.DataFrame(rows, columns=columns)
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
+    return df
+
+def _normalize_yahoo(df):
+    df = df.reset_index()
+    df.rename(columns={"Datetime": "timestamp", "Date": "timestamp"}, inplace=True)
+    df = df[["timestamp", "Open", "High", "Low", "Close", "Volume"]]
+    df.columns = ["timestamp", "open", "high", "low", "close", "volume"]
+    return df
+
+def fetch_yahoo(client, ticker, interval, since=None):
+    """
+    Candles from Yahoo Finance (`client` is the yfinance module or a stand-in).
+    With `since` inside Yahoo's lookback window only newer bars are requested;
+    otherwise the full window is downloaded.
+
+    yfinance reports failures by returning an empty frame. EmptyDownload is
+    raised for an empty full-window download, or an empty update when the
+    last stored bar is older than YAHOO_MAX_CLOSED; a shorter update may be
+    empty because the market was closed.
+    """
+    lookback = pd.Timedelta(days=yahoo_lookback_days(interval))
+    now = pd.Timestamp.now(tz="UTC")
+    kwargs = {"period": f"{lookback.days}d"}
+    expect_data = True
+    if since is not None:
+        since = pd.Timestamp(since)
+        since_utc = since.tz_convert("UTC") if since.tzinfo else since.tz_localize("UTC")
+        if now - since_utc < lookback:
+            kwargs = {"start": since_utc.to_pydatetime()}
+            expect_data = now - since_utc > YAHOO_MAX_CLOSED
+    with YAHOO_LOCK:
+        df = client.download(ticker, interval=interval, progress=False, **kwargs)
+    if df is None or df.empty:
+        if expect_data:
+            raise EmptyDownload(f"Yahoo returned no {interval} bars for {ticker}")
+        return pd.DataFrame(columns=["timestamp", "open", "high", "low", "close", "volume"])
+    return _normalize_yahoo(df)
+
+def update_market(name, timeframe, fetch, full=False):
+    """
+    Bring one stored dataset up to date. `fetch(since)` returns candles from
+    `since` (None = no stored history). Returns (new_bars, gaps).
+    """
+    old = None if full else load_stored(name)
+    since = old["timestamp"].iloc[-1] if old is not None and len(old) else None
+    new = fetch(since)
+    if new.empty:
+        return 0, find_gaps([], timeframe)
+    merged = merge_candles(old, new)
+    new_bars = len(merged) - (0 if old is None else len(old))
+    gaps = find_gaps(merged["timestamp"], timeframe, since=since)
+    save_market(name, merged)
+    return new_bars, gaps
+
+def _report(name, new_bars, gaps):
+    msg = f"  {name}: +{new_bars} bars"
+    if not gaps.empty:
+        msg += f", {len(gaps)} gap(s) / {int(gaps['missing_bars'].sum())} missing bars since last update"
+    print(msg)
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `capacity` banked."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+class RequestStats:
+    """Per-venue request latencies, errors and throughput."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = {}
+        self.errors = {}
+        self.started = time.monotonic()
+
+    def record(self, venue, seconds, ok=True):
+        with self.lock:
+            if ok:
+                self.latency.setdefault(venue, []).append(seconds)
+            else:
+                self.errors[venue] = self.errors.get(venue, 0) + 1
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started
+        rows = []
+        for venue in sorted(set(self.latency) | set(self.errors)):
+            lat = np.array(self.latency.get(venue, []), dtype=np.float64) * 1000
+            # no successful request: latencies are undefined, not an all-NaN reduction
+            ok = len(lat) > 0
+            rows.append({
+                "venue": venue,
+                "requests": len(lat),
+                "errors": self.errors.get(venue, 0),
+                "mean_ms": lat.mean() if ok else np.nan,
+                "p50_ms": np.percentile(lat, 50) if ok else np.nan,
+                "p95_ms": np.percentile(lat, 95) if ok else np.nan,
+                "req_per_s": len(lat) / elapsed if elapsed else np.nan,
+            })
+        return pd.DataFrame(rows)
+
+class ThrottledClient:
+    """
+    Wraps an exchange / yfinance client so every method call waits for a token
+    from the venue's bucket, is timed into `stats`, and is retried with
+    exponential backoff when it raises.
+    """
+
+    def __init__(self, client, venue, bucket, stats, retries=REQUEST_RETRIES,
+                 backoff=RETRY_BACKOFF, sleep=sleep):
+        self._client = client
+        self._venue = venue
+        self._bucket = bucket
+        self._stats = stats
+        self._retries = retries
+        self._backoff = backoff
+        self._sleep = sleep
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            for attempt in range(self._retries + 1):
+                self._bucket.acquire()
+                t0 = time.monotonic()
+                try:
+                    result = attr(*args, **kwargs)
+                except Exception:
+                    self._stats.record(self._venue, time.monotonic() - t0, ok=False)
+                    if attempt == self._retries:
+                        raise
+                    self._sleep(self._backoff * 2 ** attempt)
+                    continue
+                self._stats.record(self._venue, time.monotonic() - t0)
+                return result
+        return call
+
+def retry_empty(fetch, retries=REQUEST_RETRIES, backoff=RETRY_BACKOFF, sleep=sleep):
+    # fetch(since) retried with backoff on EmptyDownload, which is raised after
+    # the client call returns and so isn't seen by ThrottledClient's retries
+    def call(since):
+        for attempt in range(retries + 1):
+            try:
+                return fetch(since)
+            except EmptyDownload:
+                if attempt == retries:
+                    raise
+                sleep(backoff * 2 ** attempt)
+    return call
+
+def download_jobs(exchange, yf_client, tfs=None):
+    # (venue, dataset name, timeframe, fetch(client, since)) for every market
+    tfs = tfs or timeframes
+    jobs = []
+    for symbol in crypto_markets:
+        for tf in tfs:
+            fetch = lambda client, since, symbol=symbol, tf=tf: fetch_binance(client, symbol, tf, since=since, pause=0)
+            jobs.append(("binance", f"{symbol.replace('/', '')}_{tf}", tf, exchange, fetch))
+    for label, ticker in yahoo_markets.items():
+        for interval in tfs:
+            fetch = lambda client, since, ticker=ticker, interval=interval: fetch_yahoo(client, ticker, interval, since=since)
+            jobs.append(("yahoo", f"{label}_{interval}", interval, yf_client, fetch))
+    return jobs
+
+def run_concurrent(jobs, full=False, limits=VENUE_LIMITS, stats=None):
+    """
+    Run download jobs in parallel, at most limits[venue]["concurrency"] at a
+    time per venue and throttled by a token bucket per venue. Each dataset is
+    written as soon as its job finishes. Returns (results, stats) where
+    results maps dataset name -> (new_bars, gaps) or the exception raised.
+    """
+    stats = stats or RequestStats()
+    pools, clients = {}, {}
+    for venue, cfg in limits.items():
+        pools[venue] = ThreadPoolExecutor(max_workers=cfg["concurrency"])
+        bucket = TokenBucket(cfg["rate"], cfg["burst"])
+        clients[venue] = lambda client, venue=venue, bucket=bucket: ThrottledClient(client, venue, bucket, stats)
+
+    futures = {}
+    for venue, name, tf, client, fetch in jobs:
+        throttled = clients[venue](client)
+        job_fetch = retry_empty(lambda since, fetch=fetch, throttled=throttled: fetch(throttled, since))
+        futures[pools[venue].submit(update_market, name, tf, job_fetch, full)] = name
+
+    results = {}
+    try:
+        for fut in as_completed(futures):
+            name = futures[fut]
+            try:
+                results[name] = fut.result()
+                _report(name, *results[name])
+            except Exception as e:
+                results[name] = e
+                print(f"⚠️ Error updating {name}: {e}")
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+    return results, stats
+
+def main(argv=None):
+    import ccxt
+    import yfinance as yf
+
+    parser = argparse.ArgumentParser(description="Download or update OHLCV data")
+    parser.add_argument("--full", action="store_true", help="ignore stored history and re-download")
+    parser.add_argument("--concurrent", action="store_true",
+                        help="run requests in parallel, rate-limited per venue (see VENUE_LIMITS)")
+    parser.add_argument("--timeframes", nargs="+", default=timeframes, choices=list(TIMEFRAME_MS),
+                        metavar="TF", help=f"timeframes to fetch (default: {' '.join(timeframes)})")
+    args = parser.parse_args(argv)
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+    if args.concurrent:
+        print("\n⚡ Downloading crypto, forex and commodities data concurrently...")
+        jobs = download_jobs(ccxt.binance(), yf, args.timeframes)
+        results, stats = run_concurrent(jobs, full=args.full)
+        bars = sum(r[0] for r in results.values() if isinstance(r, tuple))
+        elapsed = time.monotonic() - stats.started
+        print("\nRequest stats:")
+        print(stats.summary().to_string(index=False, float_format=lambda v: f"{v:.1f}"))
+        print(f"{bars} new bars in {elapsed:.1f}s ({bars / elapsed if elapsed else 0:.0f} bars/s)")
+        print(f"\n✅ Done! All crypto, forex, and commodity data saved in {STORE_DIR}/")
+        return
+
+    print("\n📊 Downloading crypto data from Binance...")
+    exchange = ccxt.binance()
+    for symbol in crypto_markets:
+        for tf in args.timeframes:
+            print(f"Fetching {symbol} ({tf})...")
+            try:
+                name = f"{symbol.replace('/', '')}_{tf}"
+                fetch = lambda since: fetch_binance(exchange, symbol, tf, since=since)
+                _report(name, *update_market(name, tf, fetch, full=args.full))
+                sleep(1)
+            except Exception as e:
+                print(f"⚠️ Error fetching {symbol} ({tf}): {e}")
+
+    print("\n💱 Downloading forex & commodities data from Yahoo Finance...")
+    for label, ticker in yahoo_markets.items():
+        for interval in args.timeframes:
+            print(f"Downloading {label} ({interval})...")
+            try:
+                name = f"{label}_{interval}"
+                fetch = retry_empty(lambda since: fetch_yahoo(yf, ticker, interval, since=since))
+                _report(name, *update_market(name, interval, fetch, full=args.full))
+            except Exception as e:
+                print(f"⚠️ Error downloading {label} ({interval}): {e}")
+
+    print(f"\n✅ Done! All crypto, forex, and commodity data saved in {STORE_DIR}/")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Move the per-combination trade CSVs in results/ into the trade store
+(results/trades/, see utils/tradestore.py).
+
+Usage:
+    python backtester/migrate_trades.py [--remove-csv]
+
+Handles both layouts written so far:
+    trades_<market>_<timeframe>_<Strategy>_RSI<p>[_L<x>|_U<x>].csv   (batch)
+    trade_logs_<market>_<timeframe>_<strategy>.csv                  (rsi_app_v2)
+The app logs carry no thresholds, so each of their runs is stored as its own
+combination, labelled with the run timestamp.
+"""
+
+import os, re, glob
+import argparse
+import numpy as np
+import pandas as pd
+
+from utils.tradestore import TradeStore, combo_name
+from batch_backtest import RESULTS_DIR, TRADE_STORE_DIR, allowed_timeframes, exit_level
+
+TF_PATTERN = "|".join(allowed_timeframes + ["1d"])
+BATCH_FILE = re.compile(
+    rf"^trades_(?P<market>.+?)_(?P<timeframe>{TF_PATTERN})_(?P<strategy>.+)_RSI(?P<period>\d+)"
+    r"(?:_L(?P<lower>\d+)|_U(?P<upper>\d+))?\.csv$"
+)
+APP_FILE = re.compile(rf"^trade_logs_(?P<market>.+)_(?P<timeframe>{TF_PATTERN})_(?P<strategy>.+)\.csv$")
+
+def _parse_times(col):
+    try:
+        return pd.to_datetime(col, format="ISO8601")
+    except (ValueError, TypeError):
+        # mixed UTC offsets
+        return pd.to_datetime(col, utc=True)
+
+def read_trade_csv(path):
+    trades = pd.read_csv(path)
+    trades["entry_time"] = _parse_times(trades["entry_time"])
+    trades["exit_time"] = _parse_times(trades["exit_time"])
+    return trades
+
+def batch_tables(path, m):
+    lower = float(m["lower"]) if m["lower"] else np.nan
+    upper = float(m["upper"]) if m["upper"] else np.nan
+    # file names had spaces replaced by underscores; "Trend-follow_RSI" -> "Trend-follow RSI"
+    strategy = m["strategy"].replace("_", " ")
+    meta = {"combo": combo_name(strategy, int(m["period"]), lower, upper), "strategy": strategy,
+            "rsi_period": int(m["period"]), "lower": lower, "upper": upper, "exit_level": exit_level}
+    return [(meta, read_trade_csv(path))]
+
+def app_tables(path, m):
+    trades = read_trade_csv(path)
+    tables = []
+    for (strategy, period, run_ts), run in trades.groupby(["strategy", "rsi_period", "run_ts"], sort=True):
+        meta = {"combo": f"{combo_name(strategy, int(period))}_run{run_ts}", "strategy": strategy,
+                "rsi_period": int(period), "run_ts": run_ts}
+        trades_df = run.reset_index(drop=True)
+        trades_df["cumulative_pnl_pct"] = trades_df["pnl_pct"].cumsum()
+        tables.append((meta, trades_df))
+    return tables
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate results/trade*.csv into the trade store")
+    parser.add_argument("--remove-csv", action="store_true",
+                        help="delete the CSVs once their partition has been written")
+    args = parser.parse_args(argv)
+
+    partitions = {}  # (market, timeframe) -> ([tables], [paths])
+    for fpath in sorted(glob.glob(os.path.join(RESULTS_DIR, "trade*.csv"))):
+        fname = os.path.basename(fpath)
+        m = BATCH_FILE.match(fname)
+        reader = batch_tables
+        if m is None:
+            m = APP_FILE.match(fname)
+            reader = app_tables
+        if m is None:
+            print(f"⚠️ Skipping {fname}: name not recognised.")
+            continue
+        try:
+            tables = reader(fpath, m)
+        except Exception as e:
+            print(f"⚠️ Error reading {fname}: {e}")
+            continue
+        entry = partitions.setdefault((m["market"], m["timeframe"]), ([], []))
+        entry[0].extend(tables)
+        entry[1].append(fpath)
+
+    if not partitions:
+        print(f"No trade CSVs found in /{RESULTS_DIR}.")
+        return
+
+    store = TradeStore(TRADE_STORE_DIR)
+    for (market, timeframe), (tables, paths) in sorted(partitions.items()):
+        store.write_partition(market, timeframe, tables)
+        trades = sum(len(t) for _, t in tables)
+        print(f"{market} {timeframe}: {len(paths)} files, {len(tables)} combinations, {trades} trades")
+        if args.remove_csv:
+            for fpath in paths:
+                os.remove(fpath)
+
+    print(f"\n✅ Trade logs migrated to {TRADE_STORE_DIR}/")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo robustness of the batch results: the trades of every combination
+in the trade store (results/trades/) resampled into many trade sequences.
+
+Usage:
+    python backtester/monte_carlo.py [--sims 1000] [--method bootstrap] [--workers N]
+                                     [--percentiles 5 25 50 75 95] [--seed 0]
+                                     [--market BTCUSDT] [--timeframe 1h] [--strategy "Mean Reversion"]
+
+--method bootstrap draws trades with replacement (final PnL and drawdown
+vary); shuffle reorders them (only the drawdown varies). See utils/montecarlo.py.
+Each combination reads its pnl_pct slice straight from the store and is
+scored as one (sims, trades) array; --workers spreads the combinations over
+a process pool. Results don't depend on the worker count: every combination
+has its own seed.
+
+Writes:
+    results/monte_carlo.csv   one row per (market, timeframe, combo): the observed
+                              total/compounded PnL and drawdown, their percentile bands,
+                              prob_loss_pct and dd_worse_pct
+"""
+
+import os
+import time
+import argparse
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+
+from utils.tradestore import TradeStore
+from utils.montecarlo import monte_carlo, group_seed, METHODS, DEFAULT_PERCENTILES
+from batch_backtest import RESULTS_DIR, TRADE_STORE_DIR
+
+monte_carlo_path = os.path.join(RESULTS_DIR, "monte_carlo.csv")
+KEY_COLUMNS = ["market", "timeframe", "combo", "strategy", "rsi_period", "lower", "upper",
+               "combo_key", "run_ts"]
+
+def score_combo(job):
+    # monte_carlo() of one combination, loading only its pnl_pct rows
+    root, partition, start, stop, key, cfg = job
+    pnl = TradeStore(root).column(partition, "pnl_pct", start, stop)
+    return monte_carlo(pnl, cfg["sims"], cfg["method"], cfg["percentiles"], group_seed(cfg["seed"], *key))
+
+def score_combos(index, root, sims=1000, method="bootstrap", percentiles=DEFAULT_PERCENTILES,
+                 seed=0, workers=1):
+    """One monte_carlo() row per combination of a TradeStore index, key columns in front."""
+    cfg = {"sims": sims, "method": method, "percentiles": tuple(percentiles), "seed": seed}
+    jobs = [(root, r.partition, int(r.start), int(r.stop), (r.market, r.timeframe, r.combo), cfg)
+            for r in index.itertuples()]
+    if workers <= 1:
+        results = [score_combo(job) for job in tqdm(jobs, desc="Combos")]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(jobs) // (workers * 8))
+            results = list(tqdm(pool.map(score_combo, jobs, chunksize=chunksize), total=len(jobs), desc="Combos"))
+    keys = index[[c for c in KEY_COLUMNS if c in index.columns]].reset_index(drop=True)
+    return pd.concat([keys, pd.DataFrame(results)], axis=1)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo trade resampling of the batch results")
+    parser.add_argument("--sims", type=int, default=1000, help="resampled sequences per combination")
+    parser.add_argument("--method", choices=METHODS, default="bootstrap")
+    parser.add_argument("--percentiles", type=float, nargs="+", default=list(DEFAULT_PERCENTILES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-trades", type=int, default=2, help="skip combinations with fewer trades")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes (default 1 = run in this process)")
+    parser.add_argument("--market", default=None)
+    parser.add_argument("--timeframe", default=None)
+    parser.add_argument("--strategy", default=None)
+    args = parser.parse_args(argv)
+
+    index = TradeStore(TRADE_STORE_DIR).index()
+    for col in ("market", "timeframe", "strategy"):
+        if getattr(args, col):
+            index = index[index[col] == getattr(args, col)]
+    index = index[index["stop"] - index["start"] >= max(args.min_trades, 1)]
+    if index.empty:
+        print(f"No combinations with trades found in {TRADE_STORE_DIR}/. Run batch_backtest.py first.")
+        raise SystemExit(1)
+
+    t0 = time.perf_counter()
+    result = score_combos(index, TRADE_STORE_DIR, args.sims, args.method, args.percentiles,
+                          args.seed, args.workers)
+    elapsed = time.perf_counter() - t0
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result.to_csv(monte_carlo_path, index=False)
+
+    trades = int(result["trades"].sum())
+    print(f"{len(result)} combinations, {trades} trades x {args.sims} {args.method} sequences in {elapsed:.1f}s")
+    low = f"total_pnl_pct_p{min(args.percentiles):g}"
+    profitable = result["total_pnl_pct"] > 0
+    print(f"  {int(profitable.sum())} profitable, {int((profitable & (result[low] < 0)).sum())} of them "
+          f"losing at the {min(args.percentiles):g}th percentile")
+    print("\n✅ Monte Carlo complete!")
+    print(f"Results saved to: {monte_carlo_path}")
+
+if __name__ == "__main__":
+    main()
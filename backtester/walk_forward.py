@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Walk-forward optimization of the batch grid (RSI periods x thresholds) per
+market file and strategy.
+
+Usage:
+    python backtester/walk_forward.py --train 2000 --test 500 [--step N] [--anchored]
+                                      [--metric total_pnl_pct] [--min-trades 1] [--no-cache]
+
+Window sizes are in bars. For each train window the best grid point of a
+strategy is chosen and scored on the following test window. RSI for all
+periods comes from the batch's indicator cache and every grid point is
+backtested once per file, however many windows there are.
+
+Writes:
+    results/walk_forward_windows.csv   one row per (file, strategy, window)
+    results/walk_forward_oos.csv       summary of the stitched out-of-sample trades
+"""
+
+import os
+import argparse
+import pandas as pd
+from datetime import datetime
+
+from utils.strategies import summarize_trades
+from utils.walkforward import walk_forward, WF_METRICS
+from utils.indicators import file_fingerprint
+from batch_backtest import (
+    RESULTS_DIR, INDICATOR_CACHE_DIR, rsi_periods, exit_level, strategies,
+    strategy_grid, find_market_sources, infer_market_timeframe, _cached_rsi_columns,
+)
+
+windows_path = os.path.join(RESULTS_DIR, "walk_forward_windows.csv")
+oos_path = os.path.join(RESULTS_DIR, "walk_forward_oos.csv")
+
+def strategy_wf_grid(strat):
+    # every RSI period x the strategy's threshold grid from the batch config
+    return [{"name": strat["name"], "mode": strat["mode"], "rsi_period": p,
+             "lower": lower, "upper": upper}
+            for p in rsi_periods for lower, upper in strategy_grid(strat)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Walk-forward optimization over data/*.csv")
+    parser.add_argument("--train", type=int, required=True, help="train window length in bars")
+    parser.add_argument("--test", type=int, required=True, help="test window length in bars")
+    parser.add_argument("--step", type=int, default=None, help="bars between windows (default --test)")
+    parser.add_argument("--anchored", action="store_true", help="train windows all start at the first bar")
+    parser.add_argument("--metric", choices=WF_METRICS, default="total_pnl_pct",
+                        help="train score used to choose parameters")
+    parser.add_argument("--min-trades", type=int, default=1,
+                        help="train trades a grid point needs to be chosen")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"recompute indicators instead of using {INDICATOR_CACHE_DIR}/")
+    args = parser.parse_args(argv)
+
+    sources = find_market_sources()
+    if not sources:
+        print("No market data found in /data. Run your downloader first.")
+        raise SystemExit(1)
+
+    run_ts = datetime.utcnow().isoformat()
+    cache_dir = None if args.no_cache else INDICATOR_CACHE_DIR
+    window_frames, oos_rows = [], []
+    for fpath in sources:
+        fname = os.path.basename(fpath)
+        market, timeframe = infer_market_timeframe(fname)
+        if timeframe is None:
+            print(f"⚠️ Skipping {fname}: timeframe not detected.")
+            continue
+        df, columns = _cached_rsi_columns(fpath, cache_dir, file_fingerprint(fpath))
+        if len(df) < args.train + args.test:
+            print(f"⚠️ Skipping {fname}: {len(df)} bars, fewer than one train + test window.")
+            continue
+        for strat in strategies:
+            grid = strategy_wf_grid(strat)
+            windows, oos = walk_forward(df, columns, grid, args.train, args.test, args.step,
+                                        args.anchored, args.metric, args.min_trades, exit_level)
+            meta = {"run_ts": run_ts, "market": market, "timeframe": timeframe, "strategy": strat["name"]}
+            window_frames.append(windows.drop(columns=["name", "mode"], errors="ignore").assign(**meta))
+            summary = summarize_trades(oos)
+            oos_rows.append({**meta, "windows": len(windows), "train_bars": args.train,
+                             "test_bars": args.test, "anchored": args.anchored, "metric": args.metric,
+                             **{f"oos_{k}": v for k, v in summary.items()}})
+        print(f"{market} {timeframe}: {len(windows)} windows x {len(strategies)} strategies")
+
+    if not oos_rows:
+        print("No files long enough for the requested windows.")
+        return
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    windows_df = pd.concat(window_frames, ignore_index=True)
+    lead = ["run_ts", "market", "timeframe", "strategy"]
+    windows_df = windows_df[lead + [c for c in windows_df.columns if c not in lead]]
+    windows_df.to_csv(windows_path, index=False)
+    pd.DataFrame(oos_rows).to_csv(oos_path, index=False)
+
+    print("\n✅ Walk-forward complete!")
+    print(f"Windows saved to: {windows_path}")
+    print(f"Out-of-sample summary saved to: {oos_path}")
+
+if __name__ == "__main__":
+    main()
@@ -16,18 +16,22 @@ import plotly.graph_objs as go
 import os
 from datetime import datetime, timedelta
 
+from utils.downsample import LAYOUT_WIDTH_PX, chart_width_px, target_points, downsample_indices, window_slice
 from utils.strategies import (
     rsi,
     compute_returns_from_trades,
     backtest_simple_strategy,
     tag_market_regime,
+    format_ratio,
 )
 
 # -------------------------
 # SETTINGS
 # -------------------------
 SAVE_OUTPUTS = False  # prevent writing to local disk
-st.set_page_config(layout="wide", page_title="RSI Strategy Analyzer")
+COMPUTE_CACHE_ENTRIES = 32  # cached (ticker, interval, parameters) results kept in memory
+PAGE_LAYOUT = "wide"
+st.set_page_config(layout=PAGE_LAYOUT, page_title="RSI Strategy Analyzer")
 
 # -------------------------
 # Helper function
@@ -44,6 +48,34 @@ def fetch_data_yfinance(ticker, period="60d", interval="1h"):
     df.columns = ["open", "high", "low", "close", "volume", "timestamp"]
     return df
 
+# Compute stages, cached by their scalar inputs so reruns that only change the
+# display (e.g. the trade-marker strategy) don't recompute anything. Moving a
+# threshold slider reruns only the strategies, not RSI or the regime tag.
+@st.cache_data(max_entries=COMPUTE_CACHE_ENTRIES)
+def compute_rsi_frame(ticker, period, interval, rsi_period):
+    df = fetch_data_yfinance(ticker, period=period, interval=interval)
+    df["rsi"] = rsi(df["close"], period=rsi_period)
+    df = df.dropna().reset_index(drop=True)
+    regime, metrics = tag_market_regime(df)
+    return df, regime, metrics
+
+def strategy_configs(lower_thresh, upper_thresh, exit_level):
+    return [
+        {"name": "Mean Reversion", "mode": "mean_reversion", "lower": lower_thresh, "exit_level": exit_level},
+        {"name": "Overbought Reversal", "mode": "overbought_reversal", "upper": upper_thresh, "exit_level": exit_level},
+        {"name": "Trend-follow RSI", "mode": "trend_follow_rsi"},
+    ]
+
+@st.cache_data(max_entries=COMPUTE_CACHE_ENTRIES)
+def compute_strategies(ticker, period, interval, rsi_period, lower_thresh, upper_thresh, exit_level):
+    df, _, _ = compute_rsi_frame(ticker, period, interval, rsi_period)
+    results, trades_tables = {}, {}
+    for s in strategy_configs(lower_thresh, upper_thresh, exit_level):
+        summary, trades_df = backtest_simple_strategy(df, df["rsi"], s)
+        results[s["name"]] = summary
+        trades_tables[s["name"]] = trades_df
+    return results, trades_tables
+
 # -------------------------
 # UI
 # -------------------------
@@ -69,6 +101,12 @@ with st.sidebar:
     lower_thresh = st.slider("Lower Threshold (Buy)", 5, 45, 30)
     upper_thresh = st.slider("Upper Threshold (Short)", 55, 95, 70)
     exit_level = st.slider("Exit Level (Mid)", 30, 70, 50)
+    st.subheader("Chart")
+    # the point budget follows the width the charts are drawn at (kept in session state)
+    st.checkbox("Fit charts to page width", value=True, key="chart_fit_width")
+    st.slider("Chart width (px)", 400, 3000, LAYOUT_WIDTH_PX[PAGE_LAYOUT], step=100, key="chart_width_px",
+              help="Width the charts are drawn at, or your page width when they fit the page. "
+                   "About one point per pixel is plotted.")
 
 st.markdown("""
 Evaluates **3 RSI-based strategies**:
@@ -81,27 +119,15 @@ status_msg = st.empty()
 status_msg.info("Fetching data...")
 
 try:
-    df = fetch_data_yfinance(market, period=period, interval=timeframe)
+    df, regime, metrics = compute_rsi_frame(market, period, timeframe, rsi_period)
 except Exception as e:
     st.error(f"Data fetch failed: {e}")
     st.stop()
 
-df["rsi"] = rsi(df["close"], period=rsi_period)
-df = df.dropna().reset_index(drop=True)
-
-strategies = [
-    {"name": "Mean Reversion", "mode": "mean_reversion", "lower": lower_thresh, "exit_level": exit_level},
-    {"name": "Overbought Reversal", "mode": "overbought_reversal", "upper": upper_thresh, "exit_level": exit_level},
-    {"name": "Trend-follow RSI", "mode": "trend_follow_rsi"},
-]
-
-results, trades_tables = {}, {}
-for s in strategies:
-    summary, trades_df = backtest_simple_strategy(df, df["rsi"], s)
-    results[s["name"]] = summary
-    trades_tables[s["name"]] = trades_df
-
-regime, metrics = tag_market_regime(df)
+strategies = strategy_configs(lower_thresh, upper_thresh, exit_level)
+results, trades_tables = compute_strategies(
+    market, period, timeframe, rsi_period, lower_thresh, upper_thresh, exit_level
+)
 status_msg.success("Analysis complete.")
 
 # -------------------------
@@ -171,15 +197,37 @@ for i, s in enumerate(strategies):
         st.metric(label="Win Rate (%)", value=f"{summ['win_rate_pct']:.2f}")
         st.write(f"Avg trade PnL (%): {summ['avg_pnl_pct']:.2f}")
         st.write(f"Max Drawdown (%): {summ['max_drawdown_pct']:.2f}")
+        st.write(f"Sharpe / Sortino: {format_ratio(summ['sharpe'])} / {format_ratio(summ['sortino'])}")
+        st.write(f"Profit factor: {format_ratio(summ['profit_factor'])}")
 
 st.markdown("### Price & RSI Chart (Interactive)")
 
 # -------------------------
 # Price Chart + Markers
 # -------------------------
+# Charts get about one point per pixel: the selected window is cut from the
+# full-resolution frame and then downsampled, so narrowing the window shows
+# more detail. Trade markers are drawn exactly.
+fit_width = st.session_state["chart_fit_width"]
+chart_width = chart_width_px(PAGE_LAYOUT, st.session_state["chart_width_px"])
+chart_points = target_points(chart_width)
+wall_times = df["timestamp"].dt.tz_localize(None) if df["timestamp"].dt.tz is not None else df["timestamp"]
+t_first, t_last = wall_times.iloc[0].to_pydatetime(), wall_times.iloc[-1].to_pydatetime()
+bar_step = wall_times.diff().median()
+chart_window = st.slider(
+    "Chart window", min_value=t_first, max_value=t_last, value=(t_first, t_last),
+    step=bar_step.to_pytimedelta() if pd.notna(bar_step) and bar_step > pd.Timedelta(0) else None,
+)
+win_lo, win_hi = window_slice(df["timestamp"], *chart_window)
+chart_df = df.iloc[win_lo:win_hi]
+price_idx = downsample_indices(chart_df["timestamp"], chart_df["close"], chart_points, method="minmax")
+rsi_idx = downsample_indices(chart_df["timestamp"], chart_df["rsi"], chart_points, method="lttb")
+x_range = [chart_df["timestamp"].iloc[0], chart_df["timestamp"].iloc[-1]] if len(chart_df) else None
+
 fig = go.Figure()
-fig.add_trace(go.Scatter(x=df["timestamp"], y=df["close"], name="Price (Close)"))
-fig.update_layout(height=500, xaxis_title="Time", yaxis_title="Price")
+fig.add_trace(go.Scatter(x=chart_df["timestamp"].iloc[price_idx], y=chart_df["close"].iloc[price_idx], name="Price (Close)"))
+fig.update_layout(height=500, xaxis_title="Time", yaxis_title="Price", xaxis_range=x_range,
+                  width=None if fit_width else chart_width)
 
 selected_strategy = st.selectbox("Select strategy for trade markers", [s["name"] for s in strategies])
 trades_df_plot = trades_tables[selected_strategy]
@@ -198,16 +246,17 @@ if not trades_df_plot.empty:
         marker=dict(symbol="triangle-down", size=10, color="red"),
         name="Exits",
     ))
-st.plotly_chart(fig, use_container_width=True)
+st.plotly_chart(fig, use_container_width=fit_width)
 
 # RSI Panel
 fig2 = go.Figure()
-fig2.add_trace(go.Scatter(x=df["timestamp"], y=df["rsi"], name="RSI"))
+fig2.add_trace(go.Scatter(x=chart_df["timestamp"].iloc[rsi_idx], y=chart_df["rsi"].iloc[rsi_idx], name="RSI"))
 fig2.add_hline(y=lower_thresh, line_dash="dash", annotation_text="Lower")
 fig2.add_hline(y=upper_thresh, line_dash="dash", annotation_text="Upper")
 fig2.add_hline(y=exit_level, line_dash="dot", annotation_text="Exit")
-fig2.update_layout(height=250, yaxis_title="RSI")
-st.plotly_chart(fig2, use_container_width=True)
+fig2.update_layout(height=250, yaxis_title="RSI", xaxis_range=x_range,
+                   width=None if fit_width else chart_width)
+st.plotly_chart(fig2, use_container_width=fit_width)
 
 # -------------------------
 # Trades Tables (no disk writes)
@@ -14,14 +14,20 @@ import plotly.graph_objs as go
 import os
 from datetime import datetime, timedelta
 
+from utils.downsample import LAYOUT_WIDTH_PX, chart_width_px, target_points, downsample_indices, window_slice
 from utils.strategies import (
     rsi,
     compute_returns_from_trades,
     backtest_simple_strategy,
     tag_market_regime,
+    format_ratio,
 )
+from utils.results import ResultSink
+from utils.tradestore import TradeStore, combo_name
 
-st.set_page_config(layout="wide", page_title="RSI Strategy Analyzer (Auto-run)")
+PAGE_LAYOUT = "wide"
+st.set_page_config(layout=PAGE_LAYOUT, page_title="RSI Strategy Analyzer (Auto-run)")
+COMPUTE_CACHE_ENTRIES = 32  # cached (ticker, interval, parameters) results kept in memory
 
 # -------------------------
 # Helper functions
@@ -44,6 +50,35 @@ def fetch_data_yfinance(ticker, period="60d", interval="1h"):
     df.columns = ['open','high','low','close','volume','timestamp']
     return df
 
+# Compute stages, cached by their scalar inputs so reruns that only change the
+# display (e.g. the trade-marker strategy) don't recompute anything. Moving a
+# threshold slider reruns only the strategies, not RSI or the regime tag.
+@st.cache_data(max_entries=COMPUTE_CACHE_ENTRIES)
+def compute_rsi_frame(ticker, period, interval, rsi_period):
+    df = fetch_data_yfinance(ticker, period=period, interval=interval)
+    df['rsi'] = rsi(df['close'], period=rsi_period)
+    df = df.dropna().reset_index(drop=True)
+    regime, metrics = tag_market_regime(df)
+    return df, regime, metrics
+
+def strategy_configs(lower_thresh, upper_thresh, exit_level):
+    return [
+        {'name':'Mean Reversion', 'mode':'mean_reversion', 'lower': lower_thresh, 'exit_level': exit_level},
+        {'name':'Overbought Reversal', 'mode':'overbought_reversal', 'upper': upper_thresh, 'exit_level': exit_level},
+        {'name':'Trend-follow RSI', 'mode':'trend_follow_rsi'}
+    ]
+
+@st.cache_data(max_entries=COMPUTE_CACHE_ENTRIES)
+def compute_strategies(ticker, period, interval, rsi_period, lower_thresh, upper_thresh, exit_level):
+    df, _, _ = compute_rsi_frame(ticker, period, interval, rsi_period)
+    results = {}
+    trades_tables = {}
+    for s in strategy_configs(lower_thresh, upper_thresh, exit_level):
+        summary, trades_df = backtest_simple_strategy(df, df['rsi'], s)
+        results[s['name']] = summary
+        trades_tables[s['name']] = trades_df
+    return results, trades_tables
+
 # -------------------------
 # Streamlit UI
 # -------------------------
@@ -63,6 +98,13 @@ with st.sidebar:
     lower_thresh = st.slider("Lower threshold (buy for mean reversion)", 5, 45, 30)
     upper_thresh = st.slider("Upper threshold (short for reversal)", 55, 95, 70)
     exit_level = st.slider("Exit level (mid)", 30, 70, 50)
+    st.subheader("Chart")
+    # the point budget follows the width the charts are drawn at (kept in session state)
+    st.checkbox("Fit charts to page width", value=True, key="chart_fit_width")
+    st.slider("Chart width (px)", 400, 3000, LAYOUT_WIDTH_PX[PAGE_LAYOUT], step=100, key="chart_width_px",
+              help="Width the charts are drawn at, or your page width when they fit the page. "
+                   "About one point per pixel is plotted.")
+    save_run = st.button("Save run to results/")
 
 st.markdown("""
 This demo evaluates **3 RSI-based strategies** across the chosen market and timeframe.
@@ -76,31 +118,15 @@ status_msg = st.empty()
 status_msg.info("Fetching data and computing results... (this runs automatically on input changes)")
 
 try:
-    df = fetch_data_yfinance(market, period=period, interval=timeframe)
+    df, regime, metrics = compute_rsi_frame(market, period, timeframe, rsi_period)
 except Exception as e:
     st.error(f"Data fetch failed: {e}")
     st.stop()
 
-df['rsi'] = rsi(df['close'], period=rsi_period)
-df = df.dropna().reset_index(drop=True)
-
-strategies = [
-    {'name':'Mean Reversion', 'mode':'mean_reversion', 'lower': lower_thresh, 'exit_level': exit_level},
-    {'name':'Overbought Reversal', 'mode':'overbought_reversal', 'upper': upper_thresh, 'exit_level': exit_level},
-    {'name':'Trend-follow RSI', 'mode':'trend_follow_rsi'}
-]
-
-results = {}
-trades_tables = {}
-for s in strategies:
-    cfg = s.copy()
-    cfg['mode'] = s['mode']
-    summary, trades_df = backtest_simple_strategy(df, df['rsi'], cfg)
-    results[s['name']] = summary
-    trades_tables[s['name']] = trades_df
-
-regime, metrics = tag_market_regime(df)
-
+strategies = strategy_configs(lower_thresh, upper_thresh, exit_level)
+results, trades_tables = compute_strategies(
+    market, period, timeframe, rsi_period, lower_thresh, upper_thresh, exit_level
+)
 
 
 # Sidebar banner (persistent while scrolling)
@@ -117,67 +143,73 @@ status_msg.success("Analysis complete.")
 
 
 # -------------------------
-# Phase 1: Persist run summary + trade logs to CSV files
-# Insert immediately AFTER computing `results`, `trades_tables`, and `regime, metrics`
+# Phase 1: Persist run summary + trade logs (only when "Save run" is clicked)
 # -------------------------
 
-# ensure results folder exists
-os.makedirs("results", exist_ok=True)
-
-# Basic metadata for this run
-run_meta = {
-    "run_ts": datetime.utcnow().isoformat(),
-    "market": market,
-    "timeframe": timeframe,
-    "rsi_period": int(rsi_period),
-    "lower_thresh": int(lower_thresh),
-    "upper_thresh": int(upper_thresh),
-    "exit_level": int(exit_level),
-    "regime": regime,
-    "volatility": float(metrics.get("vol", np.nan)),
-    "trend_slope": float(metrics.get("trend", np.nan)),
-    "bars": int(len(df)),
-    "start_time": df['timestamp'].iloc[0].isoformat() if len(df)>0 else None,
-    "end_time": df['timestamp'].iloc[-1].isoformat() if len(df)>0 else None
-}
+if save_run:
+    # ensure results folder exists
+    os.makedirs("results", exist_ok=True)
+
+    # Basic metadata for this run
+    run_meta = {
+        "run_ts": datetime.utcnow().isoformat(),
+        "market": market,
+        "timeframe": timeframe,
+        "rsi_period": int(rsi_period),
+        "lower_thresh": int(lower_thresh),
+        "upper_thresh": int(upper_thresh),
+        "exit_level": int(exit_level),
+        "regime": regime,
+        "volatility": float(metrics.get("vol", np.nan)),
+        "trend_slope": float(metrics.get("trend", np.nan)),
+        "bars": int(len(df)),
+        "start_time": df['timestamp'].iloc[0].isoformat() if len(df)>0 else None,
+        "end_time": df['timestamp'].iloc[-1].isoformat() if len(df)>0 else None
+    }
 
-# Build a single-row summary DataFrame for all strategies (one row per strategy)
-summary_rows = []
-for s_name, summ in results.items():
-    row = run_meta.copy()
-    row.update({
-        "strategy": s_name,
-        "total_trades": int(summ.get("total_trades", 0)),
-        "total_pnl_pct": float(summ.get("total_pnl_pct", 0.0)),
-        "avg_pnl_pct": float(summ.get("avg_pnl_pct", 0.0)),
-        "win_rate_pct": float(summ.get("win_rate_pct", 0.0)),
-        "max_drawdown_pct": float(summ.get("max_drawdown_pct", 0.0)),
-    })
-    summary_rows.append(row)
-
-summary_df = pd.DataFrame(summary_rows)
-
-# Append summary to master results CSV
-results_path = os.path.join("results", "rsi_strategy_results.csv")
-summary_df.to_csv(results_path, mode="a", index=False, header=not os.path.exists(results_path))
-
-# Also save trade logs for each strategy (append if file exists)
-for s_name, trades_df in trades_tables.items():
-    # add run meta to trades table for traceability
-    if not trades_df.empty:
-        trades_copy = trades_df.copy()
-        trades_copy["market"] = market
-        trades_copy["timeframe"] = timeframe
-        trades_copy["rsi_period"] = int(rsi_period)
-        trades_copy["strategy"] = s_name
-        trades_copy["run_ts"] = run_meta["run_ts"]
-        # filename safe strategy name
-        safe_name = s_name.replace(" ", "_").lower()
-        trades_path = os.path.join("results", f"trade_logs_{market}_{timeframe}_{safe_name}.csv")
-        trades_copy.to_csv(trades_path, mode="a", index=False, header=not os.path.exists(trades_path))
-
-# Small UI confirmation
-st.success(f"Saved run summary to `{results_path}` and trade logs to `results/`.")
+    # Build a single-row summary DataFrame for all strategies (one row per strategy)
+    summary_rows = []
+    for s_name, summ in results.items():
+        row = run_meta.copy()
+        row.update({
+            "strategy": s_name,
+            "total_trades": int(summ.get("total_trades", 0)),
+            "total_pnl_pct": float(summ.get("total_pnl_pct", 0.0)),
+            "avg_pnl_pct": float(summ.get("avg_pnl_pct", 0.0)),
+            "win_rate_pct": float(summ.get("win_rate_pct", 0.0)),
+            "max_drawdown_pct": float(summ.get("max_drawdown_pct", 0.0)),
+        })
+        summary_rows.append(row)
+
+    summary_df = pd.DataFrame(summary_rows)
+
+    # Append summary to master results CSV (one bulk write for all strategies)
+    results_path = os.path.join("results", "rsi_strategy_results.csv")
+    with ResultSink(results_path, summary_df.columns) as sink:
+        sink.extend(summary_rows)
+
+    # Also save trade logs for each strategy to the trade store; a rerun with the
+    # same parameters replaces that combination's trades instead of appending
+    trade_store = TradeStore(os.path.join("results", "trades"))
+    store_tables = []
+    for s in strategies:
+        lower = s.get('lower', np.nan)
+        upper = s.get('upper', np.nan)
+        exit_lvl = s.get('exit_level', 50)
+        meta = {
+            "combo": combo_name(s['name'], int(rsi_period), lower, upper, exit_lvl),
+            "strategy": s['name'],
+            "rsi_period": int(rsi_period),
+            "lower": lower,
+            "upper": upper,
+            "exit_level": exit_lvl,
+            "run_ts": run_meta["run_ts"],
+        }
+        store_tables.append((meta, trades_tables[s['name']]))
+    trade_store.write_partition(market, timeframe, store_tables)
+
+    # Small UI confirmation
+    st.success(f"Saved run summary to `{results_path}` and trade logs to `{trade_store.root}/`.")
 
 
 # Market condition banner — high visibility
@@ -250,12 +282,34 @@ for i, s in enumerate(strategies):
         st.metric(label="Win Rate (%)", value=f"{summ['win_rate_pct']:.2f}")
         st.write(f"Avg trade PnL (%): {summ['avg_pnl_pct']:.2f}")
         st.write(f"Max Drawdown (%): {summ['max_drawdown_pct']:.2f}")
+        st.write(f"Sharpe / Sortino: {format_ratio(summ['sharpe'])} / {format_ratio(summ['sortino'])}")
+        st.write(f"Profit factor: {format_ratio(summ['profit_factor'])}")
 
 st.markdown("### Price & RSI chart (interactive)")
 
+# Charts get about one point per pixel: the selected window is cut from the
+# full-resolution frame and then downsampled, so narrowing the window shows
+# more detail. Trade markers are drawn exactly.
+fit_width = st.session_state["chart_fit_width"]
+chart_width = chart_width_px(PAGE_LAYOUT, st.session_state["chart_width_px"])
+chart_points = target_points(chart_width)
+wall_times = df["timestamp"].dt.tz_localize(None) if df["timestamp"].dt.tz is not None else df["timestamp"]
+t_first, t_last = wall_times.iloc[0].to_pydatetime(), wall_times.iloc[-1].to_pydatetime()
+bar_step = wall_times.diff().median()
+chart_window = st.slider(
+    "Chart window", min_value=t_first, max_value=t_last, value=(t_first, t_last),
+    step=bar_step.to_pytimedelta() if pd.notna(bar_step) and bar_step > pd.Timedelta(0) else None,
+)
+win_lo, win_hi = window_slice(df["timestamp"], *chart_window)
+chart_df = df.iloc[win_lo:win_hi]
+price_idx = downsample_indices(chart_df["timestamp"], chart_df["close"], chart_points, method="minmax")
+rsi_idx = downsample_indices(chart_df["timestamp"], chart_df["rsi"], chart_points, method="lttb")
+x_range = [chart_df["timestamp"].iloc[0], chart_df["timestamp"].iloc[-1]] if len(chart_df) else None
+
 fig = go.Figure()
-fig.add_trace(go.Scatter(x=df['timestamp'], y=df['close'], name='Price (close)'))
-fig.update_layout(height=500, xaxis_title="Time", yaxis_title="Price")
+fig.add_trace(go.Scatter(x=chart_df['timestamp'].iloc[price_idx], y=chart_df['close'].iloc[price_idx], name='Price (close)'))
+fig.update_layout(height=500, xaxis_title="Time", yaxis_title="Price", xaxis_range=x_range,
+                  width=None if fit_width else chart_width)
 
 selected_strategy_for_plot = st.selectbox("Select strategy to show trade markers", options=[s['name'] for s in strategies])
 trades_df_plot = trades_tables[selected_strategy_for_plot]
@@ -276,16 +330,17 @@ if not trades_df_plot.empty:
     )
     fig.add_trace(entry_markers)
     fig.add_trace(exit_markers)
-st.plotly_chart(fig, use_container_width=True)
+st.plotly_chart(fig, use_container_width=fit_width)
 
 # RSI panel
 fig2 = go.Figure()
-fig2.add_trace(go.Scatter(x=df['timestamp'], y=df['rsi'], name='RSI'))
+fig2.add_trace(go.Scatter(x=chart_df['timestamp'].iloc[rsi_idx], y=chart_df['rsi'].iloc[rsi_idx], name='RSI'))
 fig2.add_hline(y=lower_thresh, line_dash="dash", annotation_text="Lower")
 fig2.add_hline(y=upper_thresh, line_dash="dash", annotation_text="Upper")
 fig2.add_hline(y=exit_level, line_dash="dot", annotation_text="Exit")
-fig2.update_layout(height=250, yaxis_title="RSI")
-st.plotly_chart(fig2, use_container_width=True)
+fig2.update_layout(height=250, yaxis_title="RSI", xaxis_range=x_range,
+                   width=None if fit_width else chart_width)
+st.plotly_chart(fig2, use_container_width=fit_width)
 
 
 # --- Market condition tagging ---
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Materialized aggregates over the results history (rsi_strategy_results.csv).
+
+Summary rows are folded into one "cell" per (market, timeframe, regime,
+strategy, rsi_period, lower, upper) holding run counts and metric sums.
+Any coarser average (per regime, per timeframe, parameter grids) is a sum
+over cells, so queries never rescan the history.
+
+refresh() reads only the bytes appended since the last refresh, so it can be
+called after every batch flush or app run. Cells are saved to
+<agg_dir>/cells.csv (with ready-made mean_* columns for dashboards) and the
+read offset to <agg_dir>/state.json.
+"""
+
+import io
+import os
+import json
+import numpy as np
+import pandas as pd
+
+KEY_COLUMNS = ["market", "timeframe", "regime", "strategy", "rsi_period", "lower", "upper"]
+METRIC_COLUMNS = ["total_trades", "total_pnl_pct", "avg_pnl_pct", "win_rate_pct", "max_drawdown_pct"]
+
+# the app's layout names the thresholds lower_thresh/upper_thresh and fills
+# both for every strategy; only the one a strategy trades on is a grid key
+APP_THRESHOLDS = [("lower", "lower_thresh", "Mean Reversion"),
+                  ("upper", "upper_thresh", "Overbought Reversal")]
+
+def _normalize(rows):
+    rows = rows.copy()
+    for col, app_col, strategy in APP_THRESHOLDS:
+        if col not in rows.columns:
+            rows[col] = np.nan
+        if app_col in rows.columns and "strategy" in rows.columns:
+            fill = rows[col].isna() & (rows["strategy"] == strategy)
+            rows.loc[fill, col] = rows.loc[fill, app_col]
+    # columns a layout lacks are left empty instead of failing the refresh
+    missing = [c for c in KEY_COLUMNS + METRIC_COLUMNS + ["run_ts"] if c not in rows.columns]
+    return rows.reindex(columns=list(rows.columns) + missing)
+
+def _fold(rows):
+    # history rows -> cells (runs, sum_<metric>, best/last pnl)
+    rows = _normalize(rows)
+    for col in METRIC_COLUMNS + ["rsi_period", "lower", "upper"]:
+        rows[col] = pd.to_numeric(rows[col], errors="coerce")
+    # rows from a different column layout don't parse; leave them out
+    rows = rows.dropna(subset=METRIC_COLUMNS + ["rsi_period"])
+    grouped = rows.groupby(KEY_COLUMNS, dropna=False, sort=False)
+    cells = grouped[METRIC_COLUMNS].sum().add_prefix("sum_")
+    cells.insert(0, "runs", grouped.size())
+    cells["best_total_pnl_pct"] = grouped["total_pnl_pct"].max()
+    cells["last_run_ts"] = grouped["run_ts"].max()
+    return cells.reset_index()
+
+def _merge(a, b):
+    if a is None or a.empty:
+        return b
+    both = pd.concat([a, b], ignore_index=True)
+    grouped = both.groupby(KEY_COLUMNS, dropna=False, sort=True)
+    sums = ["runs"] + [f"sum_{m}" for m in METRIC_COLUMNS]
+    cells = grouped[sums].sum()
+    cells["best_total_pnl_pct"] = grouped["best_total_pnl_pct"].max()
+    cells["last_run_ts"] = grouped["last_run_ts"].max()
+    return cells.reset_index()
+
+def _filter(df, filters):
+    for col, value in filters.items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        df = df[df[col].isin(values)]
+    return df
+
+class ResultAggregates:
+
+    def __init__(self, summary_path=os.path.join("results", "rsi_strategy_results.csv"),
+                 agg_dir=os.path.join("results", "aggregates")):
+        self.summary_path = summary_path
+        self.agg_dir = agg_dir
+        self.cells_path = os.path.join(agg_dir, "cells.csv")
+        self.state_path = os.path.join(agg_dir, "state.json")
+        self._cells = None
+        self._cells_mtime = None
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {"offset": 0}
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def refresh(self, rebuild=False):
+        """
+        Fold rows appended to the summary CSV since the last refresh into the
+        cells. Rebuilds from scratch if the CSV shrank or its header changed
+        (rewritten or replaced).
+        Returns the number of rows folded in.
+        """
+        if not os.path.exists(self.summary_path):
+            return 0
+        state = {"offset": 0} if rebuild else self._load_state()
+        size = os.path.getsize(self.summary_path)
+        with open(self.summary_path, "rb") as f:
+            header = f.readline()
+            # a new column layout rewrites the file, so offsets no longer apply
+            if size < state["offset"] or (state["offset"] and state.get("header") != header.decode()):
+                state = {"offset": 0}
+            f.seek(max(state["offset"], len(header)))
+            data = f.read()
+        # only complete lines; a partial last row is picked up next time
+        data = data[:data.rfind(b"\n") + 1]
+        if not data:
+            return 0
+        rows = pd.read_csv(io.BytesIO(header + data), on_bad_lines="skip")
+        cells = None if state["offset"] == 0 else self.cells()
+        cells = _merge(cells, _fold(rows))
+        self._save(cells, {"offset": max(state["offset"], len(header)) + len(data),
+                           "header": header.decode()})
+        return len(rows)
+
+    def _save(self, cells, state):
+        os.makedirs(self.agg_dir, exist_ok=True)
+        out = cells.copy()
+        for m in METRIC_COLUMNS:
+            out[f"mean_{m}"] = out[f"sum_{m}"] / out["runs"]
+        tmp = self.cells_path + ".tmp"
+        out.to_csv(tmp, index=False)
+        os.replace(tmp, self.cells_path)
+        # offset is saved after the cells, so a crash in between refolds rather than drops rows
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+        self._cells, self._cells_mtime = None, None
+
+    def cells(self):
+        """The cell table (re-read only when cells.csv has changed)."""
+        if not os.path.exists(self.cells_path):
+            return pd.DataFrame(columns=KEY_COLUMNS + ["runs"] + [f"sum_{m}" for m in METRIC_COLUMNS]
+                                + ["best_total_pnl_pct", "last_run_ts"])
+        mtime = os.path.getmtime(self.cells_path)
+        if self._cells is None or mtime != self._cells_mtime:
+            cells = pd.read_csv(self.cells_path)
+            self._cells = cells.drop(columns=[c for c in cells.columns if c.startswith("mean_")])
+            self._cells_mtime = mtime
+        return self._cells
+
+    def averages(self, by, metrics=METRIC_COLUMNS, **filters):
+        """Mean of each metric per group of `by` columns, over matching cells."""
+        by = [by] if isinstance(by, str) else list(by)
+        cells = _filter(self.cells(), filters)
+        sums = cells.groupby(by, dropna=False)[["runs"] + [f"sum_{m}" for m in metrics]].sum()
+        out = pd.DataFrame({"runs": sums["runs"]})
+        for m in metrics:
+            out[m] = sums[f"sum_{m}"] / sums["runs"]
+        return out.reset_index()
+
+    def top_n(self, n=10, metric="total_pnl_pct", ascending=False, **filters):
+        """Best parameter combinations by their mean `metric` across runs."""
+        cells = _filter(self.cells(), filters)
+        out = cells[KEY_COLUMNS + ["runs", "best_total_pnl_pct", "last_run_ts"]].copy()
+        for m in METRIC_COLUMNS:
+            out[m] = cells[f"sum_{m}"] / cells["runs"]
+        return out.sort_values(metric, ascending=ascending).head(n).reset_index(drop=True)
+
+    def regime_averages(self, by=("regime", "strategy"), **filters):
+        return self.averages(by, **filters)
+
+    def heatmap(self, x="rsi_period", y="lower", metric="total_pnl_pct", **filters):
+        """
+        Parameter grid of the mean `metric`: rows are `y` values, columns `x`
+        values, e.g. heatmap(strategy="Mean Reversion", market="BTCUSDT").
+        """
+        grid = self.averages([y, x], metrics=[metric], **filters)
+        grid = grid.dropna(subset=[x, y])
+        return grid.pivot(index=y, columns=x, values=metric)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Post-hoc trading costs on an existing trades table.
+
+Trades are backtested once without costs; fees, spread and slippage are then
+applied to their entry/exit prices with array maths for a whole vector of
+cost scenarios at once, and the summarize_trades() metrics are recomputed per
+(scenario, combination).
+
+A scenario has:
+- fee_pct: commission per side, in % of the traded notional
+- slippage_pct: adverse fill per side, in % of the price
+- spread_pips: bid/ask spread in pips, a number for every market or a
+  {market: pips} dict; half of it is paid on each side (PIP_SIZES below,
+  a market without one raises ValueError when a spread is charged)
+
+For one trade with direction d (+1 long, -1 short):
+    entry' = entry + d * (spread / 2 + entry * slippage)
+    exit'  = exit  - d * (spread / 2 + exit * slippage)
+    pnl    = d * (exit' - entry') / entry' * 100 - fee_pct * (1 + exit' / entry')
+With all costs at zero this is the pnl_pct of the trades table.
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+# price size of one spread unit per market: the pip for forex, the exchange tick otherwise
+PIP_SIZES = {
+    # Binance spot (download_data.py)
+    "BTCUSDT": 0.01, "ETHUSDT": 0.01, "SOLUSDT": 0.01, "BNBUSDT": 0.01,
+    # Yahoo Finance (download_data.py)
+    "EURUSD": 0.0001, "EURJPY": 0.01, "XAUUSD": 0.1, "WTIUSD": 0.01, "SPY": 0.01,
+    # tickers the apps save trades under
+    "QQQ": 0.01, "EURUSD=X": 0.0001, "GBPUSD=X": 0.0001, "GC=F": 0.1,
+    "BTC-USD": 0.01, "ETH-USD": 0.01,
+}
+COST_COLUMNS = ["fee_pct", "slippage_pct", "spread_pips"]
+GROUP_COLUMNS = ["market", "timeframe", "combo"]
+
+def pip_size(market, pip_sizes=None):
+    """Pip size of a market from PIP_SIZES or `pip_sizes`; an unknown market is an error."""
+    sizes = {**PIP_SIZES, **(pip_sizes or {})}
+    if market not in sizes:
+        raise ValueError(f"No pip size for market '{market}'; add it to PIP_SIZES or pass "
+                         f"pip_sizes={{'{market}': <size>}}")
+    return sizes[market]
+
+def cost_scenarios(fee_pct=(0.0,), slippage_pct=(0.0,), spread_pips=(0.0,)):
+    """Every combination of the given cost levels as a scenarios DataFrame."""
+    rows = itertools.product(np.atleast_1d(fee_pct), np.atleast_1d(slippage_pct), list(np.atleast_1d(spread_pips)))
+    return pd.DataFrame(list(rows), columns=COST_COLUMNS)
+
+def _scenario_frame(scenarios):
+    df = pd.DataFrame(scenarios).reset_index(drop=True)
+    for col in COST_COLUMNS:
+        if col not in df:
+            df[col] = 0.0
+    return df
+
+def net_pnl(trades_df, scenarios, market=None, pip_sizes=None):
+    """
+    Net pnl_pct of every trade under every scenario, shape (scenarios, trades).
+    Markets come from trades_df['market'] unless `market` is given.
+    """
+    scen = _scenario_frame(scenarios)
+    entry = trades_df["entry_price"].to_numpy(dtype=np.float64)
+    exit_ = trades_df["exit_price"].to_numpy(dtype=np.float64)
+    side = trades_df["side"].to_numpy()
+    d = np.where((side == "long") | (side == 1), 1.0, -1.0)
+
+    markets = np.full(len(trades_df), market, dtype=object) if market is not None else trades_df["market"].to_numpy()
+    codes, uniques = pd.factorize(markets)
+    # spread in price units, per (scenario, market), then gathered per trade
+    spread_pips = np.array([[s.get(m, 0.0) if isinstance(s, dict) else s for m in uniques]
+                            for s in scen["spread_pips"]], dtype=np.float64).reshape(len(scen), len(uniques))
+    # a pip size is only needed (and required) where a spread is charged
+    pips = np.array([pip_size(m, pip_sizes) if spread_pips[:, j].any() else 0.0
+                     for j, m in enumerate(uniques)], dtype=np.float64)
+    half_spread = (spread_pips * pips / 2)[:, codes]
+
+    slip = scen["slippage_pct"].to_numpy(dtype=np.float64)[:, None] / 100
+    fee = scen["fee_pct"].to_numpy(dtype=np.float64)[:, None]
+    entry_eff = entry + d * (half_spread + entry * slip)
+    exit_eff = exit_ - d * (half_spread + exit_ * slip)
+    return d * (exit_eff - entry_eff) / entry_eff * 100 - fee * (1 + exit_eff / entry_eff)
+
+def _group_order(trades_df, by):
+    # trades reordered so every group is contiguous (original order kept
+    # inside a group), plus the group keys and start offsets
+    if not by:
+        codes = np.zeros(len(trades_df), dtype=np.int64)
+        keys = pd.DataFrame(index=[0])
+    else:
+        codes = trades_df.groupby(list(by), sort=False, dropna=False).ngroup().to_numpy()
+        _, first = np.unique(codes, return_index=True)
+        keys = trades_df[list(by)].iloc[first].reset_index(drop=True)
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes, minlength=len(keys))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    return order, keys, counts, starts, codes[order]
+
+def _summaries(pnl, counts, starts, codes):
+    # summarize_trades() metrics of each contiguous group, for every scenario row
+    total = np.add.reduceat(pnl, starts, axis=1)
+    wins = np.add.reduceat(pnl > 0, starts, axis=1)
+    # drawdown on log equity: cumulative sum restarted per group, and a
+    # per-group offset above the previous group's range so the running max
+    # restarts too
+    log_eq = np.cumsum(np.log(np.maximum(1 + pnl / 100, 1e-12)), axis=1)
+    before = np.concatenate([np.zeros((len(pnl), 1)), log_eq[:, :-1]], axis=1)[:, starts]
+    log_eq = log_eq - np.repeat(before, counts, axis=1)
+    span = np.ptp(log_eq) + 1.0 if log_eq.size else 1.0
+    shifted = log_eq + codes * span
+    peak = np.maximum.accumulate(shifted, axis=1) - codes * span
+    drawdown = np.minimum.reduceat(np.expm1(log_eq - peak), starts, axis=1)
+    return {
+        "total_trades": np.broadcast_to(counts, total.shape),
+        "total_pnl_pct": total,
+        "avg_pnl_pct": total / counts,
+        "win_rate_pct": wins / counts * 100,
+        "max_drawdown_pct": drawdown * 100,
+    }
+
+def cost_sensitivity(trades_df, scenarios, by=GROUP_COLUMNS, market=None, pip_sizes=None):
+    """
+    summarize_trades() metrics of every `by` group under every scenario, one
+    row per (scenario, group) with the scenario's cost columns in front.
+    Groups come from the trades, so combinations with no trades are absent.
+    """
+    scen = _scenario_frame(scenarios)
+    by = [c for c in by if c in trades_df.columns]
+    if trades_df.empty or scen.empty:
+        return pd.DataFrame(columns=["scenario", *COST_COLUMNS, *by, "total_trades", "total_pnl_pct",
+                                     "avg_pnl_pct", "win_rate_pct", "max_drawdown_pct"])
+    order, keys, counts, starts, codes = _group_order(trades_df, by)
+    pnl = net_pnl(trades_df.iloc[order], scen, market, pip_sizes)
+    metrics = _summaries(pnl, counts, starts, codes)
+
+    n_s, n_g = len(scen), len(keys)
+    out = scen[COST_COLUMNS].iloc[np.repeat(np.arange(n_s), n_g)].reset_index(drop=True)
+    out.insert(0, "scenario", np.repeat(np.arange(n_s), n_g))
+    out = pd.concat([out, keys.iloc[np.tile(np.arange(n_g), n_s)].reset_index(drop=True)], axis=1)
+    for name, values in metrics.items():
+        out[name] = values.ravel()
+    out["total_trades"] = out["total_trades"].astype(int)
+    return out
+
+def breakeven_fee_pct(trades_df, by=GROUP_COLUMNS):
+    """
+    Per-side fee (in %) at which each group's total_pnl_pct falls to zero,
+    with no spread or slippage. The fee enters every trade linearly, so this is
+    sum(gross pnl) / sum(1 + exit/entry); negative when the group loses
+    money before costs.
+    """
+    by = [c for c in by if c in trades_df.columns]
+    ratio = trades_df["exit_price"].astype(float) / trades_df["entry_price"].astype(float)
+    side = trades_df["side"].to_numpy()
+    d = np.where((side == "long") | (side == 1), 1.0, -1.0)
+    parts = pd.DataFrame({"gross": d * (ratio - 1) * 100, "notional": 1 + ratio})
+    if not by:
+        return parts["gross"].sum() / parts["notional"].sum()
+    sums = parts.groupby([trades_df[c] for c in by], sort=False, dropna=False).sum()
+    return (sums["gross"] / sums["notional"]).rename("breakeven_fee_pct").reset_index()
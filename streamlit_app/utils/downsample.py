@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Shape-preserving downsampling of chart series.
+
+Charts only need about one point per horizontal pixel, so long series are
+reduced before they go to Plotly:
+- lttb_indices():   Largest-Triangle-Three-Buckets, keeps the visual shape
+- minmax_indices(): min and max of each bucket, keeps every spike
+
+Both return sorted row positions into the original series, so the caller
+selects the same rows from any column (timestamps, values, hover data).
+"""
+
+import numpy as np
+import pandas as pd
+
+# main-column width of st.set_page_config layouts on a typical desktop screen,
+# the starting value of the apps' chart width setting
+LAYOUT_WIDTH_PX = {"wide": 1200, "centered": 700}
+
+def chart_width_px(layout="wide", width_px=None):
+    """Width a chart is drawn at: width_px if set, else the page layout's column width."""
+    return int(width_px) if width_px else LAYOUT_WIDTH_PX.get(layout, LAYOUT_WIDTH_PX["wide"])
+
+def target_points(width_px, points_per_px=1.0):
+    return max(int(width_px * points_per_px), 3)
+
+def _as_float(x):
+    x = pd.Series(x) if not isinstance(x, pd.Series) else x
+    if pd.api.types.is_datetime64_any_dtype(x):
+        return x.dt.as_unit("ns").astype("int64").to_numpy(dtype=np.float64)
+    return x.to_numpy(dtype=np.float64)
+
+def lttb_indices(x, y, n_out):
+    """
+    Positions of the n_out points LTTB keeps. The first and last points are
+    always kept; each bucket in between contributes the point forming the
+    largest triangle with the previous pick and the next bucket's mean. The
+    buckets holding the series' minimum and maximum keep those instead, so
+    the plotted range is never clipped.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = _as_float(x)
+
+    # bucket b (0..n_out-3) covers [edges[b], edges[b+1]) of the inner points
+    edges = (np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    # mean of every bucket (and the last point as a final "bucket") from prefix sums
+    cx, cy = np.concatenate([[0.0], np.cumsum(x)]), np.concatenate([[0.0], np.cumsum(y)])
+    starts = np.append(edges[:-1], n - 1)
+    stops = np.append(edges[1:], n)
+    mean_x = (cx[stops] - cx[starts]) / (stops - starts)
+    mean_y = (cy[stops] - cy[starts]) / (stops - starts)
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        bx, by = mean_x[b + 1], mean_y[b + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - bx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (by - ay))
+        a = lo + int(np.argmax(area))
+        out[b + 1] = a
+    for i in (int(np.nanargmin(y)), int(np.nanargmax(y))) if not np.isnan(y).all() else ():
+        if 0 < i < n - 1:
+            out[np.searchsorted(edges, i, side="right")] = i
+    return out
+
+def minmax_indices(y, n_out):
+    """
+    Positions of the minimum and maximum of n_out // 2 equal buckets (plus the
+    first and last point), in time order.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    n_buckets = max((n_out - 2) // 2, 1)
+    if n_out >= n:
+        return np.arange(n)
+    size = -(-n // n_buckets)
+    # pad the last bucket with the last value; a padded pick clips to n - 1
+    padded = np.full(n_buckets * size, y[-1])
+    padded[:n] = y
+    blocks = padded.reshape(n_buckets, size)
+    base = np.arange(n_buckets) * size
+    idx = np.concatenate([[0, n - 1], base + blocks.argmin(axis=1), base + blocks.argmax(axis=1)])
+    return np.unique(np.clip(idx, 0, n - 1))
+
+def downsample_indices(x, y, n_out, method="lttb"):
+    if method == "lttb":
+        return lttb_indices(x, y, n_out)
+    if method == "minmax":
+        return minmax_indices(y, n_out)
+    raise ValueError(f"Unknown downsampling method: {method}")
+
+def window_slice(timestamps, start=None, end=None):
+    """
+    [lo, hi) row range of a sorted timestamp series between start and end
+    (inclusive). Naive bounds are read as wall times in the series' timezone.
+    """
+    ts = pd.Series(timestamps)
+    tz = ts.dt.tz
+
+    def _bound(t):
+        t = pd.Timestamp(t)
+        if tz is not None and t.tzinfo is None:
+            # wall times repeated or skipped by a DST change resolve to the earlier side
+            t = t.tz_localize(tz, ambiguous=True, nonexistent="shift_forward")
+        return t
+
+    lo = 0 if start is None else int(ts.searchsorted(_bound(start), side="left"))
+    hi = len(ts) if end is None else int(ts.searchsorted(_bound(end), side="right"))
+    return lo, hi
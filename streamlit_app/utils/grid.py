@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+The batch grid (RSI periods x strategies x thresholds) as an in-memory API.
+
+    summary, trades = run_grid({("BTCUSDT", "1h"): df})
+
+run_grid() takes DataFrames (or dicts of arrays) with timestamp/close
+columns and returns the summary table the batch backtester writes to
+results/rsi_strategy_results.csv plus one trades table for all grid points,
+without touching disk. backtester/batch_backtest.py runs the same steps per
+task, adding the file loading, indicator cache, process pool and result files.
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.strategies import (
+    backtest_simple_strategy,
+    sweep_thresholds,
+    tag_market_regime,
+    rolling_regime,
+    RISK_COLUMNS,
+)
+from utils.indicators import rsi_multi
+from utils.tradestore import combo_name
+from utils.marketframe import MarketFrame
+
+DEFAULT_GRID = {
+    "rsi_periods": [7, 14, 21],
+    "lower": [30, 25, 20, 15],   # vary only for mean_reversion
+    "upper": [70, 75, 80, 85],   # vary only for overbought_reversal
+    "exit_level": 50,
+    "equity_dtype": np.float64,  # bar-level equity for the risk metrics; float32 halves it
+    "price_dtype": np.float64,   # OHLCV arrays of the MarketFrame; float32 (opt-in) halves them
+}
+
+DEFAULT_STRATEGIES = [
+    {"name": "Mean Reversion",      "mode": "mean_reversion"},
+    {"name": "Overbought Reversal", "mode": "overbought_reversal"},
+    {"name": "Trend-follow RSI",    "mode": "trend_follow_rsi"},
+]
+
+# bump when summary columns or metric definitions change, so --incremental
+# runs recompute rows written under the old schema
+RESULT_SCHEMA_VERSION = 1
+
+SUMMARY_COLUMNS = [
+    "run_ts","market","timeframe","rsi_period","lower","upper",
+    "strategy","total_trades","total_pnl_pct","avg_pnl_pct",
+    "win_rate_pct","max_drawdown_pct","regime","volatility","trend_slope",
+    "bars","start_time","end_time"
+] + RISK_COLUMNS
+
+COMBO_COLUMNS = ["market", "timeframe", "strategy", "rsi_period", "lower", "upper", "combo"]
+MIN_BARS = 20  # frames shorter than this after dropping NaNs are skipped
+
+def strategy_points(strat, grid=None):
+    # (lower, upper) points run for one strategy
+    grid = grid or DEFAULT_GRID
+    mode = strat["mode"]
+    if mode == "mean_reversion":
+        return [(lower, np.nan) for lower in grid["lower"]]
+    if mode == "overbought_reversal":
+        return [(np.nan, upper) for upper in grid["upper"]]
+    if mode == "trend_follow_rsi":
+        return [(np.nan, np.nan)]
+    return []
+
+def rsi_frame(df, rsi_values):
+    """
+    df with an 'rsi' column and NaN rows dropped; None if under MIN_BARS bars
+    remain. A MarketFrame shares its arrays with df (the RSI warm-up is cut
+    with a slice); a DataFrame is copied.
+    """
+    if isinstance(df, MarketFrame):
+        df2 = df.with_columns(rsi=rsi_values).dropna()
+    else:
+        df2 = df.copy()
+        df2["rsi"] = rsi_values
+        df2 = df2.dropna().reset_index(drop=True)
+    return df2 if len(df2) >= MIN_BARS else None
+
+def tag_regimes(df2):
+    """
+    Whole-frame regime (label, metrics) from tag_market_regime; also adds the
+    per-bar 'regime' column used to tag each trade with the regime at its entry.
+    """
+    regime, metrics = tag_market_regime(df2)
+    df2["regime"] = rolling_regime(df2)["regime"].array
+    return regime, metrics
+
+def backtest_strategy(df2, strat, grid=None):
+    """
+    Every grid point of one strategy on a frame from rsi_frame/tag_regimes.
+    Returns [(lower, upper, summary, trades_df)] in strategy_points order;
+    thresholds are swept in one RSI scan. Trades are tagged with the regime
+    at their entry bar, taken by bar index (timestamps may repeat).
+    """
+    grid = grid or DEFAULT_GRID
+    mode, exit_level = strat["mode"], grid["exit_level"]
+    equity_dtype = grid.get("equity_dtype", np.float64)
+    runs = []
+    if mode == "mean_reversion":
+        # Only vary lower threshold (all thresholds from one RSI scan)
+        swept = sweep_thresholds(df2, df2["rsi"], mode, grid["lower"], (exit_level,), equity_dtype, True)
+        runs = [(lower, np.nan, *swept[(lower, exit_level)]) for lower in grid["lower"]]
+    elif mode == "overbought_reversal":
+        # Only vary upper threshold (all thresholds from one RSI scan)
+        swept = sweep_thresholds(df2, df2["rsi"], mode, grid["upper"], (exit_level,), equity_dtype, True)
+        runs = [(np.nan, upper, *swept[(upper, exit_level)]) for upper in grid["upper"]]
+    elif mode == "trend_follow_rsi":
+        runs = [(np.nan, np.nan, *backtest_simple_strategy(
+            df2, df2["rsi"], {"mode": mode, "equity_dtype": equity_dtype}, return_indices=True))]
+
+    # tag trades with the regime at their entry bar
+    if "regime" in df2:
+        for _, _, _, trades_df, (entry_idx, _, _) in runs:
+            if not trades_df.empty:
+                trades_df["entry_regime"] = np.asarray(df2["regime"].take(entry_idx))
+    return [run[:4] for run in runs]
+
+def summary_row(run_ts, market, timeframe, rsi_period, lower, upper, strat_name,
+                summary, regime, metrics, df2):
+    return {
+        "run_ts": run_ts,
+        "market": market,
+        "timeframe": timeframe,
+        "rsi_period": rsi_period,
+        "lower": lower,
+        "upper": upper,
+        "strategy": strat_name,
+        "total_trades": summary.get("total_trades", 0),
+        "total_pnl_pct": summary.get("total_pnl_pct", 0.0),
+        "avg_pnl_pct": summary.get("avg_pnl_pct", 0.0),
+        "win_rate_pct": summary.get("win_rate_pct", 0.0),
+        "max_drawdown_pct": summary.get("max_drawdown_pct", 0.0),
+        "regime": regime,
+        "volatility": metrics.get("vol", np.nan),
+        "trend_slope": metrics.get("trend", np.nan),
+        "bars": len(df2),
+        "start_time": df2["timestamp"].iloc[0].isoformat(),
+        "end_time": df2["timestamp"].iloc[-1].isoformat(),
+        **{col: summary.get(col, np.nan) for col in RISK_COLUMNS},
+    }
+
+def _frame_items(frames):
+    # {(market, timeframe) or name: DataFrame or dict of arrays} -> [(market, timeframe, df)]
+    items = frames.items() if isinstance(frames, dict) else frames
+    out = []
+    for key, data in items:
+        market, timeframe = key if isinstance(key, tuple) else (key, None)
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+        missing = {"timestamp", "close"} - set(df.columns)
+        if missing:
+            raise ValueError(f"{key}: missing column(s) {sorted(missing)}")
+        df = df.assign(timestamp=pd.to_datetime(df["timestamp"]))
+        out.append((market, timeframe, df.sort_values("timestamp").dropna().reset_index(drop=True)))
+    return out
+
+def run_grid(frames, grid=None, strategies=None, run_ts=None):
+    """
+    Backtest every (frame, rsi_period, strategy, threshold) point in memory.
+
+    frames: {(market, timeframe): df} (a plain key is used as the market), or
+    a list of (key, df) pairs. Each df needs timestamp and close columns; a
+    dict of arrays works too. grid defaults to DEFAULT_GRID and strategies to
+    DEFAULT_STRATEGIES. Frames are backtested as MarketFrames with
+    grid["price_dtype"] prices, like the batch.
+
+    Returns (summary_df, trades_df): summary rows in SUMMARY_COLUMNS, and the
+    trades of all grid points with COMBO_COLUMNS in front.
+    """
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    strategies = strategies or DEFAULT_STRATEGIES
+    run_ts = run_ts or datetime.utcnow().isoformat()
+
+    rows, trade_parts = [], []
+    for market, timeframe, df in _frame_items(frames):
+        columns = rsi_multi(df["close"], grid["rsi_periods"])
+        frame = MarketFrame.from_frame(df, grid["price_dtype"])
+        for rsi_period in grid["rsi_periods"]:
+            df2 = rsi_frame(frame, columns[rsi_period].to_numpy())
+            if df2 is None:
+                continue
+            regime, metrics = tag_regimes(df2)
+            for strat in strategies:
+                for lower, upper, summary, trades_df in backtest_strategy(df2, strat, grid):
+                    rows.append(summary_row(run_ts, market, timeframe, rsi_period, lower, upper,
+                                            strat["name"], summary, regime, metrics, df2))
+                    combo = {"market": market, "timeframe": timeframe, "strategy": strat["name"],
+                             "rsi_period": rsi_period, "lower": lower, "upper": upper,
+                             "combo": combo_name(strat["name"], rsi_period, lower, upper,
+                                                 grid["exit_level"])}
+                    trade_parts.append(trades_df.assign(**combo))
+
+    summary_df = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+    if trade_parts:
+        trades_df = pd.concat([t for t in trade_parts if not t.empty] or trade_parts[:1],
+                              ignore_index=True)
+    else:
+        trades_df = pd.DataFrame(columns=COMBO_COLUMNS)
+    trades_df = trades_df[COMBO_COLUMNS + [c for c in trades_df.columns if c not in COMBO_COLUMNS]]
+    return summary_df, trades_df
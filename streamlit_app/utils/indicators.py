@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Indicator layer shared by the batch backtester and the apps.
+
+- rsi_multi(): several RSI periods from one shared diff/clip pass.
+- IndicatorCache: on-disk cache of indicator arrays keyed by a hash of the
+  data file plus the indicator parameters, with size-bounded LRU eviction.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+
+def rsi_multi(series, periods):
+    """
+    RSI for every period in `periods`, sharing the diff/clip work.
+    Returns a DataFrame with one column per period, identical to rsi(series, p).
+    """
+    delta = series.diff()
+    up = delta.clip(lower=0)
+    down = -1 * delta.clip(upper=0)
+    out = {}
+    for period in periods:
+        ma_up = up.ewm(alpha=1/period, adjust=False).mean()
+        ma_down = down.ewm(alpha=1/period, adjust=False).mean()
+        rs = ma_up / (ma_down + 1e-9)
+        out[period] = 100 - (100 / (1 + rs))
+    return pd.DataFrame(out, index=series.index)
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    # a columnar store dataset is identified by its meta.json, the version it
+    # points to and its files' sizes and mtimes, so it is never read in full;
+    # any rewrite (see utils/marketstore.py) counts as new data
+    h = hashlib.sha1()
+    if os.path.isdir(path):
+        version = os.path.realpath(path)
+        h.update(os.path.basename(version).encode())
+        for name in sorted(os.listdir(version)):
+            st = os.stat(os.path.join(version, name))
+            h.update(f"{name}:{st.st_size}:{st.st_mtime_ns}".encode())
+        with open(os.path.join(version, "meta.json"), "rb") as f:
+            h.update(f.read())
+        return h.hexdigest()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def indicator_key(data_hash, name, **params):
+    payload = json.dumps({"data": data_hash, "name": name, "params": params}, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+class IndicatorCache:
+    """
+    Directory of .npy files, one per (data hash, indicator, params) key.
+    Reads refresh a file's mtime; writes evict the least recently used files
+    once the directory grows past max_bytes. Writes are atomic, so several
+    worker processes can share one cache directory.
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024**2):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            arr = np.load(path)
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        return arr
+
+    def put(self, key, arr):
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.asarray(arr))
+        os.replace(tmp, self._path(key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def rsi(self, data_hash, close, periods):
+        """
+        RSI arrays {period: np.ndarray} for `close`, loading what is cached for
+        this data hash and computing only the missing periods in one pass.
+        """
+        keys = {p: indicator_key(data_hash, "rsi", period=p, bars=len(close)) for p in periods}
+        out = {}
+        for p, key in keys.items():
+            arr = self.get(key)
+            if arr is not None and len(arr) == len(close):
+                out[p] = arr
+        missing = [p for p in periods if p not in out]
+        if missing:
+            computed = rsi_multi(close, missing)
+            for p in missing:
+                out[p] = computed[p].to_numpy()
+                self.put(keys[p], out[p])
+        return out
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Compact column frame for the batch loop.
+
+A MarketFrame holds int64 nanosecond timestamps and one numpy array per
+column (prices float32 by default). Indicator columns are added next to the
+price arrays instead of being copied in, and dropping a leading run of NaN
+rows (the RSI warm-up) is a slice, so every frame derived from one file
+shares the same base arrays. Columns are served as pandas Series wrapping
+those arrays, so the strategy functions take a MarketFrame wherever they
+take a DataFrame with timestamp/close columns.
+
+Store datasets load as read-only memory maps (see utils/marketstore.py) and
+are only copied when converted to the price dtype.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.marketstore import OHLCV_COLUMNS, dataset_version, read_meta, read_market_arrays
+
+NAT = np.iinfo(np.int64).min
+
+class MarketFrame:
+    def __init__(self, timestamp, columns, tz=None):
+        self.timestamp = np.asarray(timestamp, dtype=np.int64)
+        self.columns = dict(columns)
+        self.tz = tz
+        self._ts = None
+
+    @classmethod
+    def from_frame(cls, df, price_dtype=np.float64):
+        """MarketFrame of a DataFrame with a timestamp column; OHLCV columns become price_dtype."""
+        ts = pd.DatetimeIndex(df["timestamp"])
+        tz = str(ts.tz) if ts.tz is not None else None
+        columns = {c: df[c].to_numpy(dtype=price_dtype) if c in OHLCV_COLUMNS else df[c].to_numpy()
+                   for c in df.columns if c != "timestamp"}
+        return cls(ts.as_unit("ns").asi8, columns, tz)
+
+    @classmethod
+    def from_dataset(cls, path):
+        """MarketFrame over the memory-mapped arrays of a store dataset (float64)."""
+        path = dataset_version(path)
+        arrays = read_market_arrays(path)
+        return cls(arrays["timestamp"], {c: arrays[c] for c in OHLCV_COLUMNS}, read_meta(path)["tz"])
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def __contains__(self, name):
+        return name == "timestamp" or name in self.columns
+
+    def __getitem__(self, name):
+        if name == "timestamp":
+            if self._ts is None:
+                ts = pd.DatetimeIndex(self.timestamp.view("M8[ns]"))
+                if self.tz is not None:
+                    ts = ts.tz_localize("UTC").tz_convert(self.tz)
+                self._ts = pd.Series(ts, name="timestamp")
+            return self._ts
+        values = self.columns[name]
+        if isinstance(values, pd.Categorical):
+            return pd.Series(values, name=name)
+        return pd.Series(values, name=name, copy=False)
+
+    def __setitem__(self, name, values):
+        if len(values) != len(self):
+            raise ValueError(f"Column {name} has {len(values)} rows, frame has {len(self)}")
+        self.columns[name] = values
+
+    @property
+    def index(self):
+        return pd.RangeIndex(len(self))
+
+    @property
+    def nbytes(self):
+        return self.timestamp.nbytes + sum(v.nbytes for v in self.columns.values())
+
+    def array(self, name):
+        return self.timestamp if name == "timestamp" else self.columns[name]
+
+    def with_columns(self, **columns):
+        """New frame sharing this frame's arrays, plus `columns`."""
+        out = MarketFrame(self.timestamp, self.columns, self.tz)
+        for name, values in columns.items():
+            out[name] = values
+        return out
+
+    def astype(self, dtype, columns=OHLCV_COLUMNS):
+        """Frame with `columns` converted to dtype (copied only if they aren't already)."""
+        converted = {c: v.astype(dtype, copy=False) if c in columns else v for c, v in self.columns.items()}
+        return MarketFrame(self.timestamp, converted, self.tz)
+
+    def slice(self, start, stop=None):
+        """Rows start:stop as views of the same arrays."""
+        return self.take(slice(start, stop))
+
+    def take(self, rows):
+        # a slice gives views, an index array or mask copies
+        return MarketFrame(self.timestamp[rows], {c: v[rows] for c, v in self.columns.items()}, self.tz)
+
+    def dropna(self):
+        """
+        Rows without NaN values or NaT timestamps. A leading run of missing
+        rows is cut with a slice; missing rows further in need a copy.
+        """
+        valid = self.timestamp != NAT
+        for values in self.columns.values():
+            if isinstance(values, pd.Categorical):
+                valid &= values.codes >= 0
+            elif values.dtype.kind == "f":
+                valid &= ~np.isnan(values)
+        if valid.all():
+            return self
+        start = int(np.argmax(valid))
+        if valid[start:].all():
+            return self.slice(start)
+        return self.take(valid)
+
+    def to_frame(self):
+        """The frame as a pandas DataFrame (copies)."""
+        return pd.DataFrame({"timestamp": self["timestamp"],
+                             **{c: np.asarray(v) for c, v in self.columns.items()}})
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar on-disk store for OHLCV data.
+
+Each market/timeframe is one dataset directory, e.g. data/store/BTCUSDT_1h/,
+holding one .npy file per column plus a small meta.json:
+
+    timestamp.npy   int64 epoch nanoseconds (UTC)
+    open.npy ...    float64
+    meta.json       {"rows": ..., "tz": ..., "columns": [...]}
+
+Columns are memory-mapped on read, so loading costs almost nothing compared
+with parsing a CSV and running pd.to_datetime on it.
+
+The dataset name is a symlink to a hidden version directory
+(BTCUSDT_1h -> .BTCUSDT_1h.v-xxxx). A rewrite builds a new version and
+repoints the link with one atomic rename, so the name always resolves to a
+complete dataset. Readers resolve the link once (dataset_version) and read
+every file of that version; the version before the current one is kept, so
+a reader that resolved it just before a rewrite can still finish. Plain
+dataset directories (older stores, or platforms without symlinks) are still
+read, and replaced by moving the old directory aside first.
+"""
+
+import os
+import re
+import json
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+def dataset_path(store_dir, name):
+    return os.path.join(store_dir, name)
+
+def is_dataset(path):
+    return os.path.isfile(os.path.join(path, "meta.json"))
+
+def list_datasets(store_dir):
+    if not os.path.isdir(store_dir):
+        return []
+    return sorted(
+        os.path.join(store_dir, d) for d in os.listdir(store_dir)
+        if not d.startswith(".") and is_dataset(os.path.join(store_dir, d))
+    )
+
+def dataset_version(path):
+    """The version directory a dataset name currently points to (the path itself for plain directories)."""
+    return os.path.realpath(path)
+
+def _version_prefix(name):
+    return f".{name}.v-"
+
+def _publish(store_dir, name, version):
+    # point dataset `name` at the version directory; returns the directory it replaced
+    path = dataset_path(store_dir, name)
+    old = dataset_version(path) if os.path.islink(path) else None
+    link = version + ".link"
+    try:
+        os.symlink(os.path.basename(version), link, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        link = None
+    if link is None or (os.path.isdir(path) and not os.path.islink(path)):
+        # a plain directory can't be swapped atomically: between the two
+        # renames below the dataset name briefly doesn't exist
+        if os.path.lexists(path):
+            old = tempfile.mkdtemp(dir=store_dir, prefix=_version_prefix(name))
+            os.rmdir(old)
+            os.replace(path, old)
+        if link is None:
+            os.replace(version, path)
+            return old
+    os.replace(link, path)
+    return old
+
+def write_market(store_dir, name, df):
+    """
+    Write an OHLCV DataFrame (timestamp + OHLCV columns) as dataset `name`.
+    The dataset is built in a new version directory and the name repointed
+    at it in one rename, so readers never see a half-written or missing dataset.
+    The replaced version is kept until the next rewrite; older ones are removed.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    df = df.sort_values("timestamp").reset_index(drop=True)
+    ts = df["timestamp"]
+    if not pd.api.types.is_datetime64_any_dtype(ts):
+        # mixed UTC offsets (e.g. across DST) can only be stored as UTC
+        ts = pd.to_datetime(ts, utc=True)
+    tz = str(ts.dt.tz) if ts.dt.tz is not None else None
+    version = tempfile.mkdtemp(dir=store_dir, prefix=_version_prefix(name))
+    np.save(os.path.join(version, "timestamp.npy"), ts.dt.as_unit("ns").astype("int64").to_numpy())
+    for col in OHLCV_COLUMNS:
+        values = df[col] if col in df.columns else pd.Series(np.nan, index=df.index)
+        np.save(os.path.join(version, f"{col}.npy"), values.to_numpy(dtype=np.float64))
+    with open(os.path.join(version, "meta.json"), "w") as f:
+        json.dump({"rows": len(df), "tz": tz, "columns": ["timestamp"] + OHLCV_COLUMNS}, f)
+
+    path = dataset_path(store_dir, name)
+    old = _publish(store_dir, name, version)
+    _remove_stale_versions(store_dir, name, keep=old)
+    return path
+
+def _remove_stale_versions(store_dir, name, keep):
+    # versions of `name` other than the current one and `keep`; ".<name>-xxxxxxxx"
+    # is the version naming of earlier stores
+    legacy = re.compile(rf"^\.{re.escape(name)}-(old-)?[a-z0-9_]{{8}}$")
+    linked = {dataset_version(os.path.join(store_dir, d)) for d in os.listdir(store_dir)
+              if os.path.islink(os.path.join(store_dir, d))}
+    keep = {os.path.realpath(keep)} if keep else set()
+    for d in os.listdir(store_dir):
+        if not (d.startswith(_version_prefix(name)) or legacy.match(d)) or d.endswith(".link"):
+            continue
+        stale = os.path.realpath(os.path.join(store_dir, d))
+        if stale not in linked and stale not in keep:
+            shutil.rmtree(stale, ignore_errors=True)
+
+def read_meta(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f)
+
+def read_market_arrays(path, mmap=True):
+    """
+    Column arrays of a dataset: {"timestamp": int64 ns, "open": float64, ...}.
+    With mmap=True the arrays are read-only views of the files on disk.
+    """
+    path = dataset_version(path)
+    mode = "r" if mmap else None
+    return {col: np.load(os.path.join(path, f"{col}.npy"), mmap_mode=mode)
+            for col in read_meta(path)["columns"]}
+
+def read_market(path):
+    """Load a dataset as the same DataFrame shape the CSV loader returns."""
+    path = dataset_version(path)
+    meta = read_meta(path)
+    arrays = read_market_arrays(path)
+    ts = pd.to_datetime(np.asarray(arrays["timestamp"]), unit="ns", utc=meta["tz"] is not None)
+    if meta["tz"] is not None:
+        ts = ts.tz_convert(meta["tz"])
+    df = pd.DataFrame({col: np.asarray(arrays[col]) for col in OHLCV_COLUMNS})
+    df.insert(0, "timestamp", ts)
+    return df
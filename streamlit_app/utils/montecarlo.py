@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo trade resampling: how much of a combination's result depends on
+the one order its trades happened in.
+
+The trades' pnl_pct values are redrawn into n_sims sequences at once, as a
+(sims, trades) array:
+- bootstrap: trades drawn with replacement, so both the final PnL and the
+  path vary
+- shuffle: the same trades in random order, so the final PnL is fixed and
+  only the path (drawdown) varies
+
+Each sequence is scored like summarize_trades(): total_pnl_pct is the sum of
+pnl_pct, final_return_pct the compounded return, and max_drawdown_pct the
+worst fall of the compounded equity from its running peak. Sequences are
+generated in chunks of at most max_elements values, so memory stays bounded
+for long trade lists.
+"""
+
+import zlib
+
+import numpy as np
+import pandas as pd
+
+METHODS = ("bootstrap", "shuffle")
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+SIM_METRICS = ["total_pnl_pct", "final_return_pct", "max_drawdown_pct"]
+MAX_ELEMENTS = 4_000_000  # values per (sims, trades) chunk, ~32 MB per float64 array
+
+def _log_growth(pnl):
+    # log of (1 + pnl / 100), floored like utils/costs.py for trades losing 100% or more
+    return np.log(np.maximum(1 + pnl / 100, 1e-12))
+
+def _path_metrics(pnl, log_growth):
+    # summarize_trades() metrics of every row of (sims, trades) arrays
+    log_eq = np.cumsum(log_growth, axis=1)
+    peak = np.maximum.accumulate(log_eq, axis=1)
+    return {
+        "total_pnl_pct": pnl.sum(axis=1),
+        "final_return_pct": np.expm1(log_eq[:, -1]) * 100,
+        "max_drawdown_pct": np.expm1((log_eq - peak).min(axis=1)) * 100,
+    }
+
+def simulate(pnl_pct, n_sims=1000, method="bootstrap", seed=None, max_elements=MAX_ELEMENTS):
+    """
+    SIM_METRICS of n_sims resampled trade sequences, {metric: array of n_sims}.
+    seed is anything np.random.default_rng accepts; the results depend on it
+    and max_elements only.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown resampling method '{method}' (use one of {METHODS})")
+    pnl = np.asarray(pnl_pct, dtype=np.float64)
+    n = len(pnl)
+    if n == 0:
+        return {m: np.full(n_sims, np.nan) for m in SIM_METRICS}
+    log_growth = _log_growth(pnl)
+    rng = np.random.default_rng(seed)
+    chunk = max(1, max_elements // n)
+    parts = []
+    for start in range(0, n_sims, chunk):
+        rows = min(chunk, n_sims - start)
+        if method == "bootstrap":
+            idx = rng.integers(0, n, size=(rows, n))
+        else:
+            idx = rng.permuted(np.broadcast_to(np.arange(n), (rows, n)), axis=1)
+        parts.append(_path_metrics(pnl[idx], log_growth[idx]))
+    return {m: np.concatenate([p[m] for p in parts]) for m in SIM_METRICS}
+
+def group_seed(seed, *key):
+    """Seed of one combination: its random stream doesn't depend on which other combinations run."""
+    return [seed, zlib.crc32("/".join(map(str, key)).encode())]
+
+def percentile_bands(sims, percentiles=DEFAULT_PERCENTILES):
+    """{<metric>_p<q>: value} for every metric of simulate() and percentile q."""
+    out = {}
+    for name, values in sims.items():
+        bands = np.percentile(values, percentiles) if not np.isnan(values).all() else [np.nan] * len(percentiles)
+        for q, v in zip(percentiles, bands):
+            out[f"{name}_p{q:g}"] = v
+    return out
+
+def monte_carlo(trades, n_sims=1000, method="bootstrap", percentiles=DEFAULT_PERCENTILES, seed=None):
+    """
+    Percentile bands of a trades table (e.g. from backtest_simple_strategy,
+    or just its pnl_pct array) under trade resampling, plus the observed
+    values and how they rank: prob_loss_pct is the share of sequences with
+    total_pnl_pct < 0, and dd_worse_pct the share whose drawdown is deeper
+    than the observed one (high means the actual trade order was lucky).
+    """
+    pnl = trades["pnl_pct"] if isinstance(trades, pd.DataFrame) else trades
+    pnl = np.asarray(pnl, dtype=np.float64)
+    sims = simulate(pnl, n_sims, method, seed)
+    out = {"trades": len(pnl), "method": method, "sims": n_sims}
+    if len(pnl):
+        observed = _path_metrics(pnl[None, :], _log_growth(pnl)[None, :])
+        out.update({m: float(observed[m][0]) for m in SIM_METRICS})
+    else:
+        out.update({m: np.nan for m in SIM_METRICS})
+    out.update(percentile_bands(sims, percentiles))
+    with np.errstate(invalid="ignore"):
+        out["prob_loss_pct"] = float((sims["total_pnl_pct"] < 0).mean() * 100) if len(pnl) else np.nan
+        out["dd_worse_pct"] = float((sims["max_drawdown_pct"] < out["max_drawdown_pct"]).mean() * 100) \
+            if len(pnl) else np.nan
+    return out
+
+def monte_carlo_table(trades_df, by=("market", "timeframe", "combo"), n_sims=1000, method="bootstrap",
+                      percentiles=DEFAULT_PERCENTILES, seed=0):
+    """
+    monte_carlo() of every `by` group of a trades table, one row per group.
+    Each group gets its own random stream (group_seed).
+    """
+    by = [c for c in by if c in trades_df.columns]
+    if not by:
+        return pd.DataFrame([monte_carlo(trades_df, n_sims, method, percentiles, seed)])
+    rows = []
+    for key, group in trades_df.groupby(by, sort=False, dropna=False):
+        key = key if isinstance(key, tuple) else (key,)
+        rows.append({**dict(zip(by, key)),
+                     **monte_carlo(group, n_sims, method, percentiles, group_seed(seed, *key))})
+    return pd.DataFrame(rows)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Higher-timeframe OHLCV bars built locally from finer stored bars.
+
+Bars are grouped into buckets [start, start + step) aligned on the Unix
+epoch (weeks on Mondays), shifted by an optional session offset, e.g.
+"30min" for US equities whose hourly bars start at 9:30. Tz-aware data is
+bucketed on its local wall clock, so daily bars follow the exchange calendar
+across DST changes. Each bucket's open is its first open, high the max, low
+the min, close the last close, and volume the sum. Only buckets that contain
+bars are emitted: a closed session (weekend, holiday) produces no bar rather
+than a flat one, and a session that opens mid-bucket gives a shorter first bar.
+The last bucket is dropped while it is still forming.
+
+resampled_dataset() derives a timeframe into a store-format cache directory
+and rebuilds it only when the source data changes.
+"""
+
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+
+from utils.marketstore import OHLCV_COLUMNS, write_market, dataset_path, is_dataset
+
+TIMEFRAME_RE = re.compile(r"^(\d+)(m|h|d|w)$")
+UNIT_SECONDS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+WEEK_ANCHOR = pd.Timedelta(days=4)  # 1970-01-01 was a Thursday; weeks start on Monday
+
+# bucket offsets per market where sessions don't start on the hour
+SESSION_OFFSETS = {
+    "SPY": "30min",  # NYSE opens at 9:30 exchange time
+}
+
+def timeframe_seconds(timeframe):
+    m = TIMEFRAME_RE.match(str(timeframe))
+    if not m:
+        raise ValueError(f"Unknown timeframe: {timeframe}")
+    return int(m.group(1)) * UNIT_SECONDS[m.group(2)]
+
+def can_resample(base_timeframe, timeframe):
+    """True if `timeframe` bars can be built from whole `base_timeframe` bars."""
+    base, target = timeframe_seconds(base_timeframe), timeframe_seconds(timeframe)
+    return target > base and target % base == 0
+
+def resample_ohlcv(df, timeframe, base_timeframe=None, offset=None, drop_partial=True):
+    """
+    `timeframe` bars (e.g. "4h", "1d") from the finer OHLCV bars in df.
+    base_timeframe (inferred from the median bar spacing if omitted) is
+    checked to divide timeframe and marks when the last bucket is complete.
+    offset shifts the bucket boundaries (anything pd.Timedelta accepts).
+    """
+    step = timeframe_seconds(timeframe) * 10**9
+    if base_timeframe is not None:
+        if not can_resample(base_timeframe, timeframe):
+            raise ValueError(f"Cannot build {timeframe} bars from {base_timeframe} bars")
+        base_step = timeframe_seconds(base_timeframe) * 10**9
+    else:
+        base_step = None
+
+    if not df["timestamp"].is_monotonic_increasing:
+        df = df.sort_values("timestamp", kind="stable")
+    ts = pd.DatetimeIndex(df["timestamp"])
+    wall = ts.tz_localize(None) if ts.tz is not None else ts
+    ns = wall.asi8
+    if len(ns) == 0:
+        return pd.DataFrame({"timestamp": ts[:0], **{c: np.zeros(0) for c in OHLCV_COLUMNS}})
+    if base_step is None:
+        base_step = int(np.median(np.diff(ns))) if len(ns) > 1 else step
+
+    shift = pd.Timedelta(offset or 0).value
+    if timeframe.endswith("w"):
+        shift += WEEK_ANCHOR.value
+    bucket = (ns - shift) // step * step + shift
+    starts = np.flatnonzero(np.concatenate([[True], bucket[1:] != bucket[:-1]]))
+    ends = np.append(starts[1:], len(ns)) - 1
+
+    cols = {c: df[c].to_numpy(dtype=np.float64) for c in OHLCV_COLUMNS}
+    out = {
+        "open": cols["open"][starts],
+        "high": np.fmax.reduceat(cols["high"], starts),
+        "low": np.fmin.reduceat(cols["low"], starts),
+        "close": cols["close"][ends],
+        "volume": np.add.reduceat(np.nan_to_num(cols["volume"]), starts),
+    }
+    labels = pd.DatetimeIndex(bucket[starts])
+    if ts.tz is not None:
+        labels = labels.tz_localize(ts.tz, ambiguous=True, nonexistent="shift_forward")
+    res = pd.DataFrame({"timestamp": labels, **out})
+
+    # still forming: the data stops before the last bucket's final base bar
+    if drop_partial and ns[-1] + base_step < bucket[-1] + step:
+        res = res.iloc[:-1]
+    return res.reset_index(drop=True)
+
+def best_base(stored, timeframe, span=None):
+    """
+    The stored timeframe to build `timeframe` from, out of {timeframe: path}.
+    Any finer timeframe that divides it qualifies; the one covering the
+    longest history wins (`span(path)` -> seconds; e.g. a short 1m history
+    loses to months of 15m bars), then the coarsest, which is cheapest.
+    """
+    candidates = [tf for tf in stored if TIMEFRAME_RE.match(tf) and can_resample(tf, timeframe)]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda tf: (span(stored[tf]) if span else 0, timeframe_seconds(tf)))
+
+def resampled_dataset(cache_dir, market, timeframe, source_path, source_timeframe, load,
+                      fingerprint, offset=None):
+    """
+    Path of a store dataset <cache_dir>/<market>_<timeframe> resampled from
+    source_path (read with `load`). A stamp next to it records the source
+    fingerprint and settings; while they match the cached dataset is reused.
+    """
+    name = f"{market}_{timeframe}"
+    path = dataset_path(cache_dir, name)
+    stamp_path = os.path.join(cache_dir, f"{name}.source.json")
+    stamp = {"source": source_path, "base": source_timeframe, "fingerprint": fingerprint,
+             "offset": None if offset is None else str(offset)}
+    if is_dataset(path) and os.path.exists(stamp_path):
+        with open(stamp_path) as f:
+            if json.load(f) == stamp:
+                return path
+    df = resample_ohlcv(load(source_path), timeframe, source_timeframe, offset)
+    write_market(cache_dir, name, df)
+    tmp = stamp_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(stamp, f)
+    os.replace(tmp, stamp_path)
+    return path
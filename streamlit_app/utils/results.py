@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Buffered writer for the results summary (results/rsi_strategy_results.csv).
+
+Rows are collected in memory and appended in bulk every `flush_every` rows,
+on an explicit flush() (e.g. at the end of a data file) and on close/exit.
+"""
+
+import io
+import os
+import time
+import atexit
+import importlib.util
+import numpy as np
+import pandas as pd
+
+class ResultSink:
+    """
+    Append-only CSV sink with the same column layout the file already uses.
+
+    Each flush renders the whole chunk in memory and appends it with a single
+    write + fsync. If a previous process died mid-write, the torn last line is
+    cut off when the sink opens, so the file always holds complete rows.
+
+    parquet_dir (optional) additionally writes each flushed chunk as a part
+    file in a Parquet dataset directory; this needs pyarrow or fastparquet.
+    on_flush (optional) is called with the flushed rows once they are on disk.
+    Keys in a row dict that are not in `columns` are not written, and
+    infinite values are written as empty (NaN).
+
+    Rows are written in the order of the file's header, fields a row lacks
+    left empty. If the header is missing some of `columns`, the file is
+    rewritten once with them added, old rows empty in them: in `columns`
+    order when the header is a subset (new metrics added to the layout),
+    otherwise after the existing header (a file written with another layout,
+    e.g. the app's lower_thresh/upper_thresh rows).
+    """
+
+    def __init__(self, path, columns, flush_every=500, parquet_dir=None, on_flush=None):
+        self.path = path
+        self.on_flush = on_flush
+        self.columns = list(columns)
+        self.flush_every = flush_every
+        self.parquet_dir = parquet_dir
+        self.rows = []
+        self.rows_written = 0
+        self._closed = False
+        if parquet_dir is not None:
+            if not (importlib.util.find_spec("pyarrow") or importlib.util.find_spec("fastparquet")):
+                raise ImportError("Parquet output needs pyarrow or fastparquet (pip install pyarrow)")
+            os.makedirs(parquet_dir, exist_ok=True)
+        self._prepare_file()
+        atexit.register(self.close)
+
+    def _prepare_file(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            with open(self.path, "w", newline="") as f:
+                pd.DataFrame(columns=self.columns).to_csv(f, index=False)
+            self.file_columns = self.columns
+            return
+        # drop a partial trailing row left by an interrupted write
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - 65536))
+            tail = f.read()
+            if not tail.endswith(b"\n"):
+                cut = tail.rfind(b"\n")
+                f.truncate(size - len(tail) + cut + 1 if cut >= 0 else 0)
+        self._widen_header()
+
+    def _widen_header(self):
+        with open(self.path, newline="") as f:
+            header = f.readline().rstrip("\r\n").split(",")
+        missing = [c for c in self.columns if c not in header]
+        if missing:
+            widened = self.columns if set(header) < set(self.columns) else header + missing
+            # text in, text out: existing rows keep their exact formatting
+            old = pd.read_csv(self.path, dtype=str, keep_default_na=False)
+            tmp = self.path + ".tmp"
+            old.reindex(columns=widened, fill_value="").to_csv(tmp, index=False)
+            os.replace(tmp, self.path)
+            header = widened
+        self.file_columns = header
+
+    def append(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.flush_every:
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def flush(self):
+        if not self.rows:
+            return
+        # object dtype keeps ints as ints next to NaN, matching row-by-row output
+        chunk = pd.DataFrame(self.rows, columns=self.file_columns, dtype=object)
+        # inf (e.g. profit_factor without losing trades) isn't a number to CSV readers
+        infinite = chunk.isin([np.inf, -np.inf])
+        if infinite.to_numpy().any():
+            chunk = chunk.mask(infinite)
+        buf = io.StringIO()
+        chunk.to_csv(buf, index=False, header=False)
+        data = buf.getvalue().encode("utf-8")
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+        try:
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        if self.parquet_dir is not None:
+            self._write_parquet(chunk[self.columns])
+        if self.on_flush is not None:
+            self.on_flush(self.rows)
+        self.rows_written += len(self.rows)
+        self.rows = []
+
+    def _write_parquet(self, chunk):
+        part = f"part-{time.time_ns()}-{os.getpid()}.parquet"
+        tmp = os.path.join(self.parquet_dir, f".{part}.tmp")
+        chunk.infer_objects().to_parquet(tmp, index=False)
+        os.replace(tmp, os.path.join(self.parquet_dir, part))
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class RunLedger:
+    """
+    Append-only text file of completed combination keys (one hex key per
+    line). A torn last line from an interrupted write is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.keys = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.keys = {line.strip() for line in f if len(line.strip()) == 40}
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def add(self, keys):
+        new = [k for k in keys if k not in self.keys]
+        if not new:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as f:
+            # start on a fresh line in case the previous write was torn
+            f.write("\n" + "\n".join(new) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.keys.update(new)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Stage timing and run reports for batch jobs.
+
+StageTimer accumulates wall time per named stage. Stages can nest and the
+times are exclusive: a "summary_write" that triggers an "aggregates" refresh
+is charged only for its own work, so the stages of one run add up to the
+time spent inside them.
+
+write_run_report() saves a JSON report (run info, stage totals, per-file and
+per-task rows) and a CSV with one row per task. merge_profiles() combines
+cProfile dumps of several tasks into one .prof file plus a text listing.
+peak_rss_mb() reads the peak resident memory of the current process.
+"""
+
+import os
+import sys
+import json
+import time
+import pstats
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+class StageTimer:
+    def __init__(self):
+        self.seconds = {}
+        self._stack = []  # [start, time charged to nested stages]
+
+    @contextmanager
+    def stage(self, name):
+        frame = [time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            self.seconds[name] = self.seconds.get(name, 0.0) + elapsed - frame[1]
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+    def add(self, seconds):
+        """Fold in another {stage: seconds} dict (e.g. from a worker)."""
+        for name, s in seconds.items():
+            self.seconds[name] = self.seconds.get(name, 0.0) + s
+
+    def total(self):
+        return sum(self.seconds.values())
+
+def _stage_columns(rows):
+    names = []
+    for r in rows:
+        for n in r["stages"]:
+            if n not in names:
+                names.append(n)
+    return names
+
+def write_run_report(json_path, csv_path, info, task_reports, file_reports, run_stages=None):
+    """
+    info: run-level dict (run_ts, arguments, wall_seconds, ...).
+    task_reports / file_reports: dicts with a "stages" {name: seconds} entry
+    plus counts (bars, rows, trades) and timings. Files are listed slowest first.
+    run_stages: {name: seconds} spent outside any file, added to the totals.
+    """
+    stages = StageTimer()
+    stages.add(run_stages or {})
+    for r in file_reports:
+        stages.add(r["stages"])
+    report = {
+        **info,
+        "stages": dict(sorted(stages.seconds.items(), key=lambda kv: -kv[1])),
+        "files": sorted(file_reports, key=lambda r: -r["seconds"]),
+        "tasks": task_reports,
+    }
+    os.makedirs(os.path.dirname(json_path) or ".", exist_ok=True)
+    with open(json_path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    names = _stage_columns(task_reports)
+    table = pd.DataFrame([{**{k: v for k, v in r.items() if k != "stages"},
+                           **{f"{n}_s": r["stages"].get(n, 0.0) for n in names}}
+                          for r in task_reports])
+    table.to_csv(csv_path, index=False)
+    return report
+
+def merge_profiles(paths, out_prefix, top=40):
+    """
+    Merge cProfile dumps into <out_prefix>.prof and write the `top` entries
+    by cumulative time to <out_prefix>.txt. Returns the two paths.
+    """
+    stats = pstats.Stats(*paths)
+    prof_path, txt_path = f"{out_prefix}.prof", f"{out_prefix}.txt"
+    stats.dump_stats(prof_path)
+    with open(txt_path, "w") as f:
+        pstats.Stats(prof_path, stream=f).sort_stats("cumulative").print_stats(top)
+    return prof_path, txt_path
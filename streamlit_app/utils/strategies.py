@@ -17,35 +17,53 @@ def rsi(series, period=14):
     rs = ma_up / (ma_down + 1e-9)
     return 100 - (100 / (1 + rs))
 
-def compute_returns_from_trades(trades, df):
-    rows = []
-    for t in trades:
-        entry_price = df.iloc[t['entry_idx']]['close']
-        exit_price  = df.iloc[t['exit_idx']]['close']
-        pnl = (exit_price - entry_price) / entry_price if t['side']=='long' else (entry_price - exit_price) / entry_price
-        rows.append({
-            'entry_time':  df.iloc[t['entry_idx']]['timestamp'],
-            'exit_time':   df.iloc[t['exit_idx']]['timestamp'],
-            'entry_price': entry_price,
-            'exit_price':  exit_price,
-            'side':        t['side'],
-            'pnl_pct':     pnl * 100
-        })
-    trades_df = pd.DataFrame(rows)
-    if trades_df.empty:
-        trades_df = pd.DataFrame(columns=['entry_time','exit_time','entry_price','exit_price','side','pnl_pct'])
-    trades_df['cumulative_pnl_pct'] = trades_df['pnl_pct'].cumsum()
+TRADE_COLUMNS = ['entry_time','exit_time','entry_price','exit_price','side','pnl_pct']
+
+def trades_from_indices(df, entry_idx, exit_idx, sides):
+    """
+    Build the trades table from arrays of entry bars, exit bars and sides
+    (+1 long / -1 short). Prices and timestamps are gathered in one take per
+    column and PnL is computed with array maths.
+    """
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    exit_idx = np.asarray(exit_idx, dtype=np.int64)
+    if len(entry_idx) == 0:
+        trades_df = pd.DataFrame(columns=TRADE_COLUMNS)
+        trades_df['cumulative_pnl_pct'] = trades_df['pnl_pct'].cumsum()
+        return trades_df
+    is_long = np.asarray(sides) > 0
+    close = df['close'].to_numpy()
+    # float32 price arrays (see utils/marketframe.py) still give float64 trades
+    entry_price = close[entry_idx].astype(np.float64)
+    exit_price = close[exit_idx].astype(np.float64)
+    direction = np.where(is_long, 1.0, -1.0)
+    pnl = direction * (exit_price - entry_price) / entry_price * 100
+    timestamps = df['timestamp']
+    trades_df = pd.DataFrame({
+        'entry_time':  timestamps.take(entry_idx).reset_index(drop=True),
+        'exit_time':   timestamps.take(exit_idx).reset_index(drop=True),
+        'entry_price': entry_price,
+        'exit_price':  exit_price,
+        'side':        np.where(is_long, 'long', 'short').astype(object),
+        'pnl_pct':     pnl,
+    })
+    trades_df['cumulative_pnl_pct'] = np.cumsum(pnl)
     return trades_df
 
-def backtest_simple_strategy(df, rsi_series, strategy_cfg):
+def compute_returns_from_trades(trades, df):
+    entry_idx = [t['entry_idx'] for t in trades]
+    exit_idx = [t['exit_idx'] for t in trades]
+    sides = [1 if t['side'] == 'long' else -1 for t in trades]
+    return trades_from_indices(df, entry_idx, exit_idx, sides)
+
+def _loop_trades(rsi_series, strategy_cfg):
+    # Reference per-bar implementation, kept for parity checks against signal_indices().
     lower = strategy_cfg.get('lower', 30)
     upper = strategy_cfg.get('upper', 70)
     exit_level = strategy_cfg.get('exit_level', 50)
     mode = strategy_cfg.get('mode', 'mean_reversion')
     trades, position, entry_idx = [], None, None
-
-    import numpy as np
-    for i in range(1, len(df)):
+    for i in range(1, len(rsi_series)):
         r = rsi_series.iloc[i]
         if np.isnan(r):
             continue
@@ -80,11 +98,78 @@ def backtest_simple_strategy(df, rsi_series, strategy_cfg):
                     trades.append({'entry_idx': entry_idx, 'exit_idx': i, 'side': 'short'})
                     position, entry_idx = None, None
 
-        if i == len(df)-1 and position is not None and entry_idx is not None:
+        if i == len(rsi_series)-1 and position is not None and entry_idx is not None:
             trades.append({'entry_idx': entry_idx, 'exit_idx': i, 'side': position})
             position, entry_idx = None, None
 
-    trades_df = compute_returns_from_trades(trades, df)
+    return trades
+
+def _next_index(mask):
+    # For each bar, the index of the first True at or after it (len(mask) if none).
+    # One extra slot is appended so a lookup at len(mask) stays in bounds.
+    n = len(mask)
+    idx = np.where(mask, np.arange(n), n)
+    return np.append(np.minimum.accumulate(idx[::-1])[::-1], n)
+
+def signal_indices(rsi_values, strategy_cfg):
+    """
+    Array-based equivalent of the per-bar loop in backtest_simple_strategy.
+    Entry/exit conditions are evaluated for all bars at once, then entries and
+    exits are paired by jumping between them, so the only Python-level loop
+    runs once per trade instead of once per bar.
+    Returns (entry_idx, exit_idx, sides) with sides as +1 (long) / -1 (short).
+    """
+    lower = strategy_cfg.get('lower', 30)
+    upper = strategy_cfg.get('upper', 70)
+    exit_level = strategy_cfg.get('exit_level', 50)
+    mode = strategy_cfg.get('mode', 'mean_reversion')
+
+    r = np.asarray(rsi_values, dtype=float)
+    n = len(r)
+    none = np.zeros(n, dtype=bool)
+    with np.errstate(invalid='ignore'):
+        if mode == 'mean_reversion':
+            long_entry, long_exit = r < lower, r > exit_level
+            short_entry, short_exit = none, none
+        elif mode == 'overbought_reversal':
+            long_entry, long_exit = none, none
+            short_entry, short_exit = r > upper, r < exit_level
+        elif mode == 'trend_follow_rsi':
+            prev = np.concatenate(([np.nan], r[:-1]))
+            long_entry, long_exit = (prev < 50) & (r > 50), r < 50
+            short_entry, short_exit = (prev > 50) & (r < 50), r > 50
+        else:
+            long_entry = long_exit = short_entry = short_exit = none
+
+    next_long, next_short = _next_index(long_entry), _next_index(short_entry)
+    next_long_exit, next_short_exit = _next_index(long_exit), _next_index(short_exit)
+    # the loop only force-closes on the last bar if that bar has an RSI value
+    can_force_close = n > 1 and not np.isnan(r[-1])
+
+    entries, exits, sides = [], [], []
+    i = 1
+    while i < n:
+        e_long, e_short = next_long[i], next_short[i]
+        if e_long >= n and e_short >= n:
+            break
+        if e_long <= e_short:
+            e, side, x = e_long, 1, next_long_exit[e_long + 1]
+        else:
+            e, side, x = e_short, -1, next_short_exit[e_short + 1]
+        if x >= n:
+            if not can_force_close:
+                break
+            x = n - 1
+        entries.append(e)
+        exits.append(x)
+        sides.append(side)
+        i = x + 1
+
+    return (np.asarray(entries, dtype=np.int64),
+            np.asarray(exits, dtype=np.int64),
+            np.asarray(sides, dtype=np.int8))
+
+def summarize_trades(trades_df):
     summary = {
         'total_trades': len(trades_df),
         'total_pnl_pct': trades_df['pnl_pct'].sum() if not trades_df.empty else 0.0,
@@ -97,25 +182,318 @@ def backtest_simple_strategy(df, rsi_series, strategy_cfg):
         peak = equity.cummax()
         drawdowns = (equity - peak) / peak
         summary['max_drawdown_pct'] = drawdowns.min() * 100
+    return summary
+
+RISK_COLUMNS = ['sharpe', 'sortino', 'calmar', 'annual_return_pct', 'bar_max_drawdown_pct',
+                'exposure_pct', 'profit_factor', 'max_win_streak', 'max_loss_streak']
+SECONDS_PER_YEAR = 365.25 * 24 * 3600
+MIN_ANNUAL_DAYS = 30  # shorter histories get no annual return / calmar (compounding them out explodes)
+
+def trade_indices(df, trades_df):
+    """
+    (entry_idx, exit_idx, sides) of a trades table, looked up by timestamp in
+    df (the first bar of a repeated timestamp). Callers that have the bar
+    indices from signal_indices() should pass those instead.
+    """
+    bars = pd.Index(df['timestamp'])
+    if bars.is_unique:
+        lookup = bars.get_indexer
+    else:
+        # get_indexer needs unique labels; the bars are in time order
+        lookup = lambda times: bars.searchsorted(pd.Index(times), side='left')
+    return (np.asarray(lookup(trades_df['entry_time']), dtype=np.int64),
+            np.asarray(lookup(trades_df['exit_time']), dtype=np.int64),
+            np.where(trades_df['side'].to_numpy() == 'long', 1, -1).astype(np.int8))
+
+def equity_curve(df, entry_idx, exit_idx, sides, dtype=np.float64):
+    """
+    Bar-level equity (starting at 1.0) of a sequence of non-overlapping
+    trades, marked to the close of every bar. Inside a trade the equity is the
+    equity before the trade times the trade's running return, so at each exit
+    it equals the trade-level cumprod of (1 + pnl_pct / 100). dtype=np.float32
+    halves its memory.
+    """
+    close = df['close'].to_numpy(dtype=dtype)
+    n = len(close)
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    exit_idx = np.asarray(exit_idx, dtype=np.int64)
+    if len(entry_idx) == 0:
+        return np.ones(n, dtype=dtype)
+    direction = np.where(np.asarray(sides) > 0, 1.0, -1.0)
+    entry_price = close[entry_idx].astype(np.float64)
+    after = np.cumprod(1 + direction * (close[exit_idx] - entry_price) / entry_price)
+    before = np.concatenate([[1.0], after[:-1]])
+
+    # equity is a + b * close on alternating segments: flat before the first
+    # entry, in trade k on bars (entry, exit], flat at after[k] until the next entry
+    k = len(entry_idx)
+    starts = np.empty(2 * k + 1, dtype=np.int64)
+    starts[0], starts[1::2], starts[2::2] = 0, entry_idx + 1, exit_idx + 1
+    a = np.empty(2 * k + 1)
+    b = np.zeros(2 * k + 1)
+    a[0], a[1::2], a[2::2] = 1.0, before * (1 - direction), after
+    b[1::2] = before * direction / entry_price
+    lengths = np.diff(np.append(np.minimum(starts, n), n))
+    equity = np.repeat(a.astype(dtype), lengths)
+    equity += np.repeat(b.astype(dtype), lengths) * close
+    return equity
+
+def _longest_run(mask):
+    # length of the longest run of True values
+    if not mask.any():
+        return 0
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], mask.astype(np.int8), [0]])))
+    return int((edges[1::2] - edges[::2]).max())
+
+def periods_per_year(timestamps):
+    """
+    Bars per year from the bar count over the elapsed calendar time, so
+    session markets (equities, FX, futures) are annualized by the bars they
+    actually trade rather than as if they traded around the clock.
+    """
+    ts = pd.DatetimeIndex(timestamps).asi8
+    if len(ts) < 2:
+        return np.nan
+    years = (ts[-1] - ts[0]) / 1e9 / SECONDS_PER_YEAR
+    return (len(ts) - 1) / years if years > 0 else np.nan
+
+def risk_metrics(trades_df, df=None, entry_idx=None, exit_idx=None, sides=None,
+                 dtype=np.float64, bars_per_year=None):
+    """
+    Risk metrics to go with summarize_trades().
+
+    From the trades: profit_factor (gross profit / gross loss) and the longest
+    winning / losing streaks. With the bar frame `df` also, from the bar-level
+    equity_curve: annualized sharpe and sortino of the per-bar returns,
+    annual_return_pct (final equity annualized over the frame's bars), bar_max_drawdown_pct
+    (including open-trade drawdown), calmar (annual return / max drawdown) and
+    exposure_pct (share of bars in a position). Indices are looked up from
+    trades_df if not given. Undefined ratios are NaN, and so are annual_return_pct
+    and calmar for frames spanning under MIN_ANNUAL_DAYS. profit_factor is inf
+    when no trade lost; ResultSink writes it as NaN.
+    """
+    pnl = trades_df['pnl_pct'].to_numpy(dtype=np.float64)
+    gains, losses = pnl[pnl > 0].sum(), -pnl[pnl < 0].sum()
+    out = {
+        'profit_factor': gains / losses if losses > 0 else (np.inf if gains > 0 else np.nan),
+        'max_win_streak': _longest_run(pnl > 0),
+        'max_loss_streak': _longest_run(pnl < 0),
+    }
+    if df is None:
+        return out
+
+    if entry_idx is None:
+        entry_idx, exit_idx, sides = trade_indices(df, trades_df)
+    equity = equity_curve(df, entry_idx, exit_idx, sides, dtype=dtype)
+    n = len(equity)
+    ret = np.diff(equity)
+    ret /= equity[:-1]
+    if bars_per_year is None:
+        bars_per_year = periods_per_year(df['timestamp'])
+    scale = np.sqrt(bars_per_year)
+    mean = ret.mean(dtype=np.float64) if len(ret) else np.nan
+    std = ret.std(dtype=np.float64, ddof=1) if len(ret) > 1 else np.nan
+    neg = np.minimum(ret, 0).astype(np.float64, copy=False)
+    downside = np.sqrt(neg.dot(neg) / len(neg)) if len(neg) else np.nan
+    drawdown = float((equity / np.maximum.accumulate(equity)).min()) - 1 if n else 0.0
+    # elapsed calendar years when bars_per_year comes from periods_per_year(df['timestamp'])
+    years = (n - 1) / bars_per_year if n > 1 else np.nan
+    final = float(equity[-1]) if n else 1.0
+    long_enough = years * 365.25 >= MIN_ANNUAL_DAYS if n > 1 else False
+    annual = (final ** (1 / years) - 1) if long_enough and final > 0 else np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out.update({
+            'sharpe': mean / std * scale if std > 0 else np.nan,
+            'sortino': mean / downside * scale if downside > 0 else np.nan,
+            'calmar': annual / -drawdown if drawdown < 0 else np.nan,
+            'annual_return_pct': annual * 100,
+            'bar_max_drawdown_pct': drawdown * 100,
+            'exposure_pct': float(np.sum(np.asarray(exit_idx) - np.asarray(entry_idx))) / max(n - 1, 1) * 100,
+        })
+    return out
+
+def format_ratio(value, digits=2):
+    """A risk_metrics() ratio for display: NaN as "n/a", infinities as "∞" / "-∞"."""
+    if value is None or np.isnan(value):
+        return "n/a"
+    if np.isinf(value):
+        return "∞" if value > 0 else "-∞"
+    return f"{value:.{digits}f}"
+
+def backtest_simple_strategy(df, rsi_series, strategy_cfg, return_indices=False):
+    """
+    (summary, trades_df) of one strategy config. The summary holds the
+    summarize_trades() metrics plus risk_metrics() from the bar-level equity
+    curve (strategy_cfg['equity_dtype'], default float64). With
+    return_indices=True, the trades' (entry_idx, exit_idx, sides) bar arrays
+    are returned third.
+    """
+    if strategy_cfg.get('engine', 'array') == 'loop':
+        trades = _loop_trades(rsi_series, strategy_cfg)
+        trades_df = compute_returns_from_trades(trades, df)
+        entry_idx = [t['entry_idx'] for t in trades]
+        exit_idx = [t['exit_idx'] for t in trades]
+        sides = [1 if t['side'] == 'long' else -1 for t in trades]
+    else:
+        entry_idx, exit_idx, sides = signal_indices(rsi_series, strategy_cfg)
+        trades_df = trades_from_indices(df, entry_idx, exit_idx, sides)
+    summary = summarize_trades(trades_df)
+    summary.update(risk_metrics(trades_df, df, entry_idx, exit_idx, sides,
+                                dtype=strategy_cfg.get('equity_dtype', np.float64)))
+    if return_indices:
+        indices = (np.asarray(entry_idx, dtype=np.int64), np.asarray(exit_idx, dtype=np.int64),
+                   np.asarray(sides, dtype=np.int8))
+        return summary, trades_df, indices
     return summary, trades_df
 
+def _sweep_below(r, thresholds, exit_level):
+    # Mean-reversion form (enter on r < threshold, exit on r > exit_level) for
+    # every threshold <= exit_level at once. Exit candidates split the series
+    # into segments; the position is always flat when a segment starts, so each
+    # segment holds at most one trade: entry on its first bar below the
+    # threshold, exit on the exit candidate that closes it.
+    n = len(r)
+    levels_sorted = np.sort(thresholds)
+    k_count = len(levels_sorted)
+    # level = how many thresholds the bar is below (NaN -> 0)
+    level = k_count - np.searchsorted(levels_sorted, r, side='right')
+    if n:
+        level[0] = 0
+    with np.errstate(invalid='ignore'):
+        is_exit = r > exit_level
+    seg = np.cumsum(is_exit)
+    # running max of level within each segment, offset so it is sorted overall
+    run = np.maximum.accumulate(seg * (k_count + 1) + level)
+    exit_pos = np.flatnonzero(is_exit)
+    segs = np.unique(seg[level > 0])
+    seg_max = run[np.append(exit_pos, n)[segs] - 1] - segs * (k_count + 1)
+    seg_exit = np.append(exit_pos, -1)[segs]
+    can_force_close = n > 1 and not np.isnan(r[-1])
+
+    out = {}
+    for k, threshold in enumerate(levels_sorted):
+        need = k_count - k
+        sel = seg_max >= need
+        entries = np.searchsorted(run, segs[sel] * (k_count + 1) + need, side='left')
+        exits = seg_exit[sel]
+        if len(exits) and exits[-1] < 0:
+            if can_force_close:
+                exits[-1] = n - 1
+            else:
+                entries, exits = entries[:-1], exits[:-1]
+        out[threshold] = (entries.astype(np.int64), exits.astype(np.int64))
+    return out
+
+def sweep_signal_indices(rsi_values, mode, thresholds, exit_level=50):
+    """
+    signal_indices() for a whole vector of thresholds ('lower' for
+    mean_reversion, 'upper' for overbought_reversal) from one pass over the
+    RSI array. Returns {threshold: (entry_idx, exit_idx, sides)}.
+    Thresholds on the wrong side of exit_level (where entry and exit bars can
+    overlap) fall back to signal_indices().
+    """
+    r = np.asarray(rsi_values, dtype=float)
+    thresholds = list(dict.fromkeys(thresholds))
+    if mode == 'mean_reversion':
+        fast = [t for t in thresholds if t <= exit_level]
+        swept = _sweep_below(r, np.asarray(fast, dtype=float), exit_level)
+        side, key = 1, 'lower'
+    elif mode == 'overbought_reversal':
+        fast = [t for t in thresholds if t >= exit_level]
+        swept = _sweep_below(-r, -np.asarray(fast, dtype=float), -exit_level)
+        swept = {-t: v for t, v in swept.items()}
+        side, key = -1, 'upper'
+    else:
+        raise ValueError(f"Threshold sweep not supported for mode '{mode}'")
+
+    out = {}
+    for t in thresholds:
+        if t in fast:
+            entries, exits = swept[float(t)]
+            out[t] = (entries, exits, np.full(len(entries), side, dtype=np.int8))
+        else:
+            out[t] = signal_indices(r, {'mode': mode, key: t, 'exit_level': exit_level})
+    return out
+
+def sweep_thresholds(df, rsi_series, mode, thresholds, exit_levels=(50,), equity_dtype=np.float64,
+                     return_indices=False):
+    """
+    Run backtest_simple_strategy for every (threshold, exit_level) combination,
+    scanning the RSI series once per exit level instead of once per combination.
+    Returns {(threshold, exit_level): (summary, trades_df)}, plus the
+    (entry_idx, exit_idx, sides) arrays third with return_indices=True.
+    """
+    results = {}
+    bars_per_year = periods_per_year(df['timestamp'])
+    for exit_level in exit_levels:
+        swept = sweep_signal_indices(rsi_series, mode, thresholds, exit_level)
+        for t, (entry_idx, exit_idx, sides) in swept.items():
+            trades_df = trades_from_indices(df, entry_idx, exit_idx, sides)
+            summary = summarize_trades(trades_df)
+            summary.update(risk_metrics(trades_df, df, entry_idx, exit_idx, sides,
+                                        dtype=equity_dtype, bars_per_year=bars_per_year))
+            results[(t, exit_level)] = (summary, trades_df) + ((entry_idx, exit_idx, sides),) * return_indices
+    return results
+
+REGIME_TREND_THRESHOLD = 0.0005   # |log-price slope| per bar above which a market is trending
+REGIME_VOL_THRESHOLD = 0.005      # rolling return std above which a non-trending market is volatile
+
+REGIME_LABELS = ['trending', 'volatile', 'ranging', 'unknown']
+
 def tag_market_regime(df):
-    import numpy as np
-    df = df.copy()
-    df['ret'] = df['close'].pct_change().fillna(0)
-    vol = df['ret'].rolling(50).std().iloc[-1] if len(df) >= 50 else df['ret'].std()
+    ret = df['close'].pct_change().fillna(0)
+    vol = ret.rolling(50).std().iloc[-1] if len(df) >= 50 else ret.std()
     window = min(50, len(df))
     y = np.log(df['close'].iloc[-window:].values)
     x = np.arange(window)
     if len(x) < 3:
         return 'unknown', {'vol': vol, 'trend': 0.0}
     slope = np.polyfit(x, y, 1)[0]
-    trend_threshold = 0.0005
-    vol_threshold = 0.005
-    if abs(slope) > trend_threshold:
+    if abs(slope) > REGIME_TREND_THRESHOLD:
         regime = 'trending'
-    elif vol > vol_threshold:
+    elif vol > REGIME_VOL_THRESHOLD:
         regime = 'volatile'
     else:
         regime = 'ranging'
     return regime, {'vol': vol, 'trend': slope}
+
+def rolling_regime(df, window=50):
+    """
+    Per-bar version of tag_market_regime: volatility, log-price slope and
+    regime label of the `window` bars ending at each bar ('unknown' until the
+    first full window; a categorical of REGIME_LABELS). The last row matches
+    tag_market_regime(df) once len(df) >= window.
+
+    The least-squares slope over a window of x = 0..w-1 is
+        (w * sum(x*y) - sum(x) * sum(y)) / (w * sum(x^2) - sum(x)^2)
+    where sum(x*y) over the window ending at t is sum(i*y) - (t-w+1) * sum(y)
+    with global bar index i, so it only needs rolling sums of y and i*y.
+    """
+    close = df['close']
+    ret = close.pct_change().fillna(0)
+    vol = ret.rolling(window).std()
+
+    y = np.log(close.to_numpy(dtype=np.float64))
+    # centring y keeps the rolling sums small, the slope is unchanged
+    y = y - np.nanmean(y)
+    i = np.arange(len(y), dtype=np.float64)
+    sum_y = pd.Series(y).rolling(window).sum().to_numpy()
+    sum_iy = pd.Series(i * y).rolling(window).sum().to_numpy()
+    start = i - (window - 1)
+    sum_xy = sum_iy - start * sum_y
+    sum_x = window * (window - 1) / 2
+    sum_xx = (window - 1) * window * (2 * window - 1) / 6
+    slope = (window * sum_xy - sum_x * sum_y) / (window * sum_xx - sum_x ** 2)
+
+    trend = pd.Series(slope, index=df.index)
+    # codes into REGIME_LABELS: one byte per bar instead of a string object
+    codes = np.where(np.abs(slope) > REGIME_TREND_THRESHOLD, 0,
+                     np.where(vol.to_numpy() > REGIME_VOL_THRESHOLD, 1, 2)).astype(np.int8)
+    codes[np.isnan(slope) | vol.isna().to_numpy()] = 3
+    regime = pd.Categorical.from_codes(codes, REGIME_LABELS)
+    return pd.DataFrame({'vol': vol, 'trend': trend, 'regime': regime}, index=df.index)
+
+def summarize_by_regime(trades_df, regime_col='entry_regime'):
+    """summarize_trades() per regime at entry, one row per regime."""
+    rows = {regime: summarize_trades(group) for regime, group in trades_df.groupby(regime_col, sort=True)}
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis(regime_col).reset_index()
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming (one bar at a time) counterparts of rsi() and backtest_simple_strategy().
+
+StreamingRSI keeps the two Wilder averages and updates them in O(1) per bar.
+StreamingStrategy is the per-bar state machine of backtest_simple_strategy
+and emits entries/exits as bars arrive. Both reproduce the batch functions
+exactly, so a live feed and a backtest over the same bars agree.
+"""
+
+import math
+
+class StreamingRSI:
+    """
+    Incremental rsi(series, period). update(close) returns the RSI of the new
+    bar (NaN until there is a previous close).
+    """
+
+    def __init__(self, period=14):
+        self.period = period
+        # same alpha pandas derives from ewm(alpha=1/period): via the centre of mass
+        alpha = 1 / period
+        com = (1 - alpha) / alpha
+        self.alpha = 1.0 / (1.0 + com)
+        self.prev_close = math.nan
+        self.ma_up = math.nan
+        self.ma_down = math.nan
+        self._old_wt = 1.0
+        self.value = math.nan
+
+    def _ewm(self, weighted, cur):
+        # one step of pandas' ewm(adjust=False, ignore_na=False) recurrence
+        if weighted != weighted:
+            return cur
+        if cur != cur:
+            return weighted
+        if weighted != cur:
+            new_wt = self.alpha
+            weighted = (self._old_wt * weighted + new_wt * cur) / (self._old_wt + new_wt)
+        return weighted
+
+    def update(self, close):
+        delta = close - self.prev_close
+        self.prev_close = close
+        if delta == delta:
+            up, down = max(delta, 0.0), -1 * min(delta, 0.0)
+        else:
+            up = down = math.nan
+        if self.ma_up == self.ma_up:
+            self._old_wt *= 1.0 - self.alpha
+        self.ma_up = self._ewm(self.ma_up, up)
+        self.ma_down = self._ewm(self.ma_down, down)
+        if up == up:
+            self._old_wt = 1.0
+        rs = self.ma_up / (self.ma_down + 1e-9)
+        self.value = 100 - (100 / (1 + rs))
+        return self.value
+
+    def update_many(self, closes):
+        return [self.update(c) for c in closes]
+
+class StreamingStrategy:
+    """
+    Per-bar state machine for the strategy modes of backtest_simple_strategy.
+
+    update(rsi_value) processes the next bar and returns an event dict or None:
+        {'type': 'entry', 'side': 'long'|'short', 'idx': i}
+        {'type': 'exit',  'side': ..., 'entry_idx': e, 'exit_idx': i}
+    finish() force-closes an open position on the last bar seen, as the batch
+    backtest does at the end of the series. Closed trades are kept in .trades
+    in the same {'entry_idx', 'exit_idx', 'side'} form the loop produces.
+    """
+
+    def __init__(self, strategy_cfg):
+        self.lower = strategy_cfg.get('lower', 30)
+        self.upper = strategy_cfg.get('upper', 70)
+        self.exit_level = strategy_cfg.get('exit_level', 50)
+        self.mode = strategy_cfg.get('mode', 'mean_reversion')
+        self.i = -1
+        self.prev = math.nan
+        self.last_valid_idx = None
+        self.position = None
+        self.entry_idx = None
+        self.trades = []
+
+    def _enter(self, side):
+        self.position, self.entry_idx = side, self.i
+        return {'type': 'entry', 'side': side, 'idx': self.i}
+
+    def _exit(self):
+        trade = {'entry_idx': self.entry_idx, 'exit_idx': self.i, 'side': self.position}
+        self.trades.append(trade)
+        self.position, self.entry_idx = None, None
+        return {'type': 'exit', 'side': trade['side'], 'entry_idx': trade['entry_idx'],
+                'exit_idx': trade['exit_idx']}
+
+    def update(self, r):
+        self.i += 1
+        prev, self.prev = self.prev, r
+        if self.i == 0 or r != r:
+            # the batch loop starts at bar 1 and skips bars without an RSI value
+            return None
+        self.last_valid_idx = self.i
+        mode, position = self.mode, self.position
+
+        if mode == 'mean_reversion':
+            if position is None:
+                if r < self.lower:
+                    return self._enter('long')
+            elif position == 'long' and r > self.exit_level:
+                return self._exit()
+
+        elif mode == 'overbought_reversal':
+            if position is None:
+                if r > self.upper:
+                    return self._enter('short')
+            elif position == 'short' and r < self.exit_level:
+                return self._exit()
+
+        elif mode == 'trend_follow_rsi':
+            if position is None:
+                if prev < 50 and r > 50:
+                    return self._enter('long')
+                if prev > 50 and r < 50:
+                    return self._enter('short')
+            elif position == 'long' and r < 50:
+                return self._exit()
+            elif position == 'short' and r > 50:
+                return self._exit()
+        return None
+
+    def finish(self):
+        # batch semantics: only close if the final bar had an RSI value
+        if self.position is None or self.last_valid_idx != self.i:
+            return None
+        return self._exit()
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Consolidated trade-log store, replacing one CSV per (market, timeframe,
+strategy, parameters) combination.
+
+Layout (root defaults to results/trades/):
+
+    <root>/<market>_<timeframe>/      one partition per market/timeframe
+        entry_time.npy ...            trade columns (timestamps as int64 ns UTC)
+        combos.csv                    one row per combination: its parameters and
+                                      the [start, stop) row range of its trades
+        meta.json                     timezone of the timestamps
+    <root>/index.csv                  combos.csv of every partition, with the
+                                      partition name, for cross-market queries
+
+Trades of one combination are contiguous, so reading a combination is a slice
+of memory-mapped arrays, and reading one strategy across all markets is a
+filter on index.csv plus one slice per partition.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+from utils.strategies import TRADE_COLUMNS
+
+COMBO_COLUMNS = ["combo", "strategy", "rsi_period", "lower", "upper", "exit_level",
+                 "combo_key", "run_ts", "start", "stop"]
+PRICE_COLUMNS = ["entry_price", "exit_price", "pnl_pct", "cumulative_pnl_pct"]
+# optional per-trade labels, stored when present ("" for combinations written without them)
+LABEL_COLUMNS = ["entry_regime"]
+
+def combo_name(strategy, rsi_period, lower=np.nan, upper=np.nan, exit_level=50):
+    """
+    Combination label, matching the old per-file name: Mean_Reversion_RSI14_L30.
+    A non-default exit level is appended as _X<level>.
+    """
+    name = f"{strategy.replace(' ', '_')}_RSI{rsi_period}"
+    if not pd.isna(lower):
+        name += f"_L{lower:g}"
+    if not pd.isna(upper):
+        name += f"_U{upper:g}"
+    if exit_level != 50:
+        name += f"_X{exit_level:g}"
+    return name
+
+def _to_ns(ts):
+    ts = pd.Series(ts)
+    if not pd.api.types.is_datetime64_any_dtype(ts):
+        ts = pd.to_datetime(ts, utc=True)
+    tz = str(ts.dt.tz) if ts.dt.tz is not None else None
+    return ts.dt.as_unit("ns").astype("int64").to_numpy(), tz
+
+class TradeStore:
+
+    def __init__(self, root=os.path.join("results", "trades")):
+        self.root = root
+
+    def partition_path(self, market, timeframe):
+        return os.path.join(self.root, f"{market}_{timeframe}")
+
+    def combos(self, market, timeframe):
+        path = os.path.join(self.partition_path(market, timeframe), "combos.csv")
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=COMBO_COLUMNS)
+        return pd.read_csv(path)
+
+    def index(self):
+        path = os.path.join(self.root, "index.csv")
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=["partition", "market", "timeframe"] + COMBO_COLUMNS)
+        return pd.read_csv(path)
+
+    def column(self, partition, col, start=None, stop=None):
+        """Rows [start, stop) of one stored trade column, as a memory-mapped array."""
+        return np.load(os.path.join(self.root, partition, f"{col}.npy"), mmap_mode="r")[start:stop]
+
+    def _read_partition(self, path, rows=None):
+        with open(os.path.join(path, "meta.json")) as f:
+            tz = json.load(f)["tz"]
+        cols = {}
+        for col in TRADE_COLUMNS + ["cumulative_pnl_pct"]:
+            arr = np.load(os.path.join(path, f"{col}.npy"), mmap_mode="r")
+            arr = np.asarray(arr if rows is None else arr[rows])
+            if col in ("entry_time", "exit_time"):
+                arr = pd.to_datetime(arr, unit="ns", utc=tz is not None)
+                if tz is not None:
+                    arr = arr.tz_convert(tz)
+            elif col == "side":
+                arr = np.where(arr > 0, "long", "short").astype(object)
+            cols[col] = arr
+        for col in LABEL_COLUMNS:
+            fpath = os.path.join(path, f"{col}.npy")
+            if os.path.exists(fpath):
+                arr = np.load(fpath, mmap_mode="r")
+                cols[col] = np.asarray(arr if rows is None else arr[rows]).astype(object)
+        return pd.DataFrame(cols)
+
+    def write_partition(self, market, timeframe, tables):
+        """
+        Add or replace combinations in a partition. `tables` is a list of
+        (combo_meta, trades_df) with combo_meta holding the COMBO_COLUMNS
+        fields except start/stop. Combinations not in `tables` are kept; a
+        combination listed twice keeps its last entry.
+        """
+        path = self.partition_path(market, timeframe)
+        tables = list({meta["combo"]: (meta, trades) for meta, trades in tables}.values())
+        new_combos = {meta["combo"] for meta, _ in tables}
+        parts = []
+        old = self.combos(market, timeframe)
+        if len(old):
+            kept = old[~old["combo"].isin(new_combos)]
+            if len(kept):
+                old_trades = self._read_partition(path)
+                for _, meta in kept.iterrows():
+                    trades = old_trades.iloc[int(meta["start"]):int(meta["stop"])]
+                    parts.append((meta.drop(["start", "stop"]).to_dict(), trades))
+        parts.extend(tables)
+        parts.sort(key=lambda p: p[0]["combo"])
+
+        combo_rows, frames, pos = [], [], 0
+        for meta, trades in parts:
+            row = {c: meta.get(c, np.nan) for c in COMBO_COLUMNS}
+            row["start"], row["stop"] = pos, pos + len(trades)
+            pos += len(trades)
+            combo_rows.append(row)
+            if len(trades):
+                frames.append(trades[TRADE_COLUMNS + ["cumulative_pnl_pct"]
+                                     + [c for c in LABEL_COLUMNS if c in trades.columns]])
+        trades = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+            columns=TRADE_COLUMNS + ["cumulative_pnl_pct"])
+
+        os.makedirs(self.root, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=self.root, prefix=f".{market}_{timeframe}-")
+        entry_ns, tz = _to_ns(trades["entry_time"])
+        exit_ns, _ = _to_ns(trades["exit_time"])
+        np.save(os.path.join(tmp, "entry_time.npy"), entry_ns)
+        np.save(os.path.join(tmp, "exit_time.npy"), exit_ns)
+        np.save(os.path.join(tmp, "side.npy"),
+                np.where(trades["side"].to_numpy() == "long", 1, -1).astype(np.int8))
+        for col in PRICE_COLUMNS:
+            np.save(os.path.join(tmp, f"{col}.npy"), trades[col].to_numpy(dtype=np.float64))
+        for col in LABEL_COLUMNS:
+            if col in trades.columns:
+                np.save(os.path.join(tmp, f"{col}.npy"), trades[col].fillna("").to_numpy(dtype=str))
+        pd.DataFrame(combo_rows, columns=COMBO_COLUMNS).to_csv(os.path.join(tmp, "combos.csv"), index=False)
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({"tz": tz, "market": market, "timeframe": timeframe}, f)
+
+        old_dir = None
+        if os.path.exists(path):
+            old_dir = tempfile.mkdtemp(dir=self.root, prefix=f".{market}_{timeframe}-old-")
+            os.rmdir(old_dir)
+            os.replace(path, old_dir)
+        os.replace(tmp, path)
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+        self._rebuild_index()
+
+    def _rebuild_index(self):
+        frames = []
+        for name in sorted(os.listdir(self.root)):
+            part = os.path.join(self.root, name)
+            if name.startswith(".") or not os.path.isfile(os.path.join(part, "combos.csv")):
+                continue
+            with open(os.path.join(part, "meta.json")) as f:
+                meta = json.load(f)
+            combos = pd.read_csv(os.path.join(part, "combos.csv"))
+            combos.insert(0, "timeframe", meta["timeframe"])
+            combos.insert(0, "market", meta["market"])
+            combos.insert(0, "partition", name)
+            frames.append(combos)
+        index = pd.concat(frames, ignore_index=True) if frames else self.index()
+        tmp = os.path.join(self.root, ".index.csv.tmp")
+        index.to_csv(tmp, index=False)
+        os.replace(tmp, os.path.join(self.root, "index.csv"))
+
+    def read(self, **filters):
+        """
+        Trades matching index filters, e.g. read(market="BTCUSDT"),
+        read(strategy="Mean Reversion"), read(combo="Mean_Reversion_RSI14_L30",
+        timeframe="1h"). List values match any of the listed values.
+        Returns the trade columns plus market, timeframe and combo fields.
+        """
+        index = self.index()
+        for col, value in filters.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            index = index[index[col].isin(values)]
+        index = index[index["stop"] > index["start"]]
+        frames = []
+        for partition, combos in index.groupby("partition", sort=True):
+            rows = np.concatenate([np.arange(s, e) for s, e in zip(combos["start"], combos["stop"])])
+            trades = self._read_partition(os.path.join(self.root, partition), rows)
+            labels = combos.loc[combos.index.repeat(combos["stop"] - combos["start"]),
+                                ["market", "timeframe", "combo", "strategy", "rsi_period", "lower", "upper"]]
+            frames.append(pd.concat([labels.reset_index(drop=True), trades], axis=1))
+        if not frames:
+            return pd.DataFrame(columns=["market", "timeframe", "combo", "strategy", "rsi_period",
+                                         "lower", "upper"] + TRADE_COLUMNS + ["cumulative_pnl_pct"])
+        return pd.concat(frames, ignore_index=True)
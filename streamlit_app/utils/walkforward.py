@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Walk-forward optimization on top of the array signal engine.
+
+Each grid point (RSI period, strategy, thresholds) is backtested once over
+the whole series. A window is then scored from its trades using prefix sums
+over them, so a window costs two searchsorted lookups per grid point instead
+of a new backtest. Train windows only count trades that enter and exit
+inside them: a trade still open at train_end is priced with bars after it
+and must not influence parameter selection. Test windows carry positions as
+in continuous trading: a trade that enters near the end keeps its full-series
+exit and counts towards the window it entered in.
+
+For each window the best grid point on the train range (by `metric`) is
+scored on the following test range.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.strategies import (
+    signal_indices,
+    sweep_signal_indices,
+    summarize_trades,
+    trades_from_indices,
+)
+
+WF_METRICS = ("total_pnl_pct", "avg_pnl_pct", "win_rate_pct")
+
+def walk_forward_windows(n_bars, train_bars, test_bars, step_bars=None, anchored=False):
+    """
+    Bar ranges of the windows as an int array with columns
+    (train_start, train_end, test_start, test_end), ends exclusive. Rolling
+    windows move the train range by `step_bars` (default test_bars); anchored
+    windows keep train_start at 0 and grow.
+    """
+    step = step_bars or test_bars
+    test_start = np.arange(train_bars, n_bars - test_bars + 1, step, dtype=np.int64)
+    train_start = np.zeros_like(test_start) if anchored else test_start - train_bars
+    return np.column_stack([train_start, test_start, test_start, test_start + test_bars])
+
+def grid_trades(df, rsi_columns, grid, exit_level=50):
+    """
+    Full-series trades of every grid point. `rsi_columns` is {period: array}
+    (e.g. from IndicatorCache.rsi) and `grid` a list of dicts with
+    rsi_period, mode and lower/upper as needed. Thresholds sharing an
+    (rsi_period, mode) are swept in one pass.
+    Returns a list of (entry_idx, exit_idx, sides, pnl) aligned with `grid`.
+    """
+    close = df['close'].to_numpy(dtype=np.float64)
+    out = [None] * len(grid)
+    groups = {}
+    for g, point in enumerate(grid):
+        groups.setdefault((point['rsi_period'], point['mode']), []).append(g)
+
+    for (period, mode), members in groups.items():
+        r = rsi_columns[period]
+        if mode in ('mean_reversion', 'overbought_reversal'):
+            key = 'lower' if mode == 'mean_reversion' else 'upper'
+            swept = sweep_signal_indices(r, mode, [grid[g][key] for g in members], exit_level)
+            signals = {g: swept[grid[g][key]] for g in members}
+        else:
+            signals = {g: signal_indices(r, {**grid[g], 'exit_level': exit_level}) for g in members}
+        for g, (entries, exits, sides) in signals.items():
+            direction = np.where(sides > 0, 1.0, -1.0)
+            pnl = direction * (close[exits] - close[entries]) / close[entries] * 100
+            out[g] = (entries, exits, sides, pnl)
+    return out
+
+def _window_scores(trades, starts, ends, closed=False):
+    # trade count, pnl sum and win count of every (grid point, window) pair;
+    # trades entering in [start, end), and with closed=True also exiting before end
+    shape = (len(trades), len(starts))
+    count, pnl_sum, wins = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+    for g, (entries, exits, _, pnl) in enumerate(trades):
+        lo = np.searchsorted(entries, starts, side='left')
+        if closed:
+            # trades don't overlap, so exits are sorted like entries
+            hi = np.maximum(np.searchsorted(exits, ends, side='left'), lo)
+        else:
+            hi = np.searchsorted(entries, ends, side='left')
+        cum_pnl = np.concatenate([[0.0], np.cumsum(pnl)])
+        cum_win = np.concatenate([[0], np.cumsum(pnl > 0)])
+        count[g] = hi - lo
+        pnl_sum[g] = cum_pnl[hi] - cum_pnl[lo]
+        wins[g] = cum_win[hi] - cum_win[lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {
+            'total_trades': count,
+            'total_pnl_pct': pnl_sum,
+            'avg_pnl_pct': np.where(count > 0, pnl_sum / count, 0.0),
+            'win_rate_pct': np.where(count > 0, wins / count * 100, 0.0),
+        }
+
+def walk_forward(df, rsi_columns, grid, train_bars, test_bars, step_bars=None,
+                 anchored=False, metric='total_pnl_pct', min_trades=1, exit_level=50):
+    """
+    Walk-forward run over one series.
+
+    Returns (windows_df, oos_trades_df):
+    - windows_df: one row per window with its train/test time ranges, the
+      chosen grid point (its grid index and fields), its train score and the
+      test summary (summarize_trades of the out-of-sample trades).
+    - oos_trades_df: the out-of-sample trades of all windows, in the usual
+      trades layout plus a 'window' column.
+    Windows where no grid point has `min_trades` train trades choose nothing.
+    """
+    if metric not in WF_METRICS:
+        raise ValueError(f"Unknown walk-forward metric: {metric}")
+    windows = walk_forward_windows(len(df), train_bars, test_bars, step_bars, anchored)
+    trades = grid_trades(df, rsi_columns, grid, exit_level)
+    train = _window_scores(trades, windows[:, 0], windows[:, 1], closed=True)
+
+    score = np.where(train['total_trades'] >= min_trades, train[metric], -np.inf)
+    best = np.argmax(score, axis=0) if len(grid) else np.zeros(len(windows), dtype=np.int64)
+    chosen = np.isfinite(score[best, np.arange(len(windows))]) if len(grid) else np.zeros(len(windows), bool)
+
+    # out-of-sample trades of every window, gathered into one trades table
+    parts = []
+    for w in np.flatnonzero(chosen):
+        entries, exits, sides, _ = trades[best[w]]
+        lo, hi = np.searchsorted(entries, windows[w, 2:], side='left')
+        parts.append((entries[lo:hi], exits[lo:hi], sides[lo:hi], np.full(hi - lo, w)))
+    if parts:
+        e, x, sd, win = (np.concatenate(col) for col in zip(*parts))
+    else:
+        e = x = win = np.array([], dtype=np.int64)
+        sd = np.array([], dtype=np.int8)
+    oos_df = trades_from_indices(df, e, x, sd)
+    oos_df['window'] = win
+    test = _summaries_by_window(oos_df)
+
+    timestamps = df['timestamp']
+    rows = []
+    empty = summarize_trades(oos_df.iloc[:0])
+    for w, (tr_lo, tr_hi, te_lo, te_hi) in enumerate(windows):
+        row = {
+            'window': w,
+            'train_start': timestamps.iloc[tr_lo], 'train_end': timestamps.iloc[tr_hi - 1],
+            'test_start': timestamps.iloc[te_lo], 'test_end': timestamps.iloc[te_hi - 1],
+        }
+        if chosen[w]:
+            g = int(best[w])
+            row.update({'grid_index': g, **grid[g],
+                        f'train_{metric}': train[metric][g, w],
+                        'train_trades': int(train['total_trades'][g, w])})
+            summary = test.loc[w].to_dict() if w in test.index else dict(empty)
+            summary['total_trades'] = int(summary['total_trades'])
+            row.update({f'test_{k}': v for k, v in summary.items()})
+        rows.append(row)
+    return pd.DataFrame(rows), oos_df
+
+def _summaries_by_window(trades_df):
+    # summarize_trades() of each window's trades in one grouped pass
+    pnl = trades_df['pnl_pct'].astype(float)
+    by = trades_df['window']
+    equity = (1 + pnl / 100).groupby(by).cumprod()
+    peak = equity.groupby(by).cummax()
+    grouped = pnl.groupby(by)
+    out = pd.DataFrame({
+        'total_trades': grouped.size(),
+        'total_pnl_pct': grouped.sum(),
+        'avg_pnl_pct': grouped.mean(),
+        'win_rate_pct': (pnl > 0).groupby(by).mean() * 100,
+        'max_drawdown_pct': ((equity - peak) / peak).groupby(by).min() * 100,
+    })
+    out['total_trades'] = out['total_trades'].astype(int)
+    return out
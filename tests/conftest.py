@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""Make `utils` and the backtester scripts importable the way they import each other."""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "streamlit_app"))
+sys.path.insert(0, os.path.join(ROOT, "backtester"))
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from utils.aggregates import ResultAggregates
+from utils.results import ResultSink
+
+BATCH_COLUMNS = ["run_ts", "market", "timeframe", "rsi_period", "lower", "upper", "strategy",
+                 "total_trades", "total_pnl_pct", "avg_pnl_pct", "win_rate_pct", "max_drawdown_pct", "regime"]
+APP_COLUMNS = ["run_ts", "market", "timeframe", "rsi_period", "lower_thresh", "upper_thresh", "exit_level",
+               "regime", "strategy", "total_trades", "total_pnl_pct", "avg_pnl_pct", "win_rate_pct",
+               "max_drawdown_pct"]
+
+def batch_rows(seed, n=40):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n):
+        lower = [20, 25, 30][i % 3]
+        rows.append({"run_ts": f"2025-01-{seed + 1:02d}", "market": ["BTCUSDT", "ETHUSDT"][i % 2],
+                     "timeframe": "1h", "rsi_period": [7, 14][i % 2], "lower": lower, "upper": np.nan,
+                     "strategy": "Mean Reversion", "total_trades": int(rng.integers(1, 50)),
+                     "total_pnl_pct": rng.normal(), "avg_pnl_pct": rng.normal(), "win_rate_pct": rng.uniform(0, 100),
+                     "max_drawdown_pct": -rng.uniform(0, 20), "regime": ["trending", "ranging"][i % 2]})
+    return rows
+
+def write(path, columns, rows):
+    with ResultSink(path, columns) as sink:
+        sink.extend(rows)
+
+def sorted_cells(agg):
+    cells = agg.cells()
+    keys = ["market", "timeframe", "regime", "strategy", "rsi_period", "lower", "upper"]
+    return cells.sort_values(keys, na_position="first").reset_index(drop=True)
+
+def test_incremental_refresh_equals_full_rebuild(tmp_path):
+    path = str(tmp_path / "results.csv")
+    agg = ResultAggregates(path, str(tmp_path / "agg"))
+    write(path, BATCH_COLUMNS, batch_rows(0))
+    assert agg.refresh() == 40
+    write(path, BATCH_COLUMNS, batch_rows(1, 25))
+    # a torn row at the end is left for the next refresh
+    with open(path, "a") as f:
+        f.write("2025-01-09,BTCUSDT,1h,14,30,,Mean Rev")
+    assert agg.refresh() == 25
+    assert agg.refresh() == 0
+    with open(path, "a") as f:
+        f.write("ersion,3,1.5,0.5,66.0,-2.0,ranging\n")
+    assert agg.refresh() == 1
+
+    full = ResultAggregates(path, str(tmp_path / "full"))
+    assert full.refresh() == 66
+    pd.testing.assert_frame_equal(sorted_cells(agg), sorted_cells(full))
+    assert int(agg.cells()["runs"].sum()) == 66
+
+def test_refresh_folds_app_layout_rows(tmp_path):
+    path = str(tmp_path / "results.csv")
+    app = [{"run_ts": "t0", "market": "SPY", "timeframe": "1h", "rsi_period": 14, "lower_thresh": 30,
+            "upper_thresh": 70, "exit_level": 50, "regime": "ranging", "strategy": s, "total_trades": 3,
+            "total_pnl_pct": 1.0, "avg_pnl_pct": 0.3, "win_rate_pct": 66.7, "max_drawdown_pct": -1.0}
+           for s in ("Mean Reversion", "Overbought Reversal", "Trend-follow RSI")]
+    write(path, APP_COLUMNS, app)
+    agg = ResultAggregates(path, str(tmp_path / "agg"))
+    assert agg.refresh() == 3
+    cells = agg.cells().set_index("strategy")
+    assert (cells.loc["Mean Reversion", "lower"], cells.loc["Overbought Reversal", "upper"]) == (30, 70)
+    assert np.isnan(cells.loc["Mean Reversion", "upper"]) and np.isnan(cells.loc["Trend-follow RSI", "lower"])
+
+    # batch rows appended to the app's file widen its header; both layouts fold
+    write(path, BATCH_COLUMNS, batch_rows(0, 6))
+    assert agg.refresh() == 9
+    assert int(agg.cells()["runs"].sum()) == 9
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import batch_backtest
+from batch_backtest import infer_market_timeframe
+from utils.synthetic import synthetic_ohlcv
+
+@pytest.mark.parametrize("fname, expected", [
+    ("BTCUSDT_1m.csv", ("BTCUSDT", "1m")),
+    ("BNBUSDT_5m.csv", ("BNBUSDT", "5m")),
+    ("BNBUSDT_15m.csv", ("BNBUSDT", "15m")),  # was ("BNBUSDT1", "5m")
+    ("BTCUSDT15m.csv", ("BTCUSDT", "15m")),
+    ("EURUSD_4h", ("EURUSD", "4h")),          # store dataset directory
+    ("SPY_1d", ("SPY", "1d")),                # resampled, not a listed suffix
+    ("ETH-USD_1w.csv", ("ETHUSD", "1w")),
+    ("notes.csv", (None, None)),
+])
+def test_infer_market_timeframe(fname, expected):
+    assert infer_market_timeframe(fname) == expected
+
+def test_incremental_keys_cover_price_dtype_and_schema(tmp_path, monkeypatch):
+    path = str(tmp_path / "BTCUSDT_1h.csv")
+    synthetic_ohlcv(500, seed=1, freq="1h").to_csv(path, index=False)
+    assert batch_backtest.price_dtype == "float64"
+    float32 = batch_backtest.build_tasks([path], "t0", dtype="float32")
+    done = {k for task in float32 for k in batch_backtest.task_keys(task)}
+    assert batch_backtest.build_tasks([path], "t1", done=done, dtype="float32") == []
+    # a float64 run after a float32 one recomputes every grid point
+    assert len(batch_backtest.build_tasks([path], "t1", done=done, dtype="float64")) == len(float32)
+    monkeypatch.setattr(batch_backtest, "RESULT_SCHEMA_VERSION", 2)
+    assert len(batch_backtest.build_tasks([path], "t1", done=done, dtype="float32")) == len(float32)
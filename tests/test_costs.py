@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+from utils.costs import PIP_SIZES, net_pnl, pip_size
+
+def trades(market, price):
+    return pd.DataFrame({"market": [market], "entry_price": [price], "exit_price": [price],
+                         "side": ["long"], "pnl_pct": [0.0]})
+
+@pytest.mark.parametrize("market, size", [("SPY", 0.01), ("WTIUSD", 0.01), ("XAUUSD", 0.1),
+                                          ("EURUSD", 0.0001), ("EURJPY", 0.01), ("BTCUSDT", 0.01)])
+def test_spread_uses_market_pip_size(market, size):
+    # a flat trade loses exactly the spread: (2 pips * size) / price
+    price = 100.0
+    pnl = net_pnl(trades(market, price), [{"spread_pips": 2.0}])[0, 0]
+    assert pnl == pytest.approx(-2 * size / (price + size) * 100)
+
+def test_downloader_universe_has_pip_sizes():
+    import download_data
+    names = [m.replace("/", "") for m in download_data.crypto_markets] + list(download_data.yahoo_markets)
+    assert all(m in PIP_SIZES for m in names)
+
+def test_unknown_market_needs_explicit_pip_size():
+    with pytest.raises(ValueError, match="ADAUSDT"):
+        net_pnl(trades("ADAUSDT", 0.5), [{"spread_pips": 1.0}])
+    # no spread charged: no pip size needed
+    assert net_pnl(trades("ADAUSDT", 0.5), [{"fee_pct": 0.1}])[0, 0] == pytest.approx(-0.2)
+    assert pip_size("ADAUSDT", {"ADAUSDT": 0.0001}) == 0.0001
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+import time
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import download_data
+from download_data import (
+    fetch_binance, fetch_yahoo, find_gaps, merge_candles, update_market,
+    EmptyDownload, RequestStats, ThrottledClient, TokenBucket, retry_empty, run_concurrent,
+)
+
+HOUR_MS = 3_600_000
+T0 = 1_700_000_000_000 // HOUR_MS * HOUR_MS
+
+class FakeExchange:
+    """ccxt-like stand-in serving 1h candles [ms, o, h, l, c, v] from a list."""
+
+    def __init__(self, bars):
+        self.candles = [[T0 + i * HOUR_MS, 100 + i, 101 + i, 99 + i, 100.5 + i, 1.0] for i in bars]
+        self.calls = []
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=1000):
+        self.calls.append(since)
+        if since is None:
+            return [list(c) for c in self.candles[-limit:]]
+        return [list(c) for c in self.candles if c[0] >= since][:limit]
+
+def test_fetch_binance_pages_forward_from_since():
+    exchange = FakeExchange(range(25))
+    df = fetch_binance(exchange, "BTC/USDT", "1h", since=pd.Timestamp(T0, unit="ms"), limit=10, pause=0)
+    assert exchange.calls == [T0, T0 + 10 * HOUR_MS, T0 + 20 * HOUR_MS]
+    assert len(df) == 25 and df["timestamp"].is_unique
+    assert df["timestamp"].iloc[-1] == pd.Timestamp(T0 + 24 * HOUR_MS, unit="ms")
+
+def test_fetch_binance_stops_on_empty_page():
+    exchange = FakeExchange(range(20))
+    df = fetch_binance(exchange, "BTC/USDT", "1h", since=pd.Timestamp(T0, unit="ms"), limit=10, pause=0)
+    assert len(exchange.calls) == 3 and len(df) == 20
+
+def test_fetch_binance_without_since_is_one_request():
+    exchange = FakeExchange(range(25))
+    df = fetch_binance(exchange, "BTC/USDT", "1h", limit=10, pause=0)
+    assert exchange.calls == [None] and len(df) == 10
+
+def test_merge_candles_keeps_newer_copy_of_overlap():
+    old = fetch_binance(FakeExchange(range(5)), "X", "1h", limit=10, pause=0)
+    new = fetch_binance(FakeExchange(range(4, 8)), "X", "1h", limit=10, pause=0)
+    new.loc[0, "close"] = -1.0  # candle 4 was still open when first fetched
+    merged = merge_candles(old, new)
+    assert len(merged) == 8 and merged["timestamp"].is_monotonic_increasing
+    assert merged.loc[4, "close"] == -1.0
+
+def test_find_gaps_counts_missing_bars():
+    ts = pd.to_datetime([T0 + i * HOUR_MS for i in [0, 1, 2, 6, 7, 9]], unit="ms")
+    gaps = find_gaps(ts, "1h")
+    assert gaps["missing_bars"].tolist() == [3, 1]
+    assert gaps["gap_start"].tolist() == [ts[2], ts[4]]
+    assert gaps["gap_end"].tolist() == [ts[3], ts[5]]
+    assert find_gaps(ts, "1h", since=ts[4])["missing_bars"].tolist() == [1]
+
+def test_update_market_merges_overlap_and_reports_new_gaps(tmp_path, monkeypatch):
+    monkeypatch.setattr(download_data, "STORE_DIR", str(tmp_path))
+    exchange = FakeExchange(range(10))
+    fetch = lambda since: fetch_binance(exchange, "BTC/USDT", "1h", since=since, limit=10, pause=0)
+    assert update_market("BTCUSDT_1h", "1h", fetch)[0] == 10
+
+    # the last stored candle closes differently, new candles arrive with bars 15-17 missing
+    exchange.candles[-1][4] = 200.0
+    exchange.candles += FakeExchange([b for b in range(10, 25) if b not in (15, 16, 17)]).candles
+    new_bars, gaps = update_market("BTCUSDT_1h", "1h", fetch)
+    assert exchange.calls[-2:] == [T0 + 9 * HOUR_MS, T0 + 22 * HOUR_MS]  # page 1 ends at bar 21
+    assert new_bars == 12
+    assert gaps["missing_bars"].tolist() == [3]
+
+    stored = download_data.load_stored("BTCUSDT_1h")
+    assert len(stored) == 22 and stored["timestamp"].is_unique
+    assert stored.loc[9, "close"] == pytest.approx(200.0)
+
+class RateLimited(Exception):
+    """What ccxt raises on HTTP 429."""
+
+class FlakyClient:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def fetch_ohlcv(self, *args, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RateLimited("429 Too Many Requests")
+        return [[T0, 1.0, 1.0, 1.0, 1.0, 1.0]]
+
+def throttled(client, stats, retries=3):
+    sleeps = []
+    bucket = TokenBucket(1000.0, 1000)
+    return ThrottledClient(client, "binance", bucket, stats, retries=retries, backoff=0.5,
+                           sleep=sleeps.append), sleeps
+
+def test_throttled_client_retries_429_with_exponential_backoff():
+    stats = RequestStats()
+    client, sleeps = throttled(FlakyClient(failures=2), stats)
+    assert client.fetch_ohlcv("BTC/USDT") == [[T0, 1.0, 1.0, 1.0, 1.0, 1.0]]
+    assert sleeps == [0.5, 1.0]
+    row = stats.summary().iloc[0]
+    assert (row["requests"], row["errors"]) == (1, 2)
+
+def test_throttled_client_gives_up_after_retries():
+    stats = RequestStats()
+    client, sleeps = throttled(FlakyClient(failures=10), stats, retries=2)
+    with pytest.raises(RateLimited):
+        client.fetch_ohlcv("BTC/USDT")
+    assert sleeps == [0.5, 1.0]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        row = stats.summary().iloc[0]
+    assert row["requests"] == 0 and row["errors"] == 3 and np.isnan(row["p95_ms"])
+
+def test_token_bucket_waits_for_refill():
+    now = [0.0]
+    waits = []
+    def sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+    bucket = TokenBucket(rate=2.0, capacity=2, clock=lambda: now[0], sleep=sleep)
+    for _ in range(4):
+        bucket.acquire()
+    assert waits == [pytest.approx(0.5), pytest.approx(0.5)]
+
+def test_retry_empty_retries_only_empty_downloads():
+    attempts, sleeps = [], []
+    def fetch(since):
+        attempts.append(since)
+        if len(attempts) < 3:
+            raise EmptyDownload("no bars")
+        return "bars"
+    assert retry_empty(fetch, retries=3, backoff=1.0, sleep=sleeps.append)(None) == "bars"
+    assert sleeps == [1.0, 2.0]
+
+def test_run_concurrent_isolates_a_failing_job(tmp_path, monkeypatch):
+    monkeypatch.setattr(download_data, "STORE_DIR", str(tmp_path))
+    def good(client, since):
+        return fetch_binance(client, "BTC/USDT", "1h", since=since, limit=10, pause=0)
+    def bad(client, since):
+        raise ValueError("unknown symbol")
+    jobs = [("binance", "BTCUSDT_1h", "1h", FakeExchange(range(5)), good),
+            ("binance", "BADUSDT_1h", "1h", FakeExchange(range(5)), bad),
+            ("binance", "ETHUSDT_1h", "1h", FakeExchange(range(7)), good)]
+    limits = {"binance": {"concurrency": 2, "rate": 1000.0, "burst": 1000}}
+    results, stats = run_concurrent(jobs, limits=limits)
+    assert isinstance(results["BADUSDT_1h"], ValueError)
+    assert results["BTCUSDT_1h"][0] == 5 and results["ETHUSDT_1h"][0] == 7
+    assert len(download_data.load_stored("ETHUSDT_1h")) == 7
+
+class FakeYahoo:
+    """yfinance-like stand-in that records how many downloads overlap."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = self.peak = 0
+
+    def download(self, ticker, interval, progress=False, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        index = pd.DatetimeIndex(pd.to_datetime([T0], unit="ms"), name="Datetime")
+        return pd.DataFrame({"Open": [1.0], "High": [1.0], "Low": [1.0], "Close": [1.0], "Volume": [0]},
+                            index=index)
+
+def test_yahoo_downloads_are_serialized(tmp_path, monkeypatch):
+    monkeypatch.setattr(download_data, "STORE_DIR", str(tmp_path))
+    yahoo = FakeYahoo()
+    jobs = [("yahoo", f"{label}_1h", "1h", yahoo,
+             lambda client, since, ticker=ticker: fetch_yahoo(client, ticker, "1h", since=since))
+            for label, ticker in download_data.yahoo_markets.items()]
+    # even with more workers than VENUE_LIMITS allows, YAHOO_LOCK keeps calls apart
+    limits = {"yahoo": {"concurrency": 4, "rate": 1000.0, "burst": 1000}}
+    results, _ = run_concurrent(jobs, limits=limits)
+    assert all(isinstance(r, tuple) for r in results.values())
+    assert yahoo.peak == 1
+    assert download_data.VENUE_LIMITS["yahoo"]["concurrency"] == 1
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.downsample import chart_width_px, lttb_indices, minmax_indices, target_points
+
+def series(seed, n=5000):
+    rng = np.random.default_rng(seed)
+    y = np.cumsum(rng.normal(0, 1, n))
+    y[rng.integers(1, n - 1)] += 80   # a one-bar spike
+    return pd.Series(pd.date_range("2024-01-01", periods=n, freq="min")), y
+
+@pytest.mark.parametrize("seed", range(10))
+def test_minmax_keeps_endpoints_and_extrema(seed):
+    x, y = series(seed)
+    idx = minmax_indices(y, 300)
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+    assert np.all(np.diff(idx) > 0) and len(idx) <= 300
+    assert np.argmax(y) in idx and np.argmin(y) in idx
+
+@pytest.mark.parametrize("seed", range(10))
+def test_lttb_keeps_endpoints_and_extrema(seed):
+    x, y = series(seed)
+    idx = lttb_indices(x, y, 300)
+    assert len(idx) == 300 and idx[0] == 0 and idx[-1] == len(y) - 1
+    assert np.all(np.diff(idx) > 0)
+    # the spike and the global extremes dominate their buckets' triangles
+    assert np.argmax(y) in idx and np.argmin(y) in idx
+
+def test_short_series_are_kept_whole():
+    x, y = series(0, n=100)
+    assert np.array_equal(lttb_indices(x, y, 300), np.arange(100))
+    assert np.array_equal(minmax_indices(y, 300), np.arange(100))
+
+def test_point_budget_follows_chart_width():
+    assert chart_width_px("wide") == 1200 and chart_width_px("centered") == 700
+    assert chart_width_px("wide", 1800) == 1800
+    assert target_points(chart_width_px("wide", 1800)) == 1800
+    assert target_points(800, points_per_px=0.5) == 400
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from utils.grid import run_grid
+from utils.strategies import risk_metrics, format_ratio
+from utils.synthetic import synthetic_ohlcv
+
+def test_run_grid_with_repeated_timestamp():
+    df = synthetic_ohlcv(3000, seed=1)
+    df.loc[1500, "timestamp"] = df.loc[1499, "timestamp"]
+    summary, trades = run_grid({("SYNTH", "1h"): df})
+    assert len(summary) == 27
+    assert trades["entry_regime"].notna().all()
+
+    clean_summary, clean_trades = run_grid({("SYNTH", "1h"): synthetic_ohlcv(3000, seed=1)})
+    assert summary["total_trades"].tolist() == clean_summary["total_trades"].tolist()
+
+def test_risk_metrics_lookup_with_repeated_timestamp():
+    df = synthetic_ohlcv(500, seed=2)
+    df.loc[100, "timestamp"] = df.loc[99, "timestamp"]
+    trades = pd.DataFrame({"entry_time": df["timestamp"].iloc[[10, 200]].to_numpy(),
+                           "exit_time": df["timestamp"].iloc[[50, 300]].to_numpy(),
+                           "side": ["long", "short"], "pnl_pct": [1.0, -0.5]})
+    out = risk_metrics(trades, df)
+    assert np.isfinite(out["bar_max_drawdown_pct"])
+
+def test_format_ratio_of_undefined_ratios():
+    no_losses = risk_metrics(pd.DataFrame({"pnl_pct": [1.0, 2.0]}))
+    no_trades = risk_metrics(pd.DataFrame({"pnl_pct": []}))
+    assert format_ratio(no_losses["profit_factor"]) == "∞"
+    assert format_ratio(no_trades["profit_factor"]) == "n/a"
+    assert format_ratio(-np.inf) == "-∞"
+    assert format_ratio(1.234) == "1.23"
+
+def test_annual_return_needs_min_span():
+    trades = pd.DataFrame({"pnl_pct": [1.0]})
+    short = synthetic_ohlcv(3 * 24 * 60, seed=3, freq="1min")  # 3 days
+    df = synthetic_ohlcv(3 * 24 * 60, seed=3, freq="1h")  # 180 days
+    idx = (np.array([10]), np.array([500]), np.array([1]))
+    assert np.isnan(risk_metrics(trades, short, *idx)["annual_return_pct"])
+    assert np.isnan(risk_metrics(trades, short, *idx)["calmar"])
+    assert np.isfinite(risk_metrics(trades, df, *idx)["annual_return_pct"])
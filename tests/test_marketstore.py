@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+
+from utils.marketstore import write_market, read_market, list_datasets, dataset_version
+from utils.indicators import file_fingerprint
+from utils.synthetic import synthetic_ohlcv
+
+def test_rewrite_repoints_dataset_link(tmp_path):
+    store = str(tmp_path)
+    write_market(store, "SYNTH_1h", synthetic_ohlcv(50, seed=1))
+    df = synthetic_ohlcv(80, seed=2)
+    path = write_market(store, "SYNTH_1h", df)
+    assert os.path.islink(path)
+    assert len(os.listdir(store)) == 3  # the link, its current and its previous version
+    assert list_datasets(store) == [path]
+    assert read_market(path)["close"].tolist() == df["close"].tolist()
+
+def test_rewrite_replaces_plain_dataset_directory(tmp_path):
+    store = str(tmp_path)
+    path = write_market(store, "SYNTH_1h", synthetic_ohlcv(50, seed=1))
+    version = os.path.realpath(path)
+    os.remove(path)
+    shutil.move(version, path)  # a dataset written before versioning
+    df = synthetic_ohlcv(80, seed=2)
+    write_market(store, "SYNTH_1h", df)
+    assert os.path.islink(path)
+    assert len(os.listdir(store)) == 3
+    assert read_market(path)["close"].tolist() == df["close"].tolist()
+
+def test_rewrite_keeps_previous_version_only(tmp_path):
+    store = str(tmp_path)
+    path = write_market(store, "SYNTH_1h", synthetic_ohlcv(50, seed=1))
+    first = dataset_version(path)
+    write_market(store, "SYNTH_1h", synthetic_ohlcv(60, seed=2))
+    second = dataset_version(path)
+    # a reader holding the first version can still read it
+    assert len(read_market(first)) == 50
+    write_market(store, "SYNTH_1h", synthetic_ohlcv(70, seed=3))
+    assert not os.path.exists(first)
+    assert len(read_market(second)) == 60
+    assert len(read_market(path)) == 70
+
+def test_dataset_fingerprint_changes_on_rewrite_only(tmp_path):
+    store = str(tmp_path)
+    path = write_market(store, "SYNTH_1h", synthetic_ohlcv(50, seed=1))
+    fp = file_fingerprint(path)
+    assert file_fingerprint(path) == fp
+    write_market(store, "SYNTH_1h", synthetic_ohlcv(50, seed=1))
+    assert file_fingerprint(path) != fp
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.montecarlo import SIM_METRICS, group_seed, monte_carlo, monte_carlo_table, simulate
+
+def pnl(seed, n=60):
+    return np.random.default_rng(seed).normal(0.2, 2.0, n)
+
+def trades_table():
+    return pd.DataFrame({"market": np.repeat(["BTCUSDT", "ETHUSDT", "SPY"], 60),
+                         "timeframe": "1h", "combo": "Mean_Reversion_RSI14_L30",
+                         "pnl_pct": np.concatenate([pnl(1), pnl(2), pnl(3)])})
+
+def test_group_seed_is_stable_per_key():
+    assert group_seed(0, "BTCUSDT", "1h", "c") == group_seed(0, "BTCUSDT", "1h", "c")
+    assert group_seed(0, "BTCUSDT", "1h", "c") != group_seed(0, "ETHUSDT", "1h", "c")
+    assert group_seed(0, "BTCUSDT", "1h", "c") != group_seed(1, "BTCUSDT", "1h", "c")
+    # crc32 of the key, not Python's per-process salted hash
+    assert group_seed(0, "BTCUSDT", "1h", "c")[1] == 1429578644
+
+@pytest.mark.parametrize("method", ["bootstrap", "shuffle"])
+def test_simulate_is_deterministic(method):
+    a = simulate(pnl(0), 500, method, seed=[0, 7])
+    b = simulate(pnl(0), 500, method, seed=[0, 7])
+    c = simulate(pnl(0), 500, method, seed=[0, 8])
+    for m in SIM_METRICS:
+        assert np.array_equal(a[m], b[m])
+    assert not np.array_equal(a["max_drawdown_pct"], c["max_drawdown_pct"])
+
+def test_shuffle_keeps_final_pnl():
+    sims = simulate(pnl(0), 200, "shuffle", seed=0)
+    assert np.allclose(sims["total_pnl_pct"], pnl(0).sum())
+    assert np.allclose(sims["final_return_pct"], sims["final_return_pct"][0])
+
+def test_percentile_bands_are_ordered():
+    out = monte_carlo(pnl(0), 1000, "bootstrap", (5, 25, 50, 75, 95), seed=0)
+    for m in SIM_METRICS:
+        bands = [out[f"{m}_p{q}"] for q in (5, 25, 50, 75, 95)]
+        assert bands == sorted(bands)
+    assert 0 <= out["prob_loss_pct"] <= 100 and 0 <= out["dd_worse_pct"] <= 100
+    assert out["total_pnl_pct"] == pytest.approx(pnl(0).sum())
+
+def test_table_rows_do_not_depend_on_other_groups():
+    table = monte_carlo_table(trades_table(), n_sims=300, seed=0).set_index("market")
+    alone = monte_carlo_table(trades_table().query("market == 'ETHUSDT'"), n_sims=300, seed=0)
+    pd.testing.assert_series_equal(table.loc["ETHUSDT"].drop(["timeframe", "combo"]),
+                                   alone.set_index("market").loc["ETHUSDT"].drop(["timeframe", "combo"]))
+    # groups in another order, each group's trades in the same order
+    reordered = pd.concat([g for _, g in trades_table().groupby("market")][::-1])
+    shuffled = monte_carlo_table(reordered, n_sims=300, seed=0).set_index("market")
+    pd.testing.assert_frame_equal(table.sort_index(), shuffled.sort_index())
+
+def test_score_combos_independent_of_worker_count(tmp_path):
+    from monte_carlo import score_combos
+    from utils.tradestore import TradeStore
+    store = TradeStore(str(tmp_path))
+    trades = trades_table()
+    for market, group in trades.groupby("market"):
+        group = group.assign(entry_time=pd.date_range("2025-01-01", periods=len(group), freq="h"),
+                             exit_time=pd.date_range("2025-01-01 00:30", periods=len(group), freq="h"),
+                             entry_price=100.0, exit_price=100.0, side="long",
+                             cumulative_pnl_pct=group["pnl_pct"].cumsum())
+        store.write_partition(market, "1h", [({"combo": "Mean_Reversion_RSI14_L30",
+                                               "strategy": "Mean Reversion"}, group)])
+    serial = score_combos(store.index(), str(tmp_path), sims=200, workers=1)
+    parallel = score_combos(store.index(), str(tmp_path), sims=200, workers=2)
+    pd.testing.assert_frame_equal(serial, parallel)
+    row = serial.set_index("market").loc["ETHUSDT"]
+    assert row["total_pnl_pct_p50"] == pytest.approx(
+        monte_carlo(pnl(2), 200, seed=group_seed(0, "ETHUSDT", "1h", "Mean_Reversion_RSI14_L30"))["total_pnl_pct_p50"])
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.resample import SESSION_OFFSETS, best_base, resample_ohlcv
+from utils.synthetic import synthetic_ohlcv
+
+AGG = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+
+def pandas_bars(df, rule, offset=None):
+    """Reference bars from pandas resample on the local wall clock, empty buckets dropped."""
+    ts = df["timestamp"]
+    wall = df.assign(timestamp=ts.dt.tz_localize(None) if ts.dt.tz is not None else ts)
+    out = (wall.set_index("timestamp")
+               .resample(rule, origin="epoch", offset=offset, closed="left", label="left")
+               .agg(AGG).dropna(subset=["open"]).reset_index())
+    if ts.dt.tz is not None:
+        out["timestamp"] = out["timestamp"].dt.tz_localize(ts.dt.tz)
+    return out
+
+def crypto_minutes():
+    # starts mid-hour on a Wednesday, with a six-hour outage
+    df = synthetic_ohlcv(20 * 1440, seed=11, start="2024-01-03 00:07")
+    outage = (df["timestamp"] >= "2024-01-09 02:00") & (df["timestamp"] < "2024-01-09 08:00")
+    return df[~outage].reset_index(drop=True)
+
+@pytest.mark.parametrize("timeframe, rule, offset", [
+    ("15m", "15min", None), ("1h", "1h", None), ("4h", "4h", None),
+    ("1d", "1D", None), ("1w", "7D", "4D"),  # epoch day 0 is a Thursday, weeks start on Monday
+])
+def test_crypto_bars_match_pandas_resample(timeframe, rule, offset):
+    df = crypto_minutes()
+    got = resample_ohlcv(df, timeframe, "1m", drop_partial=False)
+    pd.testing.assert_frame_equal(got, pandas_bars(df, rule, offset), check_dtype=False)
+    if timeframe == "1w":
+        assert (got["timestamp"].dt.dayofweek == 0).all()
+
+def test_still_forming_bucket_is_dropped():
+    df = crypto_minutes()
+    full = resample_ohlcv(df, "1d", "1m", drop_partial=False)
+    assert df["timestamp"].iloc[-1] < full["timestamp"].iloc[-1] + pd.Timedelta("1D") - pd.Timedelta("1min")
+    pd.testing.assert_frame_equal(resample_ohlcv(df, "1d", "1m"), full.iloc[:-1])
+    # a bucket whose last base bar is present is complete
+    closed = df[df["timestamp"] < full["timestamp"].iloc[-1]]
+    assert len(resample_ohlcv(closed, "1d", "1m")) == len(full) - 1
+
+def spy_half_hours():
+    # 9:30-16:00 sessions over the March 2024 DST change, exchange time
+    days = pd.bdate_range("2024-03-04", "2024-03-15")
+    wall = [day + pd.Timedelta(hours=9, minutes=30) + k * pd.Timedelta("30min") for day in days for k in range(13)]
+    ts = pd.DatetimeIndex(wall).tz_localize("America/New_York")
+    rng = np.random.default_rng(5)
+    close = 500 + np.cumsum(rng.normal(0, 0.5, len(ts)))
+    return pd.DataFrame({"timestamp": ts, "open": close + rng.normal(0, 0.1, len(ts)),
+                         "high": close + 0.5, "low": close - 0.5, "close": close,
+                         "volume": rng.integers(1000, 5000, len(ts)).astype(float)})
+
+@pytest.mark.parametrize("timeframe, rule", [("1h", "1h"), ("2h", "2h"), ("1d", "1D")])
+def test_spy_bars_match_pandas_resample_with_session_offset(timeframe, rule):
+    df = spy_half_hours()
+    offset = SESSION_OFFSETS["SPY"]
+    got = resample_ohlcv(df, timeframe, "30m", offset=offset, drop_partial=False)
+    pd.testing.assert_frame_equal(got, pandas_bars(df, rule, offset), check_dtype=False)
+
+def test_spy_hourly_bars_start_at_half_past():
+    got = resample_ohlcv(spy_half_hours(), "1h", "30m", offset=SESSION_OFFSETS["SPY"], drop_partial=False)
+    assert (got["timestamp"].dt.minute == 30).all()
+    # 9:30 ... 15:30 each day, the last one a half bar; nothing overnight, same after DST
+    assert got.groupby(got["timestamp"].dt.date).size().eq(7).all()
+    assert got["timestamp"].dt.hour.min() == 9 and got["timestamp"].dt.hour.max() == 15
+
+def test_best_base_prefers_longest_history_then_coarsest():
+    spans = {"a_1m": 10, "a_5m": 300, "a_15m": 300, "a_4h": 900}
+    stored = {"1m": "a_1m", "5m": "a_5m", "15m": "a_15m", "4h": "a_4h"}
+    assert best_base(stored, "1h", span=spans.get) == "15m"
+    assert best_base(stored, "1d", span=spans.get) == "4h"
+    assert best_base({"4h": "a_4h"}, "1h") is None
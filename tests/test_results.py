@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from utils.results import ResultSink
+
+APP_COLUMNS = ["run_ts", "market", "lower_thresh", "upper_thresh", "strategy", "total_trades"]
+BATCH_COLUMNS = ["run_ts", "market", "lower", "upper", "strategy", "total_trades", "sharpe"]
+
+def test_rows_follow_the_file_header_of_another_layout(tmp_path):
+    path = str(tmp_path / "results.csv")
+    with ResultSink(path, APP_COLUMNS) as sink:
+        sink.append({"run_ts": "t0", "market": "SPY", "lower_thresh": 30, "upper_thresh": 70,
+                     "strategy": "Mean Reversion", "total_trades": 4})
+    with ResultSink(path, BATCH_COLUMNS) as sink:
+        sink.append({"run_ts": "t1", "market": "BTCUSDT", "lower": 25, "upper": None,
+                     "strategy": "Mean Reversion", "total_trades": 9, "sharpe": 1.5})
+    df = pd.read_csv(path)
+    assert list(df.columns) == APP_COLUMNS + ["lower", "upper", "sharpe"]
+    app, batch = df.iloc[0], df.iloc[1]
+    assert (app["lower_thresh"], app["total_trades"]) == (30, 4) and pd.isna(app["lower"])
+    assert (batch["lower"], batch["total_trades"], batch["sharpe"]) == (25, 9, 1.5)
+    assert pd.isna(batch["lower_thresh"]) and batch["strategy"] == "Mean Reversion"
+
+def test_subset_header_is_widened_in_column_order(tmp_path):
+    path = str(tmp_path / "results.csv")
+    with ResultSink(path, BATCH_COLUMNS[:-1]) as sink:
+        sink.append({"run_ts": "t0", "market": "SPY", "lower": 30, "strategy": "Mean Reversion",
+                     "total_trades": 4})
+    with ResultSink(path, BATCH_COLUMNS) as sink:
+        sink.append({"run_ts": "t1", "market": "SPY", "lower": 20, "strategy": "Mean Reversion",
+                     "total_trades": 2, "sharpe": 0.5})
+    df = pd.read_csv(path)
+    assert list(df.columns) == BATCH_COLUMNS
+    assert df["lower"].tolist() == [30, 20] and df["sharpe"].isna().tolist() == [True, False]
+
+def test_infinite_values_are_written_empty(tmp_path):
+    path = str(tmp_path / "results.csv")
+    with ResultSink(path, ["market", "profit_factor", "calmar"]) as sink:
+        sink.append({"market": "SPY", "profit_factor": np.inf, "calmar": -np.inf})
+        sink.append({"market": "BTCUSDT", "profit_factor": 1.5, "calmar": 0.2})
+    df = pd.read_csv(path)
+    assert df["profit_factor"].dtype == np.float64
+    assert df["profit_factor"].isna().tolist() == [True, False] and df["calmar"].isna().tolist() == [True, False]
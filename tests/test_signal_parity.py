@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Parity of the array signal engine (and everything built on it) with the
+per-bar reference loop _loop_trades().
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.strategies import (
+    rsi,
+    _loop_trades,
+    signal_indices,
+    sweep_signal_indices,
+    backtest_simple_strategy,
+    summarize_trades,
+)
+from utils.streaming import StreamingRSI, StreamingStrategy
+from utils.costs import cost_sensitivity
+from utils.synthetic import synthetic_ohlcv
+
+SEEDS = range(40)
+EXIT_LEVELS = (40, 50, 60)
+# both sides of every exit level: the wrong side falls back to signal_indices in the sweep
+LOWERS = (10, 20, 30, 45, 55, 70)
+UPPERS = (30, 45, 55, 70, 80, 90)
+
+def random_rsi(seed, n=400):
+    """RSI-like random walk in [0, 100] with NaN gaps (and sometimes a NaN last bar)."""
+    rng = np.random.default_rng(seed)
+    r = np.clip(50 + np.cumsum(rng.normal(0, 6, n)), 0, 100)
+    r[0] = np.nan
+    gaps = rng.random(n) < 0.05
+    r[gaps] = np.nan
+    if seed % 3 == 0:
+        r[-1] = np.nan
+    if seed % 5 == 0:
+        r[rng.integers(1, n):] = np.nan  # RSI stops early
+    return pd.Series(r)
+
+def loop_indices(r, cfg):
+    trades = _loop_trades(r, cfg)
+    return ([t['entry_idx'] for t in trades], [t['exit_idx'] for t in trades],
+            [1 if t['side'] == 'long' else -1 for t in trades])
+
+def configs():
+    for exit_level in EXIT_LEVELS:
+        for lower in LOWERS:
+            yield {'mode': 'mean_reversion', 'lower': lower, 'exit_level': exit_level}
+        for upper in UPPERS:
+            yield {'mode': 'overbought_reversal', 'upper': upper, 'exit_level': exit_level}
+    yield {'mode': 'trend_follow_rsi'}
+
+def assert_same(actual, expected):
+    for a, e in zip(actual, expected):
+        assert np.asarray(a).tolist() == list(e)
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_signal_indices_match_loop(seed):
+    r = random_rsi(seed)
+    for cfg in configs():
+        assert_same(signal_indices(r, cfg), loop_indices(r, cfg))
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_sweep_signal_indices_match_loop(seed):
+    r = random_rsi(seed)
+    for exit_level in EXIT_LEVELS:
+        swept = sweep_signal_indices(r, 'mean_reversion', LOWERS, exit_level)
+        for lower in LOWERS:
+            cfg = {'mode': 'mean_reversion', 'lower': lower, 'exit_level': exit_level}
+            assert_same(swept[lower], loop_indices(r, cfg))
+        swept = sweep_signal_indices(r, 'overbought_reversal', UPPERS, exit_level)
+        for upper in UPPERS:
+            cfg = {'mode': 'overbought_reversal', 'upper': upper, 'exit_level': exit_level}
+            assert_same(swept[upper], loop_indices(r, cfg))
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_streaming_strategy_matches_loop(seed):
+    r = random_rsi(seed)
+    for cfg in configs():
+        stream = StreamingStrategy(cfg)
+        for value in r:
+            stream.update(value)
+        stream.finish()
+        assert stream.trades == _loop_trades(r, cfg)
+
+def random_closes(seed, n=400):
+    """Price random walk with NaN gaps, sometimes a NaN first or last close."""
+    rng = np.random.default_rng(seed)
+    c = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    c[rng.random(n) < 0.05] = np.nan
+    if seed % 3 == 0:
+        c[0] = np.nan
+    if seed % 4 == 0:
+        c[-1] = np.nan
+    return pd.Series(c)
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_streaming_rsi_matches_rsi(seed):
+    closes = random_closes(seed)
+    for period in (2, 14, 30):
+        streamed = StreamingRSI(period).update_many(closes)
+        assert np.array_equal(np.asarray(streamed, dtype=float), rsi(closes, period).to_numpy(), equal_nan=True)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_backtest_engines_and_zero_cost_path_agree(seed):
+    df = synthetic_ohlcv(400, seed=seed)
+    r = random_rsi(seed)
+    for cfg in configs():
+        summary, trades = backtest_simple_strategy(df, r, cfg)
+        loop_summary, loop_trades = backtest_simple_strategy(df, r, {**cfg, 'engine': 'loop'})
+        pd.testing.assert_frame_equal(trades, loop_trades, check_dtype=False)
+        for key, value in summary.items():
+            assert value == pytest.approx(loop_summary[key], nan_ok=True)
+        if trades.empty:
+            continue
+        costed = cost_sensitivity(loop_trades.assign(market="SYNTHUSDT"), [{}], by=["market"]).iloc[0]
+        expected = summarize_trades(loop_trades)
+        for key in ("total_trades", "total_pnl_pct", "avg_pnl_pct", "win_rate_pct", "max_drawdown_pct"):
+            assert costed[key] == pytest.approx(expected[key])
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from utils.strategies import rsi, backtest_simple_strategy, TRADE_COLUMNS
+from utils.synthetic import synthetic_ohlcv
+from utils.tradestore import TradeStore, combo_name
+
+COLUMNS = TRADE_COLUMNS + ["cumulative_pnl_pct"]
+
+def trades_for(df, lower, regime=None):
+    _, trades = backtest_simple_strategy(df, rsi(df["close"], 14),
+                                         {"mode": "mean_reversion", "lower": lower, "exit_level": 50})
+    if regime is not None:
+        trades["entry_regime"] = regime
+    return trades
+
+def meta(lower):
+    return {"combo": combo_name("Mean Reversion", 14, lower), "strategy": "Mean Reversion",
+            "rsi_period": 14, "lower": lower, "upper": np.nan, "exit_level": 50, "run_ts": "t0"}
+
+def test_partition_round_trip_and_replace(tmp_path):
+    store = TradeStore(str(tmp_path))
+    df = synthetic_ohlcv(3000, seed=3)
+    df["timestamp"] = df["timestamp"].dt.tz_localize("UTC").dt.tz_convert("America/New_York")
+    t25, t30 = trades_for(df, 25, "ranging"), trades_for(df, 30, "trending")
+    assert len(t25) and len(t30)
+    store.write_partition("SPY", "1h", [(meta(25), t25), (meta(30), t30)])
+
+    got = store.read(market="SPY", combo=combo_name("Mean Reversion", 14, 30))
+    pd.testing.assert_frame_equal(got[COLUMNS], t30[COLUMNS], check_dtype=False)
+    assert str(got["entry_time"].dt.tz) == "America/New_York"
+    assert (got["entry_regime"] == "trending").all()
+
+    row = store.combos("SPY", "1h").set_index("combo").loc[combo_name("Mean Reversion", 14, 25)]
+    pnl = store.column("SPY_1h", "pnl_pct", int(row["start"]), int(row["stop"]))
+    assert np.array_equal(pnl, t25["pnl_pct"].to_numpy())
+
+    # rewriting one combination keeps the other
+    t30b = trades_for(df.iloc[:1500], 30)
+    store.write_partition("SPY", "1h", [(meta(30), t30b)])
+    assert len(store.read(market="SPY", lower=30)) == len(t30b)
+    pd.testing.assert_frame_equal(store.read(lower=25)[COLUMNS], t25[COLUMNS], check_dtype=False)
+
+def test_read_across_partitions(tmp_path):
+    store = TradeStore(str(tmp_path))
+    btc, eth = synthetic_ohlcv(2000, seed=4), synthetic_ohlcv(2000, seed=5)
+    store.write_partition("BTCUSDT", "1h", [(meta(30), trades_for(btc, 30))])
+    store.write_partition("ETHUSDT", "1h", [(meta(30), trades_for(eth, 30)), (meta(20), trades_for(eth, 20))])
+    got = store.read(strategy="Mean Reversion", lower=30)
+    assert got.groupby("market").size().to_dict() == {"BTCUSDT": len(trades_for(btc, 30)),
+                                                      "ETHUSDT": len(trades_for(eth, 30))}
+    assert len(store.index()) == 3
+    assert store.read(market="SOLUSDT").empty
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from utils.strategies import rsi
+from utils.walkforward import _window_scores, grid_trades, walk_forward, walk_forward_windows
+
+def _trades(entries, exits, pnl):
+    entries, exits = np.array(entries, dtype=np.int64), np.array(exits, dtype=np.int64)
+    return [(entries, exits, np.ones(len(entries), dtype=np.int8), np.array(pnl, dtype=float))]
+
+def test_train_score_excludes_trade_straddling_train_end():
+    # train window [0, 100): the second trade enters inside it but exits at bar 130
+    trades = _trades([10, 90, 140], [40, 130, 160], [1.0, 50.0, 2.0])
+    train = _window_scores(trades, np.array([0]), np.array([100]), closed=True)
+    assert train["total_trades"][0, 0] == 1
+    assert train["total_pnl_pct"][0, 0] == 1.0
+
+    # scored by entry only (test windows), the straddling trade counts
+    by_entry = _window_scores(trades, np.array([0]), np.array([100]))
+    assert by_entry["total_trades"][0, 0] == 2
+
+def test_train_score_with_no_closed_trades():
+    trades = _trades([90], [130], [5.0])
+    train = _window_scores(trades, np.array([0, 100]), np.array([100, 200]), closed=True)
+    assert train["total_trades"].tolist() == [[0, 0]]
+    assert train["total_pnl_pct"].tolist() == [[0.0, 0.0]]
+
+def test_walk_forward_train_trades_close_inside_train_window():
+    rng = np.random.default_rng(8)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 3000)))
+    df = pd.DataFrame({"timestamp": pd.date_range("2024-01-01", periods=3000, freq="h"), "close": close})
+    columns = {14: rsi(df["close"], 14).to_numpy()}
+    grid = [{"rsi_period": 14, "mode": "mean_reversion", "lower": lower} for lower in (30, 25)]
+    windows_df, _ = walk_forward(df, columns, grid, 1000, 500)
+
+    trades = grid_trades(df, columns, grid)
+    straddling = 0
+    for w, (start, end, _, _) in enumerate(walk_forward_windows(len(df), 1000, 500)):
+        entries, exits, _, _ = trades[int(windows_df.loc[w, "grid_index"])]
+        entered = (entries >= start) & (entries < end)
+        straddling += (entered & (exits >= end)).sum()
+        assert windows_df.loc[w, "train_trades"] == (entered & (exits < end)).sum()
+    assert straddling > 0  # the series must exercise the case